@@ -0,0 +1,670 @@
+import copy
+import json
+import math
+import os
+import random
+import shutil
+import tempfile
+import time
+import tracemalloc
+from importlib import metadata
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from Features import ALLOY_CATEGORIES as FEATURE_ALLOYS, FEATURE_COLUMNS, TOLERANCE_MAPPING, derived_features
+from Json_codec import BACKEND, dumps, loads, read_json, write_json
+from Handling import OUTLIER_COLUMNS, QuotePreprocessor, flatten_quote, load_and_validate_json, load_quotes
+from Organisation_json import transform_frame, transform_json, transform_records
+from Simulation import (
+    ALLOY_CATEGORIES, LARGE_NUMBER_FIELDS, NUMERIC_FIELDS, TOLERANCE_STANDARDS, apply_consistent_variation,
+    generate_variant_frame, generate_variant_records, modify_alloy_fields, modify_large_number_consistent, same_decimal_round
+)
+from Pdf_txt import BACKENDS, extract_text_from_pdfs, extract_text_from_single_pdf
+from txt_Correction import (
+    assign_product_fields, classify_number_matrix, classify_product_numbers, format_offer, parse_offer_lines
+)
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+
+# --- SYNTHETIC QUOTE CORPUS ---
+
+PROFILE_NAMES = ["Karmlist", "Bågprofil", "Tätlist", "Glaslist", "Hörnprofil", "Täcklist"]
+
+CONDITION_LINES = [
+    "Verktygskostnad: 14500kr",
+    "Legering: Rå",
+    "Toleranser: EN 755-9",
+    "Ytbehandling: EN-AW-6063-T5",
+    "Lev. längd: Längder enligt ovan",
+    "Lev. villkor: Ex Works Halmstad",
+    "Lev. tid: första 8-10 veckor från order därefter 5-6 veckor",
+    "NOT: Minst 15000 bitar kapade, ok att blanda längder, inkl trumling",
+    "Betalningsvillkor: 30 dagar netto. Dröjsmålsränta 7,5%",
+    "Giltighet: Offererade priser gäller fast för leveranser t.o.m. 2025-05-30",
+    "Allmänna villkor: NAPFV2017",
+    "Råvara: 3,4 Euro / kg",
+]
+
+
+def synthetic_quote_lines(rng: random.Random, n_products: int = 4):
+    """
+    Builds the text lines of one supplier quote, laid out like the real PDFs in 'Test files'.
+    """
+    name = rng.choice(PROFILE_NAMES)
+    lines = [
+        f"Offert {rng.randint(1, 999)}",
+        f"Datum: 2025-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}",
+        "Vår referens: Erik Svensson",
+        "Er referens: Maria Lindgren",
+        "Kund: Sapa Fönster AB, Vetlanda",
+        "Aluminiumprofiler från Nordisk Alu Profil/ Purso OY",
+        "Profil nr / Vikt Längd/m Kap + truml ca antal Pris Legerin",
+        "Kund ref. kg/m m Pris/st Årsvolym st kr/st g:",
+        "SEK",
+    ]
+    for _ in range(n_products):
+        vikt = f"{rng.uniform(1.05, 1.95):.3f}".replace(".", ",")
+        langd = f"{rng.uniform(12, 40):.1f}".replace(".", ",")
+        kap = f"{rng.uniform(0.2, 0.95):.2f}".replace(".", ",")
+        antal = rng.choice([20000, 40000, 85000, 120000])
+        pris = f"{rng.uniform(2, 9):.2f}".replace(".", ",")
+        lines.append(f"{name} {vikt} {langd} {kap} {antal} {pris} Rå")
+    return lines + CONDITION_LINES
+
+
+def write_simple_pdf(path: Path, pages):
+    """
+    Writes a minimal, valid PDF (Helvetica, WinAnsi encoding) with one text line per row.
+    I use it to build benchmark corpora without any PDF authoring dependency.
+
+    Parameters
+    ----------
+    path : Path
+        Destination of the PDF file.
+    pages : list[list[str]]
+        Text lines of every page.
+    """
+    def escape(line):
+        return line.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+    n_pages = len(pages)
+    font_id = 3 + 2 * n_pages
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        ("<< /Type /Pages /Kids [%s] /Count %d >>" % (
+            " ".join(f"{3 + 2 * i} 0 R" for i in range(n_pages)), n_pages)).encode("latin-1"),
+    ]
+    for i, lines in enumerate(pages):
+        content = "BT /F1 10 Tf 12 TL 40 800 Td " + " ".join(f"({escape(l)}) '" for l in lines) + " ET"
+        content = content.encode("cp1252", errors="replace")
+        objects.append((
+            f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] "
+            f"/Resources << /Font << /F1 {font_id} 0 R >> >> /Contents {4 + 2 * i} 0 R >>"
+        ).encode("latin-1"))
+        objects.append(b"<< /Length %d >>\nstream\n" % len(content) + content + b"\nendstream")
+    objects.append(b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding /WinAnsiEncoding >>")
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, 1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n" % number + body + b"\nendobj\n"
+    xref = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    for offset in offsets:
+        out += b"%010d 00000 n \n" % offset
+    out += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref)
+    path.write_bytes(bytes(out))
+
+
+def make_synthetic_pdf_corpus(folder: str, n_files: int = 200, pages_per_file: int = 1, seed: int = 0):
+    """
+    Fills a folder with synthetic quote PDFs. Extra pages repeat a quote body,
+    which mimics the multi-page annexes some suppliers send.
+    """
+    rng = random.Random(seed)
+    folder_path = Path(folder)
+    folder_path.mkdir(parents=True, exist_ok=True)
+    for i in range(n_files):
+        pages = [synthetic_quote_lines(rng) for _ in range(pages_per_file)]
+        write_simple_pdf(folder_path / f"synthetic_{i:05d}.pdf", pages)
+    return folder_path
+
+
+# --- BENCHMARKS ---
+
+def benchmark_pdf_workers(n_files: int = 200, worker_counts=(1, 2, 4, 8), chunksize: int = 8):
+    """
+    Measures the throughput of `extract_text_from_pdfs` against the number of worker processes.
+
+    Returns
+    -------
+    list[dict]
+        One row per worker count with seconds and PDFs per second.
+    """
+    rows = []
+    with tempfile.TemporaryDirectory() as tmp:
+        corpus = make_synthetic_pdf_corpus(os.path.join(tmp, "pdf"), n_files=n_files)
+        for workers in worker_counts:
+            out_dir = os.path.join(tmp, f"txt_{workers}")
+            start = time.perf_counter()
+            extract_text_from_pdfs(str(corpus), out_dir, workers=workers, chunksize=chunksize)
+            elapsed = time.perf_counter() - start
+            rows.append({"workers": workers, "seconds": round(elapsed, 3),
+                         "pdf_per_s": round(n_files / elapsed, 1)})
+            shutil.rmtree(out_dir)
+
+    print(f"\n PDF extraction throughput ({n_files} synthetic PDFs)")
+    for row in rows:
+        print(f"  workers={row['workers']:<3} {row['seconds']:>8.3f}s  {row['pdf_per_s']:>8.1f} PDF/s")
+    return rows
+
+
+def available_backends():
+    """
+    Returns the PDF backends whose library is installed here.
+    """
+    available = []
+    for name, (distribution, _) in BACKENDS.items():
+        try:
+            metadata.version(distribution)
+        except metadata.PackageNotFoundError:
+            continue
+        available.append(name)
+    return available
+
+
+def verify_backend_equivalence(backends=None):
+    """
+    Golden-output check of the PDF backends.
+
+    Every sample PDF in Global_engin/*/DATA_1 is extracted with each backend and formatted
+    with `format_offer`; the result must be identical to the txt_Corrected file the
+    reference pipeline produced for it in the same workspace (TEMP/txt_Corrected).
+
+    Returns
+    -------
+    dict
+        backend -> list of PDF names whose formatted output differs from the golden file.
+    """
+    backends = backends or available_backends()
+    samples = sorted(REPO_ROOT.glob("Global_engin/*/DATA_1/*.pdf"))
+    mismatches = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        for backend in backends:
+            mismatches[backend] = []
+            for pdf_path in samples:
+                golden = pdf_path.parent.parent / "TEMP" / "txt_Corrected" / f"{pdf_path.stem}.txt"
+                raw = Path(tmp) / f"{backend}_{pdf_path.stem}.txt"
+                formatted = Path(tmp) / f"{backend}_{pdf_path.stem}_formatted.txt"
+                raw.write_text(extract_text_from_single_pdf(pdf_path, backend=backend), encoding="utf-8")
+                format_offer(raw, formatted)
+                if formatted.read_text(encoding="utf-8") != golden.read_text(encoding="utf-8"):
+                    mismatches[backend].append(pdf_path.name)
+
+    print(f"\n Backend golden-output check ({len(samples)} sample PDFs)")
+    for backend, failed in mismatches.items():
+        status = "OK" if not failed else f"DIFFERS on {', '.join(failed)}"
+        print(f"  {backend:<11} {status}")
+    return mismatches
+
+
+def benchmark_backends(n_files: int = 50, pages_per_file: int = 4, backends=None):
+    """
+    Measures pages per second of each PDF backend on a synthetic corpus.
+    Early stop is disabled so that every page is actually read.
+    """
+    backends = backends or available_backends()
+    rows = []
+    with tempfile.TemporaryDirectory() as tmp:
+        corpus = make_synthetic_pdf_corpus(tmp, n_files=n_files, pages_per_file=pages_per_file)
+        pdf_files = sorted(corpus.glob("*.pdf"))
+        n_pages = len(pdf_files) * pages_per_file
+        for backend in backends:
+            start = time.perf_counter()
+            for pdf_path in pdf_files:
+                extract_text_from_single_pdf(pdf_path, early_stop=False, backend=backend)
+            elapsed = time.perf_counter() - start
+            rows.append({"backend": backend, "seconds": round(elapsed, 3),
+                         "pages_per_s": round(n_pages / elapsed, 1)})
+
+    print(f"\n PDF backend throughput ({n_pages} synthetic pages)")
+    for row in rows:
+        print(f"  {row['backend']:<11} {row['seconds']:>8.3f}s  {row['pages_per_s']:>8.1f} pages/s")
+    return rows
+
+
+def _legacy_parse_offer_lines(lines):
+    """
+    The previous `format_offer` parsing loop (per-line any(startswith) and two
+    uncompiled regex calls per token), kept as the baseline of `benchmark_offer_parser`.
+    """
+    import re
+
+    starters = [
+        "Verktygskostnad:", "Legering:", "Toleranser:", "Ytbehandling:",
+        "Lev. längd:", "Lev. villkor:", "Lev. tid:", "NOT:",
+        "Betalningsvillkor:", "Giltighet:", "Allmänna villkor:", "Råvara:"
+    ]
+    lines = [line.strip() for line in lines if line.strip()]
+    metadata, raw_products, conditions = [], [], []
+    in_products = False
+    for line in lines:
+        if line.startswith("Profil nr / Vikt"):
+            in_products = True
+            continue
+        if any(line.startswith(starter) for starter in starters):
+            in_products = False
+            conditions.append(line)
+            continue
+        if not in_products and not conditions:
+            metadata.append(line)
+            continue
+        if in_products:
+            if line.startswith("Kund ref.") or line in ("SEK", "Pris/st SEK"):
+                continue
+            raw_products.append(line.split())
+    products = []
+    for tokens in raw_products:
+        numbers = [t.replace(",", ".") for t in tokens if re.match(r'^\d+[,.]?\d*$', t)]
+        strings = [t for t in tokens if not re.match(r'^\d+[,.]?\d*$', t)]
+        products.append(assign_product_fields(numbers, strings, "", ""))
+    return metadata, products, conditions
+
+
+def benchmark_offer_parser(n_lines: int = 100_000, n_products: int = 20):
+    """
+    Times the offer parser of `txt_Correction` on synthetic offers totalling about n_lines lines,
+    against the previous implementation.
+    """
+    rng = random.Random(0)
+    offers, total = [], 0
+    while total < n_lines:
+        lines = synthetic_quote_lines(rng, n_products=n_products)
+        offers.append(lines)
+        total += len(lines)
+
+    rows = []
+    for name, parser in (("legacy", _legacy_parse_offer_lines), ("compiled", parse_offer_lines)):
+        start = time.perf_counter()
+        for lines in offers:
+            parser(lines)
+        elapsed = time.perf_counter() - start
+        rows.append({"parser": name, "seconds": round(elapsed, 3), "lines_per_s": round(total / elapsed)})
+
+    print(f"\n Offer parser ({total} synthetic lines, {len(offers)} offers)")
+    for row in rows:
+        print(f"  {row['parser']:<9} {row['seconds']:>8.3f}s  {row['lines_per_s']:>10} lines/s")
+    return rows
+
+
+def benchmark_number_classification(n_lines: int = 200_000):
+    """
+    Times the scalar `assign_product_fields` loop against the vectorized classification,
+    and checks they agree. "numpy core" is `classify_number_matrix` alone on a ready float
+    matrix; "numpy e2e" includes building that matrix from token lists and returning strings.
+    """
+    rng = random.Random(0)
+    numbers_per_line = []
+    while len(numbers_per_line) < n_lines:
+        for line in synthetic_quote_lines(rng, n_products=20)[9:29]:
+            numbers_per_line.append([token.replace(",", ".") for token in line.split()[1:-1]])
+
+    start = time.perf_counter()
+    scalar = [assign_product_fields(numbers, [], "", "")[1:6] for numbers in numbers_per_line]
+    scalar_s = time.perf_counter() - start
+
+    start = time.perf_counter()
+    batch = classify_product_numbers(numbers_per_line)
+    e2e_s = time.perf_counter() - start
+
+    width = max(map(len, numbers_per_line))
+    values = np.array([[float(n) for n in numbers] + [np.nan] * (width - len(numbers)) for numbers in numbers_per_line])
+    lengths = np.array([len(numbers) for numbers in numbers_per_line])
+    start = time.perf_counter()
+    classify_number_matrix(values, lengths)
+    core_s = time.perf_counter() - start
+
+    assert scalar == batch, "vectorized classification differs from the scalar rules"
+    print(f"\n Product number classification ({len(numbers_per_line)} lines)")
+    print(f"  scalar      {scalar_s:>8.3f}s")
+    print(f"  numpy core  {core_s:>8.3f}s")
+    print(f"  numpy e2e   {e2e_s:>8.3f}s")
+    return {"scalar_s": round(scalar_s, 3), "numpy_core_s": round(core_s, 3), "numpy_e2e_s": round(e2e_s, 3)}
+
+
+def synthetic_quote_rows(n_rows: int, seed: int = 0):
+    """
+    Step 5 rows (one dict per quote line) with the raw condition fields of the real quotes.
+    """
+    rng = random.Random(seed)
+    rows = []
+    for i in range(n_rows):
+        low = rng.randint(2, 12)
+        rows.append({
+            "offert": f"Offert {i}",
+            "Vikt kg/m": round(rng.uniform(0.1, 3), 3),
+            "Prix kr/st SEK": round(rng.uniform(1, 50), 2),
+            "Verktygskostnad": f"{rng.randint(5, 30) * 500}kr",
+            "Ytbehandling": rng.choice(["EN-AW-6063-T5", "EN-AW-6060 T6", "anodiserad", "6082-T6"]),
+            "Lev. tid": f"första {low}-{low + 2} veckor från order därefter 5-6 veckor",
+            "NOT": f"Minst {rng.randint(1, 30) * 1000} bitar kapade",
+            "Råvara": f"{rng.randint(25, 45) / 10:.1f}".replace(".", ",") + " Euro / kg",
+        })
+    return rows
+
+
+def write_synthetic_quotes(folder: str, n_files: int, seed: int = 0, invalid_every: int = 50):
+    """
+    Quote JSON files shaped like the output of step 3, with one invalid quote every `invalid_every`.
+    """
+    rng = random.Random(seed)
+    os.makedirs(folder, exist_ok=True)
+    for i in range(n_files):
+        quote = {
+            "metadonnees": {"offert": f"Offert {i}", "Datum": "2025-02-25", "Vår referens": "Erik Svensson",
+                            "Er referens": "Maria Lindgren", "Kund": f"Kund {rng.randint(1, 40)}"},
+            "produits": [{"Profil nr/Kund ref": f"Profil {rng.randint(1, 200)}",
+                          "Vikt kg/m": round(rng.uniform(0.1, 3), 3), "Längd/m m": round(rng.uniform(5, 30), 1),
+                          "Kap + truml Pris/st": round(rng.uniform(0.2, 2), 2),
+                          "ca antal Årsvolym st": rng.randint(1, 100) * 1000,
+                          "Prix kr/st SEK": round(rng.uniform(1, 50), 2), "Legering": "Rå"}
+                         for _ in range(rng.randint(1, 8))],
+            "conditions": {key: "x" for key in ("Verktygskostnad", "Legering", "Toleranser", "Ytbehandling",
+                                                "Lev. längd", "Lev. villkor", "Lev. tid", "NOT",
+                                                "Betalningsvillkor", "Giltighet", "Allmänna villkor", "Råvara")},
+        }
+        if invalid_every and i % invalid_every == 0:
+            quote["metadonnees"]["Datum"] = "25/02/2025"
+        with open(os.path.join(folder, f"quote_{i:06d}.json"), "w", encoding="utf-8") as f:
+            json.dump(quote, f, ensure_ascii=False)
+
+
+def benchmark_quote_loading(n_files: int = 5000):
+    """
+    Per-file `load_and_validate_json` + `flatten_quote` against the bulk `load_quotes`.
+    """
+    with tempfile.TemporaryDirectory() as tmp:
+        write_synthetic_quotes(tmp, n_files)
+
+        start = time.perf_counter()
+        rows = []
+        for filename in sorted(os.listdir(tmp)):
+            try:
+                rows.extend(flatten_quote(load_and_validate_json(os.path.join(tmp, filename))))
+            except Exception:
+                pass
+        expected = pd.DataFrame(rows)
+        per_file_s = time.perf_counter() - start
+
+        start = time.perf_counter()
+        df, rejects = load_quotes(tmp)
+        bulk_s = time.perf_counter() - start
+
+    pd.testing.assert_frame_equal(df, expected)
+    print(f"\n Quote loading ({n_files} files, {len(df)} rows, {len(rejects)} rejected)")
+    print(f"  per file    {per_file_s:>8.3f}s")
+    print(f"  bulk        {bulk_s:>8.3f}s")
+    return {"per_file_s": round(per_file_s, 3), "bulk_s": round(bulk_s, 3), "rejected": len(rejects)}
+
+
+def benchmark_json_codec(n_records: int = 10_000):
+    """
+    Indented standard-library JSON (the former file format) against the compact `Json_codec`:
+    bytes, encoding and decoding time, and writing / reading one file per record.
+    """
+    records = synthetic_quote_rows(n_records)
+    for record, features in zip(records, derived_features(
+            [r["Vikt kg/m"] for r in records], [6.0] * n_records, ["EN 755-9"] * n_records,
+            ["Rå"] * n_records).to_dict("records")):
+        record.update(features)
+
+    def legacy_dumps(obj):
+        return json.dumps(obj, ensure_ascii=False, indent=4).encode("utf-8")
+
+    def legacy_loads(data):
+        return json.loads(data)
+
+    def legacy_write(obj, path):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(obj, f, ensure_ascii=False, indent=4)
+
+    def legacy_read(path):
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    results = {}
+    for name, encode, decode, write, read in (("json indent=4", legacy_dumps, legacy_loads, legacy_write, legacy_read),
+                                              (f"{BACKEND} compact", dumps, loads, write_json, read_json)):
+        start = time.perf_counter()
+        encoded = [encode(record) for record in records]
+        encode_s = time.perf_counter() - start
+        start = time.perf_counter()
+        decoded = [decode(data) for data in encoded]
+        decode_s = time.perf_counter() - start
+        assert decoded == records
+
+        with tempfile.TemporaryDirectory() as tmp:
+            paths = [os.path.join(tmp, f"row_{i}.json") for i in range(n_records)]
+            start = time.perf_counter()
+            for record, path in zip(records, paths):
+                write(record, path)
+            write_s = time.perf_counter() - start
+            start = time.perf_counter()
+            for path in paths:
+                read(path)
+            read_s = time.perf_counter() - start
+
+        results[name] = {"bytes": sum(map(len, encoded)), "encode_s": round(encode_s, 3),
+                         "decode_s": round(decode_s, 3), "write_files_s": round(write_s, 3),
+                         "read_files_s": round(read_s, 3)}
+
+    print(f"\n JSON codec ({n_records} records)")
+    print(f"  {'':<16}{'bytes':>12}{'encode':>10}{'decode':>10}{'write':>10}{'read':>10}")
+    for name, r in results.items():
+        print(f"  {name:<16}{r['bytes']:>12}{r['encode_s']:>9.3f}s{r['decode_s']:>9.3f}s"
+              f"{r['write_files_s']:>9.3f}s{r['read_files_s']:>9.3f}s")
+    return results
+
+
+def _legacy_handle_outliers(df):
+    """
+    `handle_outliers` before the fit sample and chunked scoring: one fit_predict on every row.
+    """
+    from sklearn.ensemble import IsolationForest
+    clf = IsolationForest(contamination=0.05, random_state=42)
+    df['outlier_flag'] = clf.fit_predict(df[OUTLIER_COLUMNS]) == -1
+    for col in OUTLIER_COLUMNS:
+        df[col] = df[col].clip(df[col].quantile(0.05), df[col].quantile(0.95))
+    return df
+
+
+def benchmark_outliers(n_rows: int = 1_000_000, workers: int = 0):
+    """
+    Outlier step on a large synthetic dataset: time and peak traced memory of the legacy
+    single fit_predict against `QuotePreprocessor` (fit sample, chunked scoring, `workers` cores).
+    """
+    rng = np.random.default_rng(0)
+    frame = pd.DataFrame({col: rng.lognormal(1, 0.5, n_rows) for col in OUTLIER_COLUMNS})
+
+    results = {}
+    for name, run in (("legacy", _legacy_handle_outliers),
+                      ("chunked", lambda df: QuotePreprocessor(42, workers=workers)._handle_outliers(df, fit=True))):
+        df = frame.copy()
+        tracemalloc.start()
+        start = time.perf_counter()
+        df = run(df)
+        elapsed = time.perf_counter() - start
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        results[name] = {"s": round(elapsed, 3), "peak_mb": round(peak / 1024 ** 2, 1),
+                         "outlier_share": round(float(df['outlier_flag'].mean()), 4)}
+
+    print(f"\n Outlier detection ({n_rows} rows, {os.cpu_count()} CPU)")
+    for name, result in results.items():
+        print(f"  {name:<10} {result['s']:>8.3f}s  peak {result['peak_mb']:>7.1f} MB  "
+              f"outliers {result['outlier_share']:.2%}")
+    return results
+
+
+def benchmark_transform(n_rows: int = 100_000):
+    """
+    Per-row `transform_json` against `transform_frame` (DataFrame in and out, as in the columnar
+    path) and `transform_records` (dicts in and out, as in the JSON path), on identical rows.
+    """
+    rows = synthetic_quote_rows(n_rows)
+    df = pd.DataFrame(rows)
+
+    start = time.perf_counter()
+    expected = [transform_json(dict(row)) for row in rows]
+    scalar_s = time.perf_counter() - start
+
+    start = time.perf_counter()
+    transform_frame(df)
+    frame_s = time.perf_counter() - start
+
+    start = time.perf_counter()
+    transformed = transform_records(rows)
+    records_s = time.perf_counter() - start
+
+    assert transformed == expected, "vectorized transform differs from transform_json"
+    print(f"\n Field transform ({n_rows} rows)")
+    print(f"  per row     {scalar_s:>8.3f}s")
+    print(f"  DataFrame   {frame_s:>8.3f}s")
+    print(f"  records     {records_s:>8.3f}s  (incl. dict <-> DataFrame conversion)")
+    return {"per_row_s": round(scalar_s, 3), "frame_s": round(frame_s, 3), "records_s": round(records_s, 3)}
+
+
+def _legacy_features(weight_kg_per_m, length_m, tolerance, alloy):
+    """
+    Per-row feature code used before `Features.derived_features` (Last_Traitement.py and Page_1.py).
+    """
+    area_mm2 = (weight_kg_per_m / 2700) * 1e6
+    height = math.sqrt(area_mm2 * 2)
+    width = area_mm2 / height
+    perimeter = 2 * (height + width)
+    features = {
+        "thinness_ratio": round((4 * math.pi * area_mm2) / (perimeter ** 2), 4),
+        "area_to_length": round(area_mm2 / (length_m * 1000), 5),
+        "wall_factor": round(area_mm2 / perimeter, 4),
+        "dfm_index": round(min(1.0, 0.7 / (weight_kg_per_m ** 0.25)), 4),
+        "symmetry_score": 0.8
+    }
+    features.update(TOLERANCE_MAPPING.get(tolerance, TOLERANCE_MAPPING["DEFAULT"]))
+    features["alloy_category"] = FEATURE_ALLOYS.index(alloy) if alloy in FEATURE_ALLOYS else len(FEATURE_ALLOYS) - 1
+    return features
+
+
+def benchmark_features(n_rows: int = 100_000):
+    """
+    Per-row feature engineering against one `derived_features` pass on the same products.
+    Values may only differ in the last rounded digit, where numpy's power and Python's
+    disagree by one ulp before rounding.
+    """
+    rng = np.random.default_rng(0)
+    weights = rng.uniform(0.05, 30, n_rows).round(3).tolist()
+    lengths = rng.uniform(0.5, 8, n_rows).round(2).tolist()
+    tolerances = rng.choice(list(TOLERANCE_MAPPING) + ["unknown"], n_rows).tolist()
+    alloys = rng.choice(FEATURE_ALLOYS + ["unknown"], n_rows).tolist()
+
+    start = time.perf_counter()
+    expected = [_legacy_features(*row) for row in zip(weights, lengths, tolerances, alloys)]
+    scalar_s = time.perf_counter() - start
+
+    start = time.perf_counter()
+    features = derived_features(weights, lengths, tolerances, alloys)
+    vector_s = time.perf_counter() - start
+
+    expected = pd.DataFrame(expected, columns=FEATURE_COLUMNS)
+    assert (features["alloy_category"] == expected["alloy_category"]).all()
+    assert np.allclose(features, expected, rtol=0, atol=1e-4), "vectorized features differ"
+    mismatches = int((features != expected).any(axis=1).sum())
+    print(f"\n Feature engineering ({n_rows} rows)")
+    print(f"  per row     {scalar_s:>8.3f}s")
+    print(f"  vectorized  {vector_s:>8.3f}s  ({mismatches} rows differ in the last rounded digit)")
+    return {"per_row_s": round(scalar_s, 3), "vectorized_s": round(vector_s, 3), "last_digit_mismatches": mismatches}
+
+
+def _legacy_make_variant(original):
+    """
+    The per-variant loop generate_variants used before the NumPy generator
+    (deepcopy and `random` draws for every variant), kept as the benchmark reference.
+    """
+    new_data = copy.deepcopy(original)
+    variation = random.uniform(-0.10, 0.10)
+    for field in NUMERIC_FIELDS:
+        if field in new_data:
+            old_value = new_data[field]
+            new_data[field] = same_decimal_round(old_value, apply_consistent_variation(old_value, variation))
+    for field in LARGE_NUMBER_FIELDS:
+        if field in new_data:
+            new_data[field] = modify_large_number_consistent(new_data[field], variation)
+    new_data["Legering"] = random.choice(ALLOY_CATEGORIES)
+    new_data.update(modify_alloy_fields())
+    new_data["Toleranser"] = random.choice(TOLERANCE_STANDARDS)
+    return new_data
+
+
+def benchmark_variants(n_originals: int = 1000, variant_counts=(19, 500)):
+    """
+    Legacy deepcopy loop against the batched NumPy generator, as dicts (JSON path)
+    and as a table (columnar path), in memory with no file writes.
+
+    Both draw at random, so instead of equality I check the generator invariants:
+    same fields, variations within ±10% and the original number of decimals kept.
+    """
+    originals = transform_records(synthetic_quote_rows(n_originals))
+    results = {}
+    print(f"\n Variant generation ({n_originals} originals)")
+    for num_variants in variant_counts:
+        start = time.perf_counter()
+        for original in originals:
+            for _ in range(num_variants):
+                _legacy_make_variant(original)
+        legacy_s = time.perf_counter() - start
+
+        start = time.perf_counter()
+        names = [f"quote_{i + 1}" for i in range(len(originals))]
+        variants = generate_variant_records(originals, names, num_variants, seed=0)
+        numpy_s = time.perf_counter() - start
+
+        for original, rows in zip(originals, variants):
+            fields = list(_legacy_make_variant(original))
+            for row in rows:
+                assert list(row) == fields
+                value, decimals = original["Vikt kg/m"], len(str(original["Vikt kg/m"]).split(".")[1])
+                half_unit = 0.5 * 10 ** -decimals + 1e-9
+                assert value * 0.9 - half_unit <= row["Vikt kg/m"] <= value * 1.1 + half_unit
+                assert row["Vikt kg/m"] == round(row["Vikt kg/m"], decimals)
+                assert row["NOT"] % 1000 == 0
+
+        frame = pd.DataFrame(originals)
+        start = time.perf_counter()
+        generate_variant_frame(frame, names, num_variants, seed=0)
+        frame_s = time.perf_counter() - start
+
+        print(f"  {num_variants:>3} variants  legacy {legacy_s:>8.3f}s   numpy dicts {numpy_s:>8.3f}s"
+              f"   numpy table {frame_s:>8.3f}s")
+        results[num_variants] = {"legacy_s": round(legacy_s, 3), "numpy_s": round(numpy_s, 3),
+                                 "numpy_table_s": round(frame_s, 3)}
+    return results
+
+
+def main():
+    benchmark_pdf_workers()
+    verify_backend_equivalence()
+    benchmark_backends()
+    benchmark_offer_parser()
+    benchmark_number_classification()
+    benchmark_json_codec()
+    benchmark_quote_loading()
+    benchmark_outliers()
+    benchmark_transform()
+    benchmark_features()
+    benchmark_variants()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,7 @@
 import pandas as pd
-import json
 from pathlib import Path
+from Columnar import ROW_ID, write_table
+from Json_codec import write_json
 
 def convert_csv_to_json_rows(csv_path: str, output_dir: str):
     """
@@ -32,12 +33,37 @@ def convert_csv_to_json_rows(csv_path: str, output_dir: str):
         row_dict = row.to_dict()
         json_path = output_path / f"quote_{idx+1}.json"
         json_file_paths.append(json_path.name)
-        with open(json_path, 'w', encoding='utf-8') as f:
-            json.dump(row_dict, f, ensure_ascii=False, indent=4)
+        write_json(row_dict, json_path)
 
     print(f" {len(json_file_paths)} JSON files generated in '{output_path}'")
     print(pd.DataFrame(json_file_paths, columns=["Fichier JSON"]).head())
 
+def convert_csv_to_table(csv_path: str, output_table: str):
+    """
+    Columnar version of `convert_csv_to_json_rows`: the rows go into a single table file.
+
+    Each row keeps the id it would have had as a file ('quote_1', 'quote_2', ...) in a 'row_id' column.
+
+    Parameters
+    ----------
+    csv_path : str
+        Path to the input CSV file that contains structured data.
+
+    output_table : str
+        Path of the output table (.parquet or .arrow).
+
+    Returns
+    -------
+    int
+        Number of rows written.
+    """
+    df = pd.read_csv(csv_path)
+    df.insert(0, ROW_ID, [f"quote_{idx+1}" for idx in range(len(df))])
+    write_table(df, output_table)
+
+    print(f" {len(df)} rows saved to '{output_table}'")
+    return len(df)
+
 if __name__ == "__main__":
     convert_csv_to_json_rows(
         "Odens/Data_Processing/processed_quotes.csv",
@@ -0,0 +1,135 @@
+import json
+from pathlib import Path
+from Json_codec import dumps, loads, write_json
+
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+    pq = None
+
+# Opt-in single-file formats for steps 5 to 8, instead of one JSON file per row
+FORMATS = {"parquet": ".parquet", "arrow": ".arrow"}
+ROW_ID = "row_id"
+_JSON_COLUMNS_KEY = b"odens.json_columns"
+
+
+def _require_pyarrow():
+    if pa is None:
+        raise ImportError("The columnar intermediate format needs pyarrow: pip install pyarrow")
+
+
+def table_path(folder, name: str, fmt: str) -> Path:
+    """
+    Path of a columnar table, e.g. table_path(".../columnar", "rows", "parquet").
+    """
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown columnar format '{fmt}'. Available: {', '.join(FORMATS)}")
+    return Path(folder) / f"{name}{FORMATS[fmt]}"
+
+
+def write_table(df: pd.DataFrame, path) -> Path:
+    """
+    Writes a DataFrame as Parquet or Arrow IPC, depending on the file suffix.
+
+    Arrow columns have a single type, while the JSON rows of this pipeline sometimes mix
+    numbers and text in one field (e.g. an unparsed 'Lev. tid'). I store such columns as
+    JSON-encoded text and list them in the file metadata, so `read_table` restores them as they were.
+    """
+    _require_pyarrow()
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+
+    df = df.copy()
+    json_columns = []
+    for column in df.columns[df.dtypes == object]:
+        types = {type(v) for v in df[column] if v is not None and not (isinstance(v, float) and v != v)}
+        if len(types) > 1:
+            df[column] = [None if v is None else dumps(v, pretty=False).decode("utf-8") for v in df[column]]
+            json_columns.append(column)
+
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    metadata = dict(table.schema.metadata or {})
+    metadata[_JSON_COLUMNS_KEY] = json.dumps(json_columns).encode("utf-8")
+    table = table.replace_schema_metadata(metadata)
+
+    tmp = path.with_suffix(path.suffix + ".tmp")
+    if path.suffix == FORMATS["parquet"]:
+        pq.write_table(table, tmp)
+    else:
+        with pa.OSFile(str(tmp), "wb") as sink, pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+    tmp.replace(path)
+    return path
+
+
+def read_table(path) -> pd.DataFrame:
+    """
+    Reads a table written by `write_table`.
+    """
+    _require_pyarrow()
+    path = Path(path)
+    if path.suffix == FORMATS["parquet"]:
+        table = pq.read_table(path)
+    else:
+        with pa.memory_map(str(path), "r") as source:
+            table = pa.ipc.open_file(source).read_all()
+
+    df = table.to_pandas()
+    json_columns = json.loads((table.schema.metadata or {}).get(_JSON_COLUMNS_KEY, b"[]"))
+    for column in json_columns:
+        df[column] = [None if v is None else loads(v) for v in df[column]]
+    return df
+
+
+def read_records(path):
+    """
+    Reads a table as (row id, record) pairs, the in-memory equivalent of a folder of JSON rows.
+    """
+    df = read_table(path)
+    row_ids = df.pop(ROW_ID).tolist()
+    return list(zip(row_ids, df.to_dict("records")))
+
+
+def write_records(rows, path) -> int:
+    """
+    Writes (row id, record) pairs as a table. Returns the number of rows.
+    """
+    rows = list(rows)
+    df = pd.DataFrame([record for _, record in rows])
+    df.insert(0, ROW_ID, [row_id for row_id, _ in rows])
+    write_table(df, path)
+    return len(rows)
+
+
+def export_json_rows(path, output_dir: str, pretty: bool = None) -> int:
+    """
+    I use this function to export a columnar table back to the per-file JSON layout,
+    one '{row_id}.json' file per row, as the JSON intermediate format would have produced.
+
+    Parameters
+    ----------
+    path : str
+        Table written by `write_table`.
+    output_dir : str
+        Folder where the JSON files are written.
+    pretty : bool, optional
+        Indent the JSON files. By default only in debug mode (see `Json_codec.set_pretty`).
+
+    Returns
+    -------
+    int
+        Number of exported files.
+    """
+    output_path = Path(output_dir)
+    output_path.mkdir(parents=True, exist_ok=True)
+    rows = read_records(path)
+    for row_id, record in rows:
+        # Missing values become null, as in the JSON files written by the pipeline
+        record = {k: (None if isinstance(v, float) and v != v else v) for k, v in record.items()}
+        write_json(record, output_path / f"{row_id}.json", pretty)
+    print(f" {len(rows)} JSON files exported to '{output_path}'")
+    return len(rows)
@@ -0,0 +1,174 @@
+import numpy as np
+import pandas as pd
+
+# === TOLERANCE MAPPING ===
+# This table encodes geometric tolerance characteristics for different industrial standards.
+# It's helpful for scoring manufacturability or calculating derived metrics.
+TOLERANCE_MAPPING = {
+    "EN 755-9": {"linear_tol": 0.15, "angular_tol": 0.5, "flatness": 0.2, "gd_t_index": 2.1},
+    "ISO 2768-m": {"linear_tol": 0.1, "angular_tol": 0.3, "flatness": 0.15, "gd_t_index": 2.8},
+    "ASME Y14.5": {"linear_tol": 0.05, "angular_tol": 0.2, "flatness": 0.1, "gd_t_index": 3.5},
+    "DIN 7168": {"linear_tol": 0.08, "angular_tol": 0.25, "flatness": 0.12, "gd_t_index": 3.0},
+    "ISO 286": {"linear_tol": 0.06, "angular_tol": 0.22, "flatness": 0.08, "gd_t_index": 3.2},
+    "JIS B 0401": {"linear_tol": 0.07, "angular_tol": 0.28, "flatness": 0.11, "gd_t_index": 2.9},
+    "ISO 2768-1": {"linear_tol": 0.09, "angular_tol": 0.31, "flatness": 0.14, "gd_t_index": 2.7},
+    "ISO 8015": {"linear_tol": 0.04, "angular_tol": 0.18, "flatness": 0.07, "gd_t_index": 3.6},
+    "ASME B4.1": {"linear_tol": 0.12, "angular_tol": 0.35, "flatness": 0.18, "gd_t_index": 2.5},
+    "BS 4500": {"linear_tol": 0.11, "angular_tol": 0.33, "flatness": 0.16, "gd_t_index": 2.6},
+    "ISO 1829": {"linear_tol": 0.13, "angular_tol": 0.4, "flatness": 0.19, "gd_t_index": 2.4},
+    "DEFAULT": {"linear_tol": 0.3, "angular_tol": 1.0, "flatness": 0.5, "gd_t_index": 1.0}
+}
+
+# List of alloy categories used to encode categorical material types
+ALLOY_CATEGORIES = [
+    "Aluminium 1050 Rå", "Aluminium 2017 T4", "Aluminium 3003 H14",
+    "Aluminium 4043 O", "Aluminium 5083 H111", "Aluminium 6061 T6",
+    "Aluminium 7075 T651", "Aluminium 2024 T351", "Rå"
+]
+
+# Material density (aluminium) in kg/m³
+DENSITY_ALU = 2700
+
+# Derived columns, in the order they appear in a training row
+GEOMETRIC_COLUMNS = ["thinness_ratio", "area_to_length", "wall_factor", "dfm_index", "symmetry_score"]
+TOLERANCE_COLUMNS = ["linear_tol", "angular_tol", "flatness", "gd_t_index"]
+FEATURE_COLUMNS = GEOMETRIC_COLUMNS + TOLERANCE_COLUMNS + ["alloy_category"]
+
+_TOLERANCE_KEYS = pd.Index(list(TOLERANCE_MAPPING), dtype=object)
+_TOLERANCE_TABLE = np.array([[TOLERANCE_MAPPING[key][column] for column in TOLERANCE_COLUMNS]
+                             for key in TOLERANCE_MAPPING])
+_ALLOY_KEYS = pd.Index(ALLOY_CATEGORIES, dtype=object)
+
+
+def _as_float_array(values) -> np.ndarray:
+    """
+    Numeric array of the given values; anything that is not a number becomes NaN.
+    """
+    return pd.to_numeric(pd.Series(np.asarray(values, dtype=object).ravel()), errors="coerce").to_numpy(dtype=float)
+
+
+def _lookup(keys: pd.Index, values) -> np.ndarray:
+    """
+    Position of each value in `keys`, -1 when it is unknown (missing values included).
+    """
+    return keys.get_indexer(pd.Index(np.asarray(values, dtype=object).ravel(), dtype=object))
+
+
+def geometric_features(weight_kg_per_m, length_m) -> dict:
+    """
+    Here I compute the shape-related geometric features of many profiles at once,
+    derived from their mass and length.
+
+    These metrics are used to estimate profile thickness, manufacturability (DFM), and surface ratios.
+    Invalid inputs (non-numeric, zero or negative weight, zero length) give NaN or inf instead of
+    raising, so one bad row never stops a batch; see `invalid_geometry`.
+
+    Parameters
+    ----------
+    weight_kg_per_m : array-like
+        Mass of each profile per meter.
+    length_m : array-like
+        Length of each profile.
+
+    Returns
+    -------
+    dict[str, numpy.ndarray]
+        'area_mm2' and the rounded GEOMETRIC_COLUMNS.
+    """
+    weight = _as_float_array(weight_kg_per_m)
+    length = _as_float_array(length_m)
+
+    with np.errstate(all="ignore"):
+        area_mm2 = (weight / DENSITY_ALU) * 1e6
+        height = np.sqrt(area_mm2 * 2)
+        width = area_mm2 / height
+        perimeter = 2 * (height + width)
+        thinness_ratio = (4 * np.pi * area_mm2) / (perimeter ** 2)
+        area_to_length = area_mm2 / (length * 1000)
+        wall_factor = area_mm2 / perimeter
+        dfm_index = np.minimum(1.0, 0.7 / (weight ** 0.25))
+
+    return {
+        "area_mm2": area_mm2,
+        "thinness_ratio": np.round(thinness_ratio, 4),
+        "area_to_length": np.round(area_to_length, 5),
+        "wall_factor": np.round(wall_factor, 4),
+        "dfm_index": np.round(dfm_index, 4),
+        "symmetry_score": np.full(weight.shape, 0.8)
+    }
+
+
+def invalid_geometry(features: dict) -> np.ndarray:
+    """
+    Rows whose geometric features could not be computed.
+    """
+    return ~np.all([np.isfinite(features[column]) for column in GEOMETRIC_COLUMNS], axis=0)
+
+
+def tolerance_features(tolerances) -> dict:
+    """
+    Looks up TOLERANCE_MAPPING for every tolerance standard; unknown ones get the DEFAULT values.
+    """
+    codes = _lookup(_TOLERANCE_KEYS, tolerances)
+    rows = _TOLERANCE_TABLE[np.where(codes >= 0, codes, _TOLERANCE_KEYS.get_loc("DEFAULT"))]
+    return {column: rows[:, i] for i, column in enumerate(TOLERANCE_COLUMNS)}
+
+
+def alloy_index(alloys) -> np.ndarray:
+    """
+    Index of every alloy in ALLOY_CATEGORIES; unknown alloys get the last index ("Rå").
+    """
+    codes = _lookup(_ALLOY_KEYS, alloys)
+    return np.where(codes >= 0, codes, len(ALLOY_CATEGORIES) - 1)
+
+
+def derived_features(weight_kg_per_m, length_m, tolerances, alloys, index=None) -> pd.DataFrame:
+    """
+    I use this function to compute every derived feature of a batch of products in a single
+    vectorized pass: geometry, tolerance mapping and alloy encoding.
+
+    Training (`Last_Traitement.prepare_dataset`) and prediction (`Global_System/Page_1.py`)
+    both go through it, so a model always sees features computed the same way it was trained on.
+
+    Parameters
+    ----------
+    weight_kg_per_m : array-like
+        Mass of each profile per meter.
+    length_m : array-like
+        Length of each profile.
+    tolerances : array-like
+        Tolerance standard of each product (e.g. "EN 755-9").
+    alloys : array-like
+        Alloy of each product (e.g. "Aluminium 6061 T6").
+    index : array-like, optional
+        Index of the returned DataFrame.
+
+    Returns
+    -------
+    pandas.DataFrame
+        One row per product, with the FEATURE_COLUMNS.
+    """
+    features = geometric_features(weight_kg_per_m, length_m)
+    features.update(tolerance_features(tolerances))
+    features["alloy_category"] = alloy_index(alloys)
+    return pd.DataFrame({column: features[column] for column in FEATURE_COLUMNS}, index=index)
+
+
+def calculate_geometric_features(weight_kg_per_m, length_m):
+    """
+    Geometric features of a single profile (see `geometric_features`).
+
+    Parameters
+    ----------
+    weight_kg_per_m : float
+        Mass of the profile per meter.
+    length_m : float
+        Length of the profile.
+
+    Returns
+    -------
+    dict
+        Dictionary of calculated features: thinness, area-to-length ratio, wall factor, etc.
+    """
+    features = geometric_features([weight_kg_per_m], [length_m])
+    return {column: features[column][0].item() for column in GEOMETRIC_COLUMNS}
@@ -1,19 +1,39 @@
 import os
 import json
+import joblib
+from concurrent.futures import ThreadPoolExecutor
 import pandas as pd
 import numpy as np
 from typing import List, Optional
 from datetime import datetime
 from pathlib import Path
-from pydantic import BaseModel, Field, validator
+from Json_codec import loads, read_json
+from pydantic import BaseModel, Field, ValidationError, validator
 from sklearn.experimental import enable_iterative_imputer
 from sklearn.impute import IterativeImputer
 from sklearn.ensemble import IsolationForest
 from sklearn.preprocessing import TargetEncoder
 import warnings
 
+try:
+    from pydantic import TypeAdapter
+except ImportError:  # pydantic 1: quotes are validated one by one
+    TypeAdapter = None
+
 warnings.filterwarnings('ignore')
 
+# Fitted preprocessing of step 4, saved next to processed_quotes.csv and with each model version
+PREPROCESSOR_NAME = "preprocessing.pkl"
+IMPUTED_COLUMNS = ['Vikt kg/m', 'Längd/m m', 'ca antal Årsvolym st', 'Kap + truml Pris/st', 'Prix kr/st SEK']
+OUTLIER_COLUMNS = ['Vikt kg/m', 'Längd/m m', 'ca antal Årsvolym st', 'Prix kr/st SEK']
+ENCODED_COLUMNS = ['Profil nr/Kund ref', 'Kund']
+REJECTS_NAME = "quote_rejects.json"
+CLIP_QUANTILES = [0.05, 0.95]
+# Above this many rows, the isolation forest is fitted on a random sample of them
+OUTLIER_FIT_ROWS = 200_000
+# Rows scored at once by the isolation forest, to keep memory bounded on large datasets
+OUTLIER_CHUNK_ROWS = 50_000
+
 # -----------------------------
 # SCHEMA DEFINITIONS (PYDANTIC)
 # -----------------------------
@@ -90,8 +110,7 @@ def load_and_validate_json(file_path: str) -> Quote:
     Loads a JSON file and parses it into a validated Quote object.
     Raises a validation error if structure or types don't match the schema.
     """
-    with open(file_path, 'r', encoding='utf-8') as f:
-        data = json.load(f)
+    data = read_json(file_path)
     return Quote(**data)
 
 
@@ -111,76 +130,365 @@ def flatten_quote(quote: Quote) -> List[dict]:
     return flat_data
 
 
-def advanced_imputation(df: pd.DataFrame) -> pd.DataFrame:
+def _field_columns(model) -> List[tuple]:
+    """
+    (column name, attribute) pairs of a model, the column being the alias when there is one.
+    """
+    fields = getattr(model, "model_fields", None) or model.__fields__
+    return [(field.alias or name, name) for name, field in fields.items()]
+
+
+def _flat_columns() -> dict:
+    """
+    Columns of a flattened quote, in the order `flatten_quote` produces them: a field of the
+    conditions with the same alias as a product field (e.g. 'Legering') keeps the product
+    position but takes the value of the conditions.
+    """
+    columns = {}
+    for part, model in (("metadonnees", Metadata), ("produits", Product), ("conditions", Conditions)):
+        for column, attribute in _field_columns(model):
+            columns[column] = (part, attribute)
+    return columns
+
+
+FLAT_COLUMNS = _flat_columns()
+_QUOTE_ADAPTER = TypeAdapter(Quote) if TypeAdapter is not None else None
+
+
+def _read_quote_file(file_path: str):
+    """
+    Reads one quote file. Returns (data, None), or (None, reject errors) when it is not valid JSON.
+    """
+    try:
+        with open(file_path, 'rb') as f:
+            return loads(f.read()), None
+    except Exception as e:
+        return None, [{"loc": "", "message": str(e), "type": type(e).__name__}]
+
+
+def _reject_errors(errors) -> List[dict]:
+    """
+    pydantic errors as plain dicts.
+    """
+    return [{"loc": ".".join(str(part) for part in error["loc"]), "message": error["msg"], "type": error["type"]}
+            for error in errors]
+
+
+def _validate_quotes(names: List[str], datas: List[dict]):
+    """
+    Validates quotes with the compiled Quote validator (pydantic 2), or Quote(**data) with pydantic 1.
+
+    I validate quote by quote rather than the whole list in one call: on our files it is faster,
+    and an invalid quote does not force a second pass over the valid ones.
+
+    Returns
+    -------
+    tuple[list[tuple[str, Quote]], list[dict]]
+        (file name, quote) pairs and the rejects.
+    """
+    valid, rejects = [], []
+    for name, data in zip(names, datas):
+        try:
+            quote = _QUOTE_ADAPTER.validate_python(data) if _QUOTE_ADAPTER is not None else Quote(**data)
+            valid.append((name, quote))
+        except ValidationError as e:
+            rejects.append({"file": name, "stage": "schema", "errors": _reject_errors(e.errors())})
+        except Exception as e:
+            rejects.append({"file": name, "stage": "schema",
+                            "errors": [{"loc": "", "message": str(e), "type": type(e).__name__}]})
+    return valid, rejects
+
+
+def flatten_quotes(quotes, source_column: Optional[str] = None) -> pd.DataFrame:
+    """
+    Flattens validated quotes straight into the columns of a DataFrame, one row per product line,
+    with the same columns and values as `flatten_quote` but without a dict per product line.
+
+    Parameters
+    ----------
+    quotes : list[tuple[str, Quote]]
+        (file name, quote) pairs.
+    source_column : str, optional
+        Name of a column recording the file name of each row.
+    """
+    columns = {column: [] for column in FLAT_COLUMNS}
+    sources = []
+    for name, quote in quotes:
+        products = quote.produits
+        for column, (part, attribute) in FLAT_COLUMNS.items():
+            if part == "produits":
+                columns[column].extend(getattr(product, attribute) for product in products)
+            else:
+                columns[column].extend([getattr(getattr(quote, part), attribute)] * len(products))
+        sources.extend([name] * len(products))
+    if source_column:
+        columns[source_column] = sources
+    return pd.DataFrame(columns)
+
+
+def load_quotes(directory: str, source_column: Optional[str] = None, workers: Optional[int] = None):
+    """
+    I use this bulk loader to read every quote of a folder at once.
+
+    Files are read in parallel threads, validated in one batch with the compiled pydantic
+    validator, and flattened straight into the columns of a DataFrame.
+    Invalid files are not printed one by one but collected as rejects.
+
+    Parameters
+    ----------
+    directory : str
+        Folder of quote JSON files, read in name order.
+    source_column : str, optional
+        Name of a column recording the file name of each row.
+    workers : int, optional
+        Number of reading threads (Python's default when not given).
+
+    Returns
+    -------
+    tuple[pandas.DataFrame, list[dict]]
+        The flattened rows, and one reject per invalid file: {"file", "stage" ("read" or
+        "schema"), "errors": [{"loc", "message", "type"}]}.
+    """
+    names = sorted(filename for filename in os.listdir(directory) if filename.endswith('.json'))
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        loaded = list(executor.map(_read_quote_file, (os.path.join(directory, name) for name in names)))
+
+    rejects, readable = [], []
+    for name, (data, errors) in zip(names, loaded):
+        if errors is None:
+            readable.append((name, data))
+        else:
+            rejects.append({"file": name, "stage": "read", "errors": errors})
+
+    quotes, schema_rejects = _validate_quotes([name for name, _ in readable], [data for _, data in readable])
+    rejects.extend(schema_rejects)
+    rejects.sort(key=lambda reject: reject["file"])
+    return flatten_quotes(quotes, source_column), rejects
+
+
+def write_rejects_report(rejects: List[dict], path: str) -> Path:
+    """
+    Writes the rejected quote files and their errors as JSON.
+    """
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump({"rejected": len(rejects), "files": rejects}, f, ensure_ascii=False, indent=2)
+    return path
+
+
+def advanced_imputation(df: pd.DataFrame, random_state: Optional[int] = 42) -> pd.DataFrame:
     """
     Performs multivariate imputation on numerical features.
     Here, I relied on iterative imputation to maintain statistical coherence.
     """
-    num_cols = ['Vikt kg/m', 'Längd/m m', 'ca antal Årsvolym st', 'Kap + truml Pris/st', 'Prix kr/st SEK']
-    for col in num_cols:
-        df[col] = pd.to_numeric(df[col], errors='coerce')
-    imputer = IterativeImputer(max_iter=10, random_state=42)
-    df[num_cols] = imputer.fit_transform(df[num_cols])
-    return df
+    return QuotePreprocessor(random_state)._impute(df, fit=True)
 
 
-def handle_outliers(df: pd.DataFrame) -> pd.DataFrame:
+def handle_outliers(df: pd.DataFrame, random_state: Optional[int] = 42) -> pd.DataFrame:
     """
     Detects and handles outliers using isolation forest.
     Each numeric field is clipped to its 5th–95th percentile to smooth anomalies.
     """
-    clf = IsolationForest(contamination=0.05, random_state=42)
-    num_cols = ['Vikt kg/m', 'Längd/m m', 'ca antal Årsvolym st', 'Prix kr/st SEK']
-    df['outlier_flag'] = clf.fit_predict(df[num_cols]) == -1
-    for col in num_cols:
-        df[col] = df[col].clip(df[col].quantile(0.05), df[col].quantile(0.95))
-    return df
+    return QuotePreprocessor(random_state)._handle_outliers(df, fit=True)
 
 
-def advanced_encoding(df: pd.DataFrame) -> pd.DataFrame:
+def advanced_encoding(df: pd.DataFrame, random_state: Optional[int] = 42) -> pd.DataFrame:
     """
     Encodes high-cardinality features using target encoding.
     Also creates a derived feature for price per kilogram.
+    The encoder's cross-fitting folds are shuffled, hence the random_state.
+    """
+    return QuotePreprocessor(random_state)._encode(df, fit=True)
+
+
+class QuotePreprocessor:
     """
-    encoder = TargetEncoder(smooth='auto')
-    high_card_cols = ['Profil nr/Kund ref', 'Kund']
-    for col in high_card_cols:
-        df[col] = encoder.fit_transform(df[[col]], df['Prix kr/st SEK'])
-    df['pris_per_kg'] = df['Prix kr/st SEK'] / (df['Vikt kg/m'] * df['Längd/m m'])
-    return df
+    The fitted preprocessing of step 4: iterative imputation, isolation forest with
+    percentile clipping, and target encoding, kept together so they can be saved and reused.
+
+    `fit_transform` gives exactly what the three functions above give on a fresh fit.
+    `transform` applies the stored transformers to new quotes without refitting anything,
+    which is what incremental runs need. I also keep the mean and standard deviation of every
+    imputed column at fit time, so `drift` can tell when the data moved away from them.
+
+    The isolation forest uses `workers` cores (0 = all), is fitted on at most `max_fit_rows`
+    random rows and scores the data by chunks of `chunk_rows`, so years of quotes fit in memory.
+    Below `max_fit_rows`, the result is the same as a single-threaded fit on every row.
+    """
+
+    # Class defaults, so preprocessors saved before these options existed still load
+    workers = 1
+    max_fit_rows = OUTLIER_FIT_ROWS
+    chunk_rows = OUTLIER_CHUNK_ROWS
+
+    def __init__(self, random_state: Optional[int] = 42, workers: int = 1,
+                 max_fit_rows: int = OUTLIER_FIT_ROWS, chunk_rows: int = OUTLIER_CHUNK_ROWS):
+        self.random_state = random_state
+        self.workers = workers
+        self.max_fit_rows = max_fit_rows
+        self.chunk_rows = chunk_rows
+        self.imputer = None
+        self.outlier_model = None
+        self.clip_bounds = {}
+        self.encoders = {}
+        self.reference = {}
+        self.fitted_at = None
+        self.n_rows = 0
+
+    @property
+    def is_fitted(self) -> bool:
+        return self.imputer is not None
+
+    def _impute(self, df: pd.DataFrame, fit: bool) -> pd.DataFrame:
+        for col in IMPUTED_COLUMNS:
+            df[col] = pd.to_numeric(df[col], errors='coerce')
+        if fit:
+            self.imputer = IterativeImputer(max_iter=10, random_state=self.random_state)
+            df[IMPUTED_COLUMNS] = self.imputer.fit_transform(df[IMPUTED_COLUMNS])
+        else:
+            df[IMPUTED_COLUMNS] = self.imputer.transform(df[IMPUTED_COLUMNS])
+        return df
+
+    def _handle_outliers(self, df: pd.DataFrame, fit: bool) -> pd.DataFrame:
+        values = df[OUTLIER_COLUMNS]
+        if fit:
+            self.outlier_model = IsolationForest(contamination=0.05, random_state=self.random_state)
+            if len(values) > self.max_fit_rows:
+                self.outlier_model.set_params(n_jobs=self.workers or -1).fit(
+                    values.sample(n=self.max_fit_rows, random_state=self.random_state))
+            else:
+                self.outlier_model.set_params(n_jobs=self.workers or -1).fit(values)
+            bounds = values.quantile(CLIP_QUANTILES)
+            self.clip_bounds = {col: (bounds.at[CLIP_QUANTILES[0], col], bounds.at[CLIP_QUANTILES[1], col])
+                                for col in OUTLIER_COLUMNS}
+        else:
+            self.outlier_model.set_params(n_jobs=self.workers or -1)
+
+        flags = [self.outlier_model.predict(values.iloc[start:start + self.chunk_rows]) == -1
+                 for start in range(0, len(values), self.chunk_rows)]
+        df['outlier_flag'] = np.concatenate(flags) if flags else np.zeros(0, dtype=bool)
+        # Column by column, so only one clipped column is held at a time
+        for col in OUTLIER_COLUMNS:
+            df[col] = df[col].clip(*self.clip_bounds[col])
+        return df
+
+    def _encode(self, df: pd.DataFrame, fit: bool) -> pd.DataFrame:
+        for col in ENCODED_COLUMNS:
+            if fit:
+                self.encoders[col] = TargetEncoder(smooth='auto', random_state=self.random_state)
+                df[col] = self.encoders[col].fit_transform(df[[col]], df['Prix kr/st SEK'])
+            else:
+                df[col] = self.encoders[col].transform(df[[col]])
+        df['pris_per_kg'] = df['Prix kr/st SEK'] / (df['Vikt kg/m'] * df['Längd/m m'])
+        return df
+
+    def fit_transform(self, df: pd.DataFrame) -> pd.DataFrame:
+        """
+        Fits every transformer on the given quotes and returns them preprocessed.
+        """
+        for col in IMPUTED_COLUMNS:
+            values = pd.to_numeric(df[col], errors='coerce')
+            self.reference[col] = (float(values.mean()), float(values.std(ddof=0)))
+        df = self._impute(df, fit=True)
+        df = self._handle_outliers(df, fit=True)
+        df = self._encode(df, fit=True)
+        self.fitted_at = datetime.now().isoformat(timespec="seconds")
+        self.n_rows = len(df)
+        return df
+
+    def transform(self, df: pd.DataFrame) -> pd.DataFrame:
+        """
+        Preprocesses quotes with the stored transformers, without refitting them.
+        """
+        if not self.is_fitted:
+            raise ValueError("The preprocessor is not fitted yet; call fit_transform first.")
+        df = self._impute(df, fit=False)
+        df = self._handle_outliers(df, fit=False)
+        return self._encode(df, fit=False)
+
+    def drift(self, df: pd.DataFrame) -> float:
+        """
+        Largest shift of the mean of an imputed column since the fit, in standard deviations
+        of that column at fit time (0 when nothing moved).
+        """
+        shifts = [0.0]
+        for col, (mean, std) in self.reference.items():
+            values = pd.to_numeric(df[col], errors='coerce')
+            if values.notna().any() and not np.isnan(mean):
+                shifts.append(abs(float(values.mean()) - mean) / (std or 1.0))
+        return max(shifts)
+
+    def save(self, path) -> Path:
+        """
+        Saves the fitted preprocessor with joblib, like the models.
+        """
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_suffix(path.suffix + ".tmp")
+        joblib.dump(self, tmp)
+        os.replace(tmp, path)
+        return path
+
+    @staticmethod
+    def load(path) -> "QuotePreprocessor":
+        return joblib.load(path)
 
 
 # --------------------------------------
 # MAIN PIPELINE FUNCTION
 # --------------------------------------
 
-def process_quote_files(directory: str) -> pd.DataFrame:
+def process_quote_files(directory: str, source_column: Optional[str] = None,
+                        random_state: Optional[int] = 42, preprocessor_path: Optional[str] = None,
+                        refit: bool = True, drift_threshold: float = 0.5,
+                        rejects_path: Optional[str] = None, outlier_workers: int = 1,
+                        new_files: Optional[List[str]] = None) -> pd.DataFrame:
     """
-    This function reads all valid JSON quotes from the given directory.
-    Each file is validated and flattened, then the resulting DataFrame
+    This function reads all valid JSON quotes from the given directory, in name order.
+    Each file is validated and flattened (see `load_quotes`), then the resulting DataFrame
     undergoes imputation, outlier smoothing, and encoding.
+    When source_column is given, each row also records the name of its quote file.
+    random_state seeds the imputer, the isolation forest and the target encoder.
+
+    With preprocessor_path, the fitted transformers are saved there (see `QuotePreprocessor`).
+    When refit is False and a preprocessor is already saved, I only transform the quotes with it,
+    unless their numeric columns drifted by more than drift_threshold standard deviations
+    since the fit; then I refit and save it again. With new_files (the quote files added since
+    the fit), the drift is measured on their rows only, so a small upload is not diluted by the
+    quotes the preprocessing was fitted on.
+    Invalid files are skipped and, with rejects_path, listed there with their errors.
+    outlier_workers is the number of cores of the isolation forest (0 = all).
     """
-    all_quotes = []
-    for filename in os.listdir(directory):
-        if filename.endswith('.json'):
-            file_path = os.path.join(directory, filename)
-            try:
-                quote = load_and_validate_json(file_path)
-                flat_data = flatten_quote(quote)
-                all_quotes.extend(flat_data)
-            except Exception as e:
-                print(f"⚠️ Skipping {filename} due to error: {e}")
-
-    if not all_quotes:
+    # The rows of new_files are found through their source, even when the caller does not want it
+    source = source_column or ("_source_file" if new_files is not None else None)
+    internal_columns = [source] if source != source_column else []
+    df, rejects = load_quotes(directory, source)
+    if rejects_path:
+        write_rejects_report(rejects, rejects_path)
+    if rejects:
+        names = ", ".join(reject["file"] for reject in rejects[:5]) + (", ..." if len(rejects) > 5 else "")
+        print(f"⚠️ Skipped {len(rejects)} invalid quote file(s): {names}"
+              + (f" (details in {rejects_path})" if rejects_path else ""))
+
+    if df.empty:
         print("⚠️ No valid quotes found.")
         return pd.DataFrame()
 
-    df = pd.DataFrame(all_quotes)
-    df = advanced_imputation(df)
-    df = handle_outliers(df)
-    df = advanced_encoding(df)
-
-    return df
+    if not refit and preprocessor_path and os.path.exists(preprocessor_path):
+        preprocessor = QuotePreprocessor.load(preprocessor_path)
+        preprocessor.workers = outlier_workers
+        drift = preprocessor.drift(df if new_files is None else df[df[source].isin(new_files)])
+        if drift <= drift_threshold:
+            print(f"♻️ Reusing the preprocessing fitted on {preprocessor.n_rows} rows ({preprocessor.fitted_at}).")
+            return preprocessor.transform(df).drop(columns=internal_columns)
+        print(f"⚠️ Data drifted by {drift:.2f} std since the preprocessing was fitted: refitting it.")
+
+    preprocessor = QuotePreprocessor(random_state, workers=outlier_workers)
+    df = preprocessor.fit_transform(df)
+    if preprocessor_path:
+        preprocessor.save(preprocessor_path)
+    return df.drop(columns=internal_columns)
 
 
 # --------------------------------------
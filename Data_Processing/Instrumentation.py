@@ -0,0 +1,201 @@
+import cProfile
+import json
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+REPORT_NAME = "run_report.json"
+
+
+def _scan_files(paths, since=None):
+    """
+    Counts the files (and their total size) under the given files or folders.
+    With `since`, only files modified at or after that timestamp are counted.
+    """
+    count, size = 0, 0
+    for path in paths:
+        path = Path(path)
+        if path.is_file():
+            candidates = [path]
+        elif path.is_dir():
+            candidates = (p for p in path.rglob("*") if p.is_file())
+        else:
+            continue
+        for file in candidates:
+            stat = file.stat()
+            if since is not None and stat.st_mtime < since:
+                continue
+            count += 1
+            size += stat.st_size
+    return count, size
+
+
+def _reset_peak_rss():
+    """
+    Resets the peak RSS counter of the process where the OS allows it (Linux),
+    so each stage reports its own peak. Returns whether the reset worked.
+    """
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+        return True
+    except OSError:
+        return False
+
+
+def _peak_rss_mb():
+    """
+    Peak resident memory of the process in MB, or None when it cannot be measured.
+    """
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return round(int(line.split()[1]) / 1024, 1)
+    except OSError:
+        pass
+    if psutil is not None:
+        info = psutil.Process().memory_info()
+        peak = getattr(info, "peak_wset", None) or info.rss
+        return round(peak / 1024 ** 2, 1)
+    if resource is not None:
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # ru_maxrss is in bytes on macOS and in KB elsewhere
+        return round(peak / (1024 ** 2 if sys.platform == "darwin" else 1024), 1)
+    return None
+
+
+def _cpu_seconds():
+    """
+    CPU time of this process and of its finished children (worker pools).
+    """
+    times = os.times()
+    return times.user + times.system + times.children_user + times.children_system
+
+
+class PipelineInstrumentation:
+    """
+    Collects wall time, CPU time, peak RSS, files and bytes in and out for each pipeline stage.
+
+    Files and bytes are measured on the folders a stage declares: everything under its
+    inputs is counted as read, and files under its outputs modified during the stage
+    as written. Peak RSS is per stage on Linux, and the process high-water mark elsewhere.
+    A single stage can also be run under cProfile and dumped as a .prof file.
+
+    CPU time and peak RSS are process counters: stages running at the same time (step 9
+    next to steps 5-8) share them. Their records then say so ("cpu_scope" and
+    "peak_rss_scope" set to "process") and list the other stages in "concurrent_with".
+    """
+
+    def __init__(self, profile_stage: str = None, profile_dir: str = None):
+        self.stages = []
+        self.profile_stage = profile_stage
+        self.profile_dir = profile_dir
+        self.started_at = datetime.now().isoformat(timespec="seconds")
+        # Running stages (token -> name and the stages that overlapped it), shared by the stage threads
+        self._lock = threading.Lock()
+        self._running = {}
+
+    @contextmanager
+    def stage(self, name: str, inputs=(), outputs=()):
+        """
+        Measures the enclosed block as one stage.
+
+        Parameters
+        ----------
+        name : str
+            Stage name used in the report.
+        inputs : list[str]
+            Files or folders the stage reads.
+        outputs : list[str]
+            Files or folders the stage writes.
+        """
+        files_in, bytes_read = _scan_files(inputs)
+        token, current = object(), {"name": name, "concurrent_with": set()}
+        with self._lock:
+            for other in self._running.values():
+                other["concurrent_with"].add(name)
+                current["concurrent_with"].add(other["name"])
+            self._running[token] = current
+            # Resetting the peak while another stage runs would cut its measurement short
+            per_stage_peak = not current["concurrent_with"] and _reset_peak_rss()
+        profiler = cProfile.Profile() if name == self.profile_stage else None
+
+        # mtimes have a coarse resolution on some filesystems, hence the small margin
+        started = time.time() - 1
+        wall_start, cpu_start = time.perf_counter(), _cpu_seconds()
+        if profiler is not None:
+            profiler.enable()
+        try:
+            yield
+        finally:
+            if profiler is not None:
+                profiler.disable()
+            wall = time.perf_counter() - wall_start
+            cpu = _cpu_seconds() - cpu_start
+            peak_rss = _peak_rss_mb()
+            with self._lock:
+                del self._running[token]
+                concurrent = sorted(current["concurrent_with"])
+            files_out, bytes_written = _scan_files(outputs, since=started)
+            record = {
+                "stage": name,
+                "wall_s": round(wall, 4),
+                "cpu_s": round(cpu, 4),
+                "cpu_scope": "process" if concurrent else "stage",
+                "peak_rss_mb": peak_rss,
+                "peak_rss_scope": "stage" if per_stage_peak and not concurrent else "process",
+                "files_in": files_in,
+                "files_out": files_out,
+                "bytes_read": bytes_read,
+                "bytes_written": bytes_written,
+            }
+            if concurrent:
+                record["concurrent_with"] = concurrent
+            if profiler is not None:
+                profile_dir = Path(self.profile_dir or ".")
+                profile_dir.mkdir(parents=True, exist_ok=True)
+                profile_path = profile_dir / f"{name}.prof"
+                profiler.dump_stats(str(profile_path))
+                record["profile"] = str(profile_path)
+            self.stages.append(record)
+            print(f"[STAGE] {name}: {wall:.2f}s wall, {cpu:.2f}s CPU, "
+                  f"{files_in}→{files_out} files, {bytes_written / 1024:.0f} KB written")
+
+    def skip(self, name: str):
+        """
+        Records a stage that was not run because its checkpoint was still valid.
+        """
+        self.stages.append({"stage": name, "skipped": True})
+
+    def to_dict(self) -> dict:
+        return {
+            "started_at": self.started_at,
+            "total_wall_s": round(sum(s.get("wall_s", 0) for s in self.stages), 4),
+            "stages": self.stages,
+        }
+
+    def write(self, folder: str, name: str = REPORT_NAME) -> Path:
+        """
+        Writes the run report as JSON into the given folder.
+        """
+        path = Path(folder) / name
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.to_dict(), f, ensure_ascii=False, indent=2)
+        print(f"📈 Run report saved to: {path}")
+        return path
@@ -0,0 +1,136 @@
+import json
+import math
+import os
+from contextlib import contextmanager
+from pathlib import Path
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Compact JSON everywhere, indented JSON only in debug mode. The switch is an environment
+# variable so that the worker processes of a stage inherit it.
+PRETTY_ENV = "ODENS_JSON_PRETTY"
+BACKEND = "orjson" if orjson is not None else "json"
+
+if orjson is not None:
+    _COMPACT = orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+    _PRETTY = _COMPACT | orjson.OPT_INDENT_2
+
+
+def set_pretty(enabled: bool):
+    """
+    Turns indented output on (debug mode) or off, for this process and the ones it starts.
+    """
+    os.environ[PRETTY_ENV] = "1" if enabled else "0"
+
+
+def pretty_enabled() -> bool:
+    return os.environ.get(PRETTY_ENV) == "1"
+
+
+@contextmanager
+def pretty_output(enabled: bool):
+    """
+    `set_pretty` for the duration of a block (e.g. one pipeline run): the previous setting is
+    restored afterwards, so later writes of the same process are not affected.
+    """
+    previous = os.environ.get(PRETTY_ENV)
+    set_pretty(enabled)
+    try:
+        yield
+    finally:
+        if previous is None:
+            os.environ.pop(PRETTY_ENV, None)
+        else:
+            os.environ[PRETTY_ENV] = previous
+
+
+def _default(obj):
+    """
+    numpy scalars that are not Python number subclasses (e.g. numpy.int64).
+    """
+    if hasattr(obj, "item"):
+        return obj.item()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def _has_non_finite(obj) -> bool:
+    """
+    Whether a NaN or an infinity is nested anywhere in the object.
+    """
+    stack = [obj]
+    while stack:
+        value = stack.pop()
+        if isinstance(value, float):
+            if not math.isfinite(value):
+                return True
+        elif isinstance(value, dict):
+            stack.extend(value.values())
+        elif isinstance(value, (list, tuple)):
+            stack.extend(value)
+    return False
+
+
+def dumps(obj, pretty: bool = None) -> bytes:
+    """
+    Encodes an object as UTF-8 JSON bytes (non-ASCII characters are kept as they are).
+
+    I use orjson when it is installed and the standard library otherwise. orjson writes NaN
+    as null, while the pipeline has always written NaN (and read it back as a float), so the
+    rare objects holding a NaN or an infinity still go through the standard library.
+
+    Parameters
+    ----------
+    obj : object
+        Object to encode.
+    pretty : bool, optional
+        Indent the output. By default only in debug mode (see `set_pretty`).
+
+    Returns
+    -------
+    bytes
+    """
+    if pretty is None:
+        pretty = pretty_enabled()
+    if orjson is not None:
+        try:
+            data = orjson.dumps(obj, default=_default, option=_PRETTY if pretty else _COMPACT)
+            if b"null" not in data or not _has_non_finite(obj):
+                return data
+        except TypeError:
+            pass  # e.g. integers beyond 64 bits
+    text = json.dumps(obj, ensure_ascii=False, default=_default, indent=2 if pretty else None,
+                      separators=None if pretty else (",", ":"))
+    return text.encode("utf-8")
+
+
+def loads(data):
+    """
+    Decodes JSON from bytes or str, with the standard library as fallback (e.g. for NaN).
+    """
+    if orjson is not None:
+        try:
+            return orjson.loads(data)
+        except orjson.JSONDecodeError:
+            pass
+    return json.loads(data)
+
+
+def read_json(path):
+    """
+    Reads a JSON file.
+    """
+    with open(path, "rb") as f:
+        return loads(f.read())
+
+
+def write_json(obj, path, pretty: bool = None) -> int:
+    """
+    Writes an object as a JSON file (see `dumps`). Returns the number of bytes written.
+    """
+    data = dumps(obj, pretty)
+    with open(Path(path), "wb") as f:
+        f.write(data)
+    return len(data)
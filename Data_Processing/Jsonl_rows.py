@@ -0,0 +1,162 @@
+import os
+from itertools import islice
+from pathlib import Path
+
+import pandas as pd
+from Handling import write_rejects_report
+from Json_codec import loads
+
+# Line-delimited exports accepted in extra_json_folder, next to the single JSON rows
+JSONL_SUFFIXES = (".jsonl", ".ndjson")
+EXTRA_ROWS_DIR = "extra_rows"
+EXTRA_REJECTS_NAME = "extra_rejects.json"
+TARGET_COLUMN = "Pris_kr_st_SEK"
+# Errors kept per file in the rejects report; the count is always complete
+MAX_REPORTED_ERRORS = 100
+
+
+def _parse_lines(lines):
+    """
+    Parses numbered lines. Returns the JSON objects and the errors of the other lines.
+    """
+    records, errors = [], []
+    for line_no, line in lines:
+        if not line.strip():
+            continue
+        try:
+            record = loads(line)
+        except ValueError as e:
+            errors.append({"loc": f"line {line_no}", "message": str(e), "type": type(e).__name__})
+            continue
+        if isinstance(record, dict):
+            records.append((line_no, record))
+        else:
+            errors.append({"loc": f"line {line_no}", "message": "A row must be a JSON object.",
+                           "type": "not_an_object"})
+    return records, errors
+
+
+def validate_chunk(records):
+    """
+    Validates a chunk of training rows at once: every row needs a numeric target price.
+
+    Parameters
+    ----------
+    records : list[tuple[int, dict]]
+        (line number, row) pairs.
+
+    Returns
+    -------
+    tuple[pandas.DataFrame, list[dict]]
+        The valid rows, and the errors of the rejected ones.
+    """
+    df = pd.DataFrame.from_records([record for _, record in records])
+    line_numbers = pd.Series([line_no for line_no, _ in records])
+    if df.empty:
+        return df, []
+    if TARGET_COLUMN not in df.columns:
+        return df.iloc[0:0], [{"loc": f"line {line_no}", "message": f"Missing '{TARGET_COLUMN}'.",
+                               "type": "missing"} for line_no in line_numbers]
+
+    target = pd.to_numeric(df[TARGET_COLUMN], errors="coerce")
+    invalid = target.isna().to_numpy()
+    errors = [{"loc": f"line {line_no}", "message": f"'{TARGET_COLUMN}' must be a number.", "type": "not_a_number"}
+              for line_no in line_numbers[invalid]]
+    return df[~invalid], errors
+
+
+def import_jsonl(jsonl_path: str, output_csv: str, chunk_size: int = 10_000):
+    """
+    I use this function to stream a JSONL / NDJSON export of training rows into a CSV,
+    chunk by chunk, so an archive of hundreds of thousands of rows never sits in memory at once.
+
+    The first valid chunk fixes the columns; columns that only appear later are dropped,
+    and rows missing a column get an empty value.
+
+    Parameters
+    ----------
+    jsonl_path : str
+        One JSON object (a training row, as in 'json_ready') per line.
+    output_csv : str
+        CSV written atomically, one row per valid line.
+    chunk_size : int, optional
+        Number of lines parsed and validated at once.
+
+    Returns
+    -------
+    tuple[int, dict or None]
+        Number of rows written, and the reject entry of the file (None when every line is valid).
+    """
+    output_csv = Path(output_csv)
+    output_csv.parent.mkdir(parents=True, exist_ok=True)
+    tmp = output_csv.with_suffix(output_csv.suffix + ".tmp")
+
+    columns, dropped = None, set()
+    written, rejected, errors = 0, 0, []
+    with open(jsonl_path, "r", encoding="utf-8") as source, open(tmp, "w", encoding="utf-8", newline="") as out:
+        numbered = enumerate(source, start=1)
+        while True:
+            lines = list(islice(numbered, chunk_size))
+            if not lines:
+                break
+            records, chunk_errors = _parse_lines(lines)
+            df, schema_errors = validate_chunk(records)
+            chunk_errors += schema_errors
+            rejected += len(chunk_errors)
+            errors.extend(chunk_errors[:MAX_REPORTED_ERRORS - len(errors)])
+            if df.empty:
+                continue
+            if columns is None:
+                columns = list(df.columns)
+                df.to_csv(out, index=False)
+            else:
+                dropped.update(set(df.columns) - set(columns))
+                df.reindex(columns=columns).to_csv(out, header=False, index=False)
+            written += len(df)
+    os.replace(tmp, output_csv)
+
+    if dropped:
+        print(f"⚠️ {Path(jsonl_path).name}: columns absent from the first rows were dropped: {sorted(dropped)}")
+    if not rejected:
+        return written, None
+    return written, {"file": Path(jsonl_path).name, "stage": "jsonl", "rejected_lines": rejected, "errors": errors}
+
+
+def jsonl_exports(extra_folder_path: str) -> list:
+    """
+    The JSONL / NDJSON files of a folder, in name order.
+    """
+    extra_path = Path(extra_folder_path)
+    if not extra_path.is_dir():
+        return []
+    return sorted(p for p in extra_path.iterdir() if p.suffix.lower() in JSONL_SUFFIXES)
+
+
+def import_jsonl_folder(extra_folder_path: str, output_dir: str, chunk_size: int = 10_000, exports=None):
+    """
+    Imports every JSONL / NDJSON file of extra_json_folder as '{output_dir}/extra_rows/{name}.csv'
+    (see `import_jsonl`), and lists the rejected lines in '{output_dir}/extra_rejects.json'.
+    With exports (paths), only those files are imported, e.g. the new or changed ones.
+
+    Returns
+    -------
+    list[str]
+        Names of the CSV files written in 'extra_rows'.
+    """
+    if exports is None:
+        exports = jsonl_exports(extra_folder_path)
+    if not exports:
+        return []
+
+    rows_dir = Path(output_dir) / EXTRA_ROWS_DIR
+    imported, rejects = [], []
+    for export in exports:
+        written, reject = import_jsonl(str(export), str(rows_dir / f"{export.stem}.csv"), chunk_size)
+        imported.append(f"{export.stem}.csv")
+        if reject:
+            rejects.append(reject)
+        print(f"[INFO]  Imported {written} rows of '{export.name}' into {rows_dir}"
+              + (f" ({reject['rejected_lines']} rejected)" if reject else ""))
+
+    write_rejects_report(rejects, str(Path(output_dir) / EXTRA_REJECTS_NAME))
+    return imported
@@ -1,72 +1,30 @@
-import json
-import math
 import os
-import random
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
 from pathlib import Path
 
-# === TOLERANCE MAPPING ===
-# This table encodes geometric tolerance characteristics for different industrial standards.
-# It's helpful for scoring manufacturability or calculating derived metrics.
-TOLERANCE_MAPPING = {
-    "EN 755-9": {"linear_tol": 0.15, "angular_tol": 0.5, "flatness": 0.2, "gd_t_index": 2.1},
-    "ISO 2768-m": {"linear_tol": 0.1, "angular_tol": 0.3, "flatness": 0.15, "gd_t_index": 2.8},
-    "ASME Y14.5": {"linear_tol": 0.05, "angular_tol": 0.2, "flatness": 0.1, "gd_t_index": 3.5},
-    "DIN 7168": {"linear_tol": 0.08, "angular_tol": 0.25, "flatness": 0.12, "gd_t_index": 3.0},
-    "ISO 286": {"linear_tol": 0.06, "angular_tol": 0.22, "flatness": 0.08, "gd_t_index": 3.2},
-    "JIS B 0401": {"linear_tol": 0.07, "angular_tol": 0.28, "flatness": 0.11, "gd_t_index": 2.9},
-    "ISO 2768-1": {"linear_tol": 0.09, "angular_tol": 0.31, "flatness": 0.14, "gd_t_index": 2.7},
-    "ISO 8015": {"linear_tol": 0.04, "angular_tol": 0.18, "flatness": 0.07, "gd_t_index": 3.6},
-    "ASME B4.1": {"linear_tol": 0.12, "angular_tol": 0.35, "flatness": 0.18, "gd_t_index": 2.5},
-    "BS 4500": {"linear_tol": 0.11, "angular_tol": 0.33, "flatness": 0.16, "gd_t_index": 2.6},
-    "ISO 1829": {"linear_tol": 0.13, "angular_tol": 0.4, "flatness": 0.19, "gd_t_index": 2.4},
-    "DEFAULT": {"linear_tol": 0.3, "angular_tol": 1.0, "flatness": 0.5, "gd_t_index": 1.0}
-}
-
-# List of alloy categories used to encode categorical material types
-ALLOY_CATEGORIES = [
-    "Aluminium 1050 Rå", "Aluminium 2017 T4", "Aluminium 3003 H14",
-    "Aluminium 4043 O", "Aluminium 5083 H111", "Aluminium 6061 T6",
-    "Aluminium 7075 T651", "Aluminium 2024 T351", "Rå"
-]
-
-# Material density (aluminium) in kg/m³
-DENSITY_ALU = 2700
-
-def calculate_geometric_features(weight_kg_per_m, length_m):
-    """
-    Here I compute a set of shape-related geometric features derived from product mass and length.
-
-    These metrics are used to estimate profile thickness, manufacturability (DFM), and surface ratios.
-
-    Parameters
-    ----------
-    weight_kg_per_m : float
-        Mass of the profile per meter.
-    length_m : float
-        Length of the profile.
+import numpy as np
+from Columnar import read_records, write_records
+from Features import derived_features, invalid_geometry
+from Json_codec import read_json, write_json
+from Seeding import substream
 
-    Returns
-    -------
-    dict
-        Dictionary of calculated features: thinness, area-to-length ratio, wall factor, etc.
-    """
-    area_mm2 = (weight_kg_per_m / DENSITY_ALU) * 1e6
-    height = math.sqrt(area_mm2 * 2)
-    width = area_mm2 / height
-    perimeter = 2 * (height + width)
-    thinness_ratio = (4 * math.pi * area_mm2) / (perimeter ** 2)
-    area_to_length = area_mm2 / (length_m * 1000)
-    wall_factor = area_mm2 / perimeter
-    dfm_index = min(1.0, 0.7 / (weight_kg_per_m ** 0.25))
-    symmetry_score = 0.8
-
-    return {
-        "thinness_ratio": round(thinness_ratio, 4),
-        "area_to_length": round(area_to_length, 5),
-        "wall_factor": round(wall_factor, 4),
-        "dfm_index": round(dfm_index, 4),
-        "symmetry_score": round(symmetry_score, 4)
-    }
+# Training row fields and the keys they may have in a product record
+FIELD_KEYS = {
+    "Vikt_kg_m": ["Vikt kg/m", "Weight kg/m"],
+    "Längd_m_m": ["Längd/m m", "Length/m"],
+    "Kap_truml_Pris_st": ["Kap + truml Pris/st"],
+    "Årsvolym_st": ["ca antal Årsvolym st"],
+    "Verktygskostnad": ["Verktygskostnad"],
+    "Lev_tid": ["Lev. tid"],
+    "NOT": ["NOT"],
+    "alloy_series": ["alloy_series"],
+    "alloy_strength": ["alloy_strength"],
+    "temper_code": ["temper_code"],
+    "european_std": ["european_std"],
+    "Råvara": ["Råvara"],
+    "Pris_kr_st_SEK": ["Prix kr/st SEK"]
+}
 
 def find_key(data, possible_keys):
     """
@@ -94,12 +52,95 @@ def find_key(data, possible_keys):
             return data[key]
     raise KeyError(f"None of {possible_keys} found in: {data.keys()}")
 
-def process_single_file(input_path, output_path):
+def process_records(records, rngs):
+    """
+    Adds the derived features to a batch of product records.
+
+    I pick the training fields of every record, then compute geometry, tolerance mappings
+    and alloy encoding for the whole batch in one vectorized pass (`Features.derived_features`),
+    and finally add the simulated LME prices from each record's own random stream.
+
+    Parameters
+    ----------
+    records : list[dict]
+        Product records, as produced by step 7.
+    rngs : list[numpy.random.Generator or None]
+        Random stream of each record for the simulated LME prices (see `Seeding.substream`).
+
+    Returns
+    -------
+    list[dict or Exception]
+        The training row of each record, or the error that prevented it.
+    """
+    results = [None] * len(records)
+    rows, positions, tolerances, alloys = [], [], [], []
+    for i, data in enumerate(records):
+        try:
+            row = {name: find_key(data, keys) for name, keys in FIELD_KEYS.items()}
+            tolerance = find_key(data, ["Toleranser"])
+            alloy = find_key(data, ["Legering"])
+        except KeyError as e:
+            results[i] = e
+            continue
+        rows.append(row)
+        positions.append(i)
+        tolerances.append(tolerance)
+        alloys.append(alloy)
+
+    # Geometry & material-based metrics, tolerance mapping and alloy index
+    features = derived_features([row["Vikt_kg_m"] for row in rows], [row["Längd_m_m"] for row in rows],
+                                tolerances, alloys)
+    invalid = invalid_geometry(features)
+
+    for row, i, feature_row, bad in zip(rows, positions, features.to_dict("records"), invalid):
+        if bad:
+            results[i] = ValueError(f"Invalid weight or length: {row['Vikt_kg_m']!r} kg/m, {row['Längd_m_m']!r} m")
+            continue
+        row.update(feature_row)
+
+        # Simulate LME price indicators
+        try:
+            ma3, lag1 = (rngs[i] or np.random.default_rng()).random(2)
+            base_price = row["Råvara"]
+            row["LME_price_MA3"] = round(base_price * (0.9 + 0.2 * ma3), 2)
+            row["LME_price_Lag1"] = round(base_price * (0.95 + 0.1 * lag1), 2)
+        except Exception as e:
+            results[i] = e
+            continue
+        results[i] = row
+    return results
+
+def process_record(data, rng=None):
+    """
+    Adds the derived features to a single product record (see `process_records`).
+
+    Parameters
+    ----------
+    data : dict
+        Product record, as produced by step 7.
+    rng : numpy.random.Generator, optional
+        Random stream of this record for the simulated LME prices.
+
+    Returns
+    -------
+    dict
+        The training row.
+
+    Raises
+    ------
+    KeyError
+        If a required field is missing.
+    ValueError
+        If the weight or length cannot give a geometry.
     """
-    Processes a single product JSON file and adds derived features.
+    result = process_records([data], [rng])[0]
+    if isinstance(result, Exception):
+        raise result
+    return result
 
-    I include geometry, alloy encoding, tolerance mappings,
-    and simulated LME prices for enrichment.
+def process_single_file(input_path, output_path, seed=None):
+    """
+    Processes a single product JSON file and adds derived features (see `process_record`).
 
     Parameters
     ----------
@@ -107,6 +148,8 @@ def process_single_file(input_path, output_path):
         Path to the original file.
     output_path : str
         Destination where the processed file will be saved.
+    seed : int, optional
+        Seed of the run; the LME draws of the file come from its own stream.
 
     Returns
     -------
@@ -114,58 +157,50 @@ def process_single_file(input_path, output_path):
         Whether the file was successfully processed.
     """
     try:
-        with open(input_path, 'r', encoding='utf-8') as f:
-            data = json.load(f)
-
-        processed = {
-            "Vikt_kg_m": find_key(data, ["Vikt kg/m", "Weight kg/m"]),
-            "Längd_m_m": find_key(data, ["Längd/m m", "Length/m"]),
-            "Kap_truml_Pris_st": find_key(data, ["Kap + truml Pris/st"]),
-            "Årsvolym_st": find_key(data, ["ca antal Årsvolym st"]),
-            "Verktygskostnad": find_key(data, ["Verktygskostnad"]),
-            "Lev_tid": find_key(data, ["Lev. tid"]),
-            "NOT": find_key(data, ["NOT"]),
-            "alloy_series": find_key(data, ["alloy_series"]),
-            "alloy_strength": find_key(data, ["alloy_strength"]),
-            "temper_code": find_key(data, ["temper_code"]),
-            "european_std": find_key(data, ["european_std"]),
-            "Råvara": find_key(data, ["Råvara"]),
-            "Pris_kr_st_SEK": find_key(data, ["Prix kr/st SEK"])
-        }
-
-        # Geometry & material-based metrics
-        processed.update(calculate_geometric_features(
-            processed["Vikt_kg_m"],
-            processed["Längd_m_m"]
-        ))
-
-        # Tolerance mapping
-        tolerance = find_key(data, ["Toleranser"])
-        processed.update(TOLERANCE_MAPPING.get(tolerance, TOLERANCE_MAPPING["DEFAULT"]))
-
-        # Encode alloy category as index
-        alloy = find_key(data, ["Legering"])
-        processed["alloy_category"] = ALLOY_CATEGORIES.index(alloy) if alloy in ALLOY_CATEGORIES else len(ALLOY_CATEGORIES) - 1
+        data = read_json(input_path)
 
-        # Simulate LME price indicators
-        base_price = processed["Råvara"]
-        processed["LME_price_MA3"] = round(base_price * random.uniform(0.9, 1.1), 2)
-        processed["LME_price_Lag1"] = round(base_price * random.uniform(0.95, 1.05), 2)
+        processed = process_record(data, substream(seed, "lme", Path(input_path).stem))
 
-        with open(output_path, 'w', encoding='utf-8') as f:
-            json.dump(processed, f, indent=2, ensure_ascii=False)
+        write_json(processed, output_path)
         return True
 
     except Exception as e:
         print(f"✗ Failed: {os.path.basename(input_path)} → {str(e)}")
         return False
 
-def prepare_dataset(input_dir, output_dir):
+def _prepare_files(files, input_dir, output_dir, seed):
+    """
+    Processes a batch of files (run in a worker) and returns (file, success) pairs.
+    The features of the whole batch are computed in one vectorized pass.
+    """
+    success = dict.fromkeys(files, False)
+    loaded, records = [], []
+    for file in files:
+        try:
+            records.append(read_json(os.path.join(input_dir, file)))
+            loaded.append(file)
+        except Exception as e:
+            print(f"✗ Failed: {file} → {str(e)}")
+
+    rngs = [substream(seed, "lme", Path(file).stem) for file in loaded]
+    for file, processed in zip(loaded, process_records(records, rngs)):
+        if isinstance(processed, Exception):
+            print(f"✗ Failed: {file} → {str(processed)}")
+            continue
+        try:
+            write_json(processed, os.path.join(output_dir, f"processed_{file}"))
+            success[file] = True
+        except Exception as e:
+            print(f"✗ Failed: {file} → {str(e)}")
+    return list(success.items())
+
+def prepare_dataset(input_dir, output_dir, seed=None, workers=1, chunksize=64):
     """
     Converts all enriched JSON variants into a flat dataset ready for training.
 
     I apply processing to every file, including geometric augmentation,
-    categorical encoding, and numerical normalization.
+    categorical encoding, and numerical normalization. Each file draws from its own
+    random stream, so the output is bit-identical whatever the number of workers.
 
     Parameters
     ----------
@@ -173,6 +208,12 @@ def prepare_dataset(input_dir, output_dir):
         Folder with the synthetic JSON input files.
     output_dir : str
         Destination for the processed outputs.
+    seed : int, optional
+        Seed of the run; None gives non-reproducible LME draws.
+    workers : int, optional
+        Number of processes (0 = one per CPU).
+    chunksize : int, optional
+        Number of files per batch sent to a worker.
 
     Returns
     -------
@@ -182,17 +223,29 @@ def prepare_dataset(input_dir, output_dir):
     os.makedirs(output_dir, exist_ok=True)
     processed, errors = 0, 0
 
-    for file in os.listdir(input_dir):
-        if file.endswith('.json'):
-            success = process_single_file(
-                os.path.join(input_dir, file),
-                os.path.join(output_dir, f"processed_{file}")
-            )
+    files = sorted(file for file in os.listdir(input_dir) if file.endswith('.json'))
+    chunks = [files[i:i + chunksize] for i in range(0, len(files), chunksize)]
+    if not workers:
+        workers = os.cpu_count() or 1
+    workers = max(1, min(workers, len(chunks) or 1))
+    if workers == 1:
+        results = (_prepare_files(chunk, input_dir, output_dir, seed) for chunk in chunks)
+        executor = None
+    else:
+        executor = ProcessPoolExecutor(max_workers=workers)
+        results = executor.map(_prepare_files, chunks, repeat(input_dir), repeat(output_dir), repeat(seed))
+
+    try:
+        for file, success in (pair for chunk in results for pair in chunk):
             if success:
                 print(f"✓ Processed: {file}")
                 processed += 1
             else:
                 errors += 1
+    finally:
+        if executor is not None:
+            # After a failure, the chunks not started yet are dropped instead of processed
+            executor.shutdown(cancel_futures=True)
 
     print("\n Dataset preparation complete.")
     print(f" Success: {processed} files")
@@ -200,6 +253,45 @@ def prepare_dataset(input_dir, output_dir):
     print(f" Output: {output_dir}")
     return processed
 
+def prepare_dataset_table(input_table, output_table, seed=None):
+    """
+    Columnar version of `prepare_dataset`: every row of the variants table goes through
+    `process_records` in one batch and the training rows are saved as a single table.
+
+    Row ids get the 'processed_' prefix, like the file names of 'json_ready'.
+
+    Parameters
+    ----------
+    input_table : str
+        Table written by step 7.
+    output_table : str
+        Path of the training table.
+    seed : int, optional
+        Seed of the run; with the same seed, the LME draws match `prepare_dataset`.
+
+    Returns
+    -------
+    int
+        Number of rows successfully processed.
+    """
+    rows, errors = [], 0
+    pairs = read_records(input_table)
+    row_ids = [row_id for row_id, _ in pairs]
+    rngs = [substream(seed, "lme", row_id) for row_id in row_ids]
+    for row_id, processed in zip(row_ids, process_records([data for _, data in pairs], rngs)):
+        if isinstance(processed, Exception):
+            print(f"✗ Failed: {row_id} → {str(processed)}")
+            errors += 1
+        else:
+            rows.append((f"processed_{row_id}", processed))
+
+    write_records(rows, output_table)
+    print("\n Dataset preparation complete.")
+    print(f" Success: {len(rows)} rows")
+    print(f" Failed: {errors} rows")
+    print(f" Output: {output_table}")
+    return len(rows)
+
 # === MAIN EXECUTION ===
 def main():
     input_dir = "Odens/Data_Processing/json_variants"
@@ -1,7 +1,13 @@
 import re
-import json
 from pathlib import Path
+import numpy as np
 import pandas as pd
+from Columnar import ROW_ID, read_table, write_table
+from Json_codec import read_json, write_json
+
+NUMBER_PATTERN = r"([0-9]+(?:[.,][0-9]+)?)"
+WEEK_RANGE_PATTERN = r"(\d+)[-–](\d+)"
+TEMPER_PATTERN = r"T(\d)"
 
 def extract_number(text):
     """
@@ -20,7 +26,7 @@ def extract_number(text):
     float or None
         A float if a number is found, otherwise None.
     """
-    match = re.search(r"([0-9]+(?:[.,][0-9]+)?)", str(text))
+    match = re.search(NUMBER_PATTERN, str(text))
     return float(match.group(1).replace(',', '.')) if match else None
 
 
@@ -52,7 +58,7 @@ def parse_ytbehandling(text):
     if "606" in text:
         result["alloy_series"] = 6
         result["alloy_strength"] = 63
-    temper_match = re.search(r"T(\d)", text)
+    temper_match = re.search(TEMPER_PATTERN, text)
     if temper_match:
         result["temper_code"] = int(temper_match.group(1))
     return result
@@ -79,7 +85,7 @@ def transform_json(data):
         data["Verktygskostnad"] = extract_number(data["Verktygskostnad"])
 
     if "Lev. tid" in data:
-        weeks = re.findall(r'(\d+)[-–](\d+)', data["Lev. tid"])
+        weeks = re.findall(WEEK_RANGE_PATTERN, data["Lev. tid"])
         if weeks:
             ranges = [(int(a) + int(b)) / 2 for a, b in weeks]
             data["Lev. tid"] = round(sum(ranges) / len(ranges), 2)
@@ -98,11 +104,145 @@ def transform_json(data):
     return data
 
 
+def _as_text(series):
+    """
+    Text of every value, as str() would give it (so 13200.0 stays "13200.0").
+    """
+    return series.map(str) if series.dtype == object else series.astype(str)
+
+
+def _or_none(series):
+    """
+    Object column where missing values are None, as they are in the JSON files.
+    """
+    return series.astype(object).where(series.notna(), None)
+
+
+def _per_unique(series, func):
+    """
+    Applies a column function to the distinct values only, then broadcasts the result back.
+
+    Condition fields are repeated on every product line of a quote, so a column of
+    100k rows usually holds a few hundred distinct values.
+    """
+    codes, uniques = pd.factorize(series.astype(object), use_na_sentinel=False)
+    result = func(pd.Series(uniques, dtype=object))
+    return result.take(codes).set_axis(series.index)
+
+
+def extract_number_column(series):
+    """
+    Vectorized `extract_number`: the first number of every value, as float (NaN if there is none).
+    """
+    numbers = _as_text(series).str.extract(NUMBER_PATTERN, expand=False)
+    return numbers.str.replace(",", ".", regex=False).astype(float)
+
+
+def average_week_ranges(series):
+    """
+    Vectorized "Lev. tid" rule: text with "a-b" week ranges becomes the average of their middles,
+    rounded to 2 decimals; other values are kept as they are.
+    """
+    series = series.astype(object)
+    is_text = series.map(type) == str
+    weeks = series[is_text].astype(str).str.extractall(WEEK_RANGE_PATTERN).astype(int)
+    if weeks.empty:
+        return series
+    middles = ((weeks[0] + weeks[1]) / 2).groupby(level=0).mean()
+    series.loc[middles.index] = [round(v, 2) for v in middles.tolist()]
+    return series
+
+
+def ytbehandling_columns(series):
+    """
+    Vectorized `parse_ytbehandling`: one column per parsed field.
+    """
+    text = series.where(series.map(type) == str, "").astype(str)
+    is_606 = text.str.contains("606", regex=False).to_numpy()
+    temper = pd.to_numeric(text.str.extract(TEMPER_PATTERN, expand=False)).astype("Int64")
+    return pd.DataFrame({
+        "alloy_series": np.where(is_606, 6, None),
+        "alloy_strength": np.where(is_606, 63, None),
+        "temper_code": _or_none(temper),
+        "european_std": text.str.contains("EN-AW", regex=False).astype(int),
+    }, index=series.index)
+
+
+def transform_frame(df):
+    """
+    Vectorized `transform_json`: transforms every row of a DataFrame at once.
+
+    Each regex runs once per distinct value of its column (`str.extract` / `str.extractall`),
+    instead of once per row, and I produce the same columns and values as `transform_json`
+    applied to each row.
+
+    Parameters
+    ----------
+    df : pandas.DataFrame
+        One row per quote line, with the original JSON fields as columns.
+
+    Returns
+    -------
+    pandas.DataFrame
+        A new DataFrame with normalized values.
+    """
+    df = df.copy()
+
+    if "Verktygskostnad" in df:
+        df["Verktygskostnad"] = _or_none(_per_unique(df["Verktygskostnad"], extract_number_column))
+
+    if "Lev. tid" in df:
+        df["Lev. tid"] = _per_unique(df["Lev. tid"], average_week_ranges)
+
+    if "Råvara" in df:
+        df["Råvara"] = _or_none(_per_unique(df["Råvara"], extract_number_column))
+
+    if "NOT" in df:
+        df["NOT"] = _per_unique(df["NOT"], extract_number_column).fillna(0).astype(int)
+
+    if "Ytbehandling" in df:
+        yt = _per_unique(df.pop("Ytbehandling"), ytbehandling_columns)
+        for column in yt:
+            df[column] = yt[column]
+
+    return df
+
+
+def transform_records(records):
+    """
+    Applies `transform_frame` to a list of JSON objects.
+
+    Records are grouped by their set of fields, so a field missing from a record is
+    never added to it, as with `transform_json`.
+
+    Parameters
+    ----------
+    records : list[dict]
+        The original JSON objects.
+
+    Returns
+    -------
+    list[dict]
+        The transformed JSON objects, in the same order.
+    """
+    groups = {}
+    for position, record in enumerate(records):
+        groups.setdefault(tuple(record), []).append(position)
+
+    transformed = [None] * len(records)
+    for keys, positions in groups.items():
+        frame = pd.DataFrame([records[p] for p in positions], columns=list(keys))
+        for position, row in zip(positions, transform_frame(frame).to_dict("records")):
+            transformed[position] = row
+    return transformed
+
+
 def transform_json_files(input_dir, output_dir):
     """
     Processes all JSON files in a folder and applies the transformation function.
 
-    Each input file is read, normalized, and then saved into a new folder.
+    All files are read first and transformed together (see `transform_records`),
+    then each one is saved into a new folder.
 
     Parameters
     ----------
@@ -121,17 +261,15 @@ def transform_json_files(input_dir, output_dir):
     output_path = Path(output_dir)
     output_path.mkdir(parents=True, exist_ok=True)
 
-    transformed_files = []
-
-    for json_file in input_path.glob("*.json"):
-        with open(json_file, 'r', encoding='utf-8') as f:
-            data = json.load(f)
-
-        transformed = transform_json(data)
+    json_files = list(input_path.glob("*.json"))
+    records = []
+    for json_file in json_files:
+        records.append(read_json(json_file))
 
+    transformed_files = []
+    for json_file, transformed in zip(json_files, transform_records(records)):
         out_path = output_path / json_file.name
-        with open(out_path, 'w', encoding='utf-8') as f:
-            json.dump(transformed, f, ensure_ascii=False, indent=4)
+        write_json(transformed, out_path)
 
         transformed_files.append(out_path.name)
 
@@ -139,6 +277,33 @@ def transform_json_files(input_dir, output_dir):
     print(pd.DataFrame(transformed_files, columns=["Fichier JSON"]).head())
 
 
+def transform_table(input_table, output_table):
+    """
+    Columnar version of `transform_json_files`: the whole table goes through
+    `transform_frame` and the result is saved as a single table.
+
+    Parameters
+    ----------
+    input_table : str
+        Table written by step 5.
+
+    output_table : str
+        Path of the transformed table.
+
+    Returns
+    -------
+    int
+        Number of rows transformed.
+    """
+    df = read_table(input_table)
+    row_ids = df.pop(ROW_ID)
+    transformed = transform_frame(df)
+    transformed.insert(0, ROW_ID, row_ids)
+    write_table(transformed, output_table)
+    print(f" {len(transformed)} rows transformed and saved to '{output_table}'")
+    return len(transformed)
+
+
 if __name__ == "__main__":
     transform_json_files(
         "Odens/Data_Processing/json_output_from_csv",
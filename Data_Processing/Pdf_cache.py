@@ -0,0 +1,91 @@
+import hashlib
+import os
+from pathlib import Path
+
+
+class ExtractionCache:
+    """
+    Persistent cache of extracted PDF text, stored as one .txt file per entry.
+
+    Entries are keyed by the SHA-256 of the PDF bytes and the extractor version,
+    so a renamed PDF is still a hit and an extractor upgrade invalidates everything.
+    The file modification time doubles as the last-access time, which I use for
+    LRU eviction once the cache is above `max_bytes` or `max_entries`.
+    """
+
+    def __init__(self, cache_dir, extractor_version: str, max_bytes: int = 512 * 1024 * 1024, max_entries: int = None):
+        self.cache_dir = Path(cache_dir)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.extractor_version = extractor_version
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+
+    def key_for(self, pdf_path: Path) -> str:
+        """
+        Hashes the PDF content together with the extractor version.
+        """
+        digest = hashlib.sha256(self.extractor_version.encode("utf-8"))
+        with open(pdf_path, "rb") as f:
+            for block in iter(lambda: f.read(1024 * 1024), b""):
+                digest.update(block)
+        return digest.hexdigest()
+
+    def _entry_path(self, key: str) -> Path:
+        return self.cache_dir / f"{key}.txt"
+
+    def get(self, key: str):
+        """
+        Returns the cached text for a key, or None on a miss.
+        A hit refreshes the entry's access time.
+        """
+        entry = self._entry_path(key)
+        try:
+            text = entry.read_text(encoding="utf-8")
+        except FileNotFoundError:
+            self.misses += 1
+            return None
+        os.utime(entry)
+        self.hits += 1
+        return text
+
+    def put(self, key: str, text: str):
+        """
+        Stores the text of a key. I write to a temporary file first so that an
+        interrupted run never leaves a truncated entry behind.
+        """
+        entry = self._entry_path(key)
+        tmp = entry.with_suffix(".tmp")
+        tmp.write_text(text, encoding="utf-8")
+        os.replace(tmp, entry)
+
+    def evict(self) -> int:
+        """
+        Removes the least recently used entries until the size and count limits hold.
+
+        Returns
+        -------
+        int
+            Number of removed entries.
+        """
+        entries = []
+        for entry in self.cache_dir.glob("*.txt"):
+            stat = entry.stat()
+            entries.append((stat.st_mtime, stat.st_size, entry))
+        entries.sort()
+
+        total_bytes = sum(size for _, size, _ in entries)
+        removed = 0
+        for _, size, entry in entries:
+            too_big = self.max_bytes is not None and total_bytes > self.max_bytes
+            too_many = self.max_entries is not None and len(entries) - removed > self.max_entries
+            if not (too_big or too_many):
+                break
+            entry.unlink(missing_ok=True)
+            total_bytes -= size
+            removed += 1
+        return removed
+
+    def report(self) -> str:
+        return f"[CACHE] hits: {self.hits}, misses: {self.misses}"
@@ -1,27 +1,162 @@
+import os
+import re
 import pdfplumber
+from functools import partial
+from importlib import metadata
 from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor
+from Pdf_cache import ExtractionCache
 
-def extract_text_from_single_pdf(pdf_path: Path) -> str:
+# I bump this revision whenever the extraction logic changes, so cached texts are re-parsed
+EXTRACTOR_REVISION = 4
+
+# Layout backends pad columns with runs of spaces and some emit zero-width spaces
+_ZERO_WIDTH = re.compile("[\u200b\u200c\u200d\ufeff]")
+_SPACES = re.compile(r"[ \t\xa0]+")
+
+# Condition lines that close an offer. Once they are seen, the remaining pages
+# (annexes, general terms) are never read by `format_offer`.
+END_OF_OFFER_MARKERS = ("Råvara:", "Allmänna villkor:")
+
+DEFAULT_BACKEND = "pdfplumber"
+
+
+# --- EXTRACTION BACKENDS ---
+# Every backend is a generator taking a PDF path and yielding the raw text of each page.
+# Only pdfplumber is a hard dependency; the others are imported when first used.
+
+def _pages_pdfplumber(pdf_path: Path):
+    """
+    Full layout analysis with pdfplumber (the reference backend).
+    """
+    with pdfplumber.open(pdf_path) as pdf:
+        for page in pdf.pages:
+            extracted = page.extract_text()
+            page.flush_cache()
+            yield extracted
+
+
+def _pages_pymupdf(pdf_path: Path):
+    """
+    Text-only extraction with PyMuPDF, without building character objects.
+    """
+    import pymupdf
+
+    with pymupdf.open(pdf_path) as doc:
+        for page in doc:
+            yield page.get_text("text", sort=True)
+
+
+def _pages_pypdf(pdf_path: Path):
+    """
+    Pure-Python text-only extraction with pypdf.
+    """
+    from pypdf import PdfReader
+
+    reader = PdfReader(pdf_path)
+    for page in reader.pages:
+        # The default mode splits these quotes into one word per line
+        yield page.extract_text(extraction_mode="layout")
+
+
+# name -> (distribution used for the cache key, page generator)
+BACKENDS = {
+    "pdfplumber": ("pdfplumber", _pages_pdfplumber),
+    "pymupdf": ("PyMuPDF", _pages_pymupdf),
+    "pypdf": ("pypdf", _pages_pypdf),
+}
+
+
+def extractor_version(backend: str = DEFAULT_BACKEND, early_stop: bool = True) -> str:
+    """
+    I use this function to build the version string of an extraction setup,
+    which is part of the cache key.
+    """
+    distribution, _ = BACKENDS[backend]
+    try:
+        library_version = metadata.version(distribution)
+    except metadata.PackageNotFoundError:
+        library_version = "unknown"
+    mode = "early-stop" if early_stop else "all-pages"
+    return f"{backend}-{library_version}/{EXTRACTOR_REVISION}/{mode}"
+
+
+def normalize_page_lines(text: str):
+    """
+    I use this function to bring the page text of every backend to the same shape:
+    no zero-width characters, single spaces between words, no blank lines.
+    """
+    lines = []
+    for line in _ZERO_WIDTH.sub("", text).splitlines():
+        line = _SPACES.sub(" ", line).strip()
+        if line:
+            lines.append(line)
+    return lines
+
+
+def iter_pdf_pages(pdf_path: Path, backend: str = DEFAULT_BACKEND):
+    """
+    I use this generator to yield the text of each page lazily, one page at a time.
+    Empty pages are skipped. Every backend's output goes through `normalize_page_lines`,
+    so `format_offer` sees the same lines whatever the backend.
+
+    Parameters:
+    ----------
+    pdf_path : Path
+        Path object pointing to the PDF file.
+    backend : str, optional
+        Name of the extraction backend, one of BACKENDS.
+
+    Yields:
+    ------
+    str
+        Extracted text of one page.
+    """
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown PDF backend '{backend}'. Available: {', '.join(BACKENDS)}")
+    _, pages = BACKENDS[backend]
+    for extracted in pages(pdf_path):
+        if extracted:
+            extracted = "\n".join(normalize_page_lines(extracted))
+        if extracted:
+            yield extracted
+
+
+def extract_text_from_single_pdf(pdf_path: Path, early_stop: bool = True, backend: str = DEFAULT_BACKEND) -> str:
     """
     I use this function to extract all the text from a single PDF file.
 
+    Pages are streamed from `iter_pdf_pages` and joined once at the end. With early_stop,
+    I stop reading after the page where the last offer condition appears: the page with
+    "Råvara:", or the page after "Allmänna villkor:" in case "Råvara:" spills over.
+
     Parameters:
     ----------
     pdf_path : Path
         Path object pointing to the PDF file.
+    early_stop : bool, optional
+        Whether to skip the pages that follow the condition block.
+    backend : str, optional
+        Name of the extraction backend, one of BACKENDS.
 
     Returns:
     -------
     str
         Full extracted text from the PDF.
     """
-    text = ""
-    with pdfplumber.open(pdf_path) as pdf:
-        for page in pdf.pages:
-            extracted = page.extract_text()
-            if extracted:
-                text += extracted + "\n"
-    return text
+    pages = []
+    seen_general_terms = False
+    for page_text in iter_pdf_pages(pdf_path, backend):
+        pages.append(page_text)
+        if not early_stop:
+            continue
+        if seen_general_terms:
+            break
+        lines = page_text.splitlines()
+        if any(line.startswith(END_OF_OFFER_MARKERS[0]) for line in lines):
+            break
+        seen_general_terms = any(line.startswith(END_OF_OFFER_MARKERS[1]) for line in lines)
+    return "".join(page_text + "\n" for page_text in pages)
 
 
 def save_text_to_file(text: str, output_path: Path):
@@ -44,7 +179,121 @@ def save_text_to_file(text: str, output_path: Path):
     print(f"[INFO] Saved extracted text to '{output_path.name}'.")
 
 
-def extract_text_from_pdfs(input_folder: str, output_folder: str):
+def _extract_worker(pdf_path: Path, early_stop: bool = True, backend: str = DEFAULT_BACKEND):
+    """
+    I use this function inside the worker processes to extract one PDF in isolation.
+    Any exception is caught and returned, so one broken PDF never stops the batch.
+
+    Parameters:
+    ----------
+    pdf_path : Path
+        Path object pointing to the PDF file.
+    early_stop : bool, optional
+        Passed on to `extract_text_from_single_pdf`.
+    backend : str, optional
+        Passed on to `extract_text_from_single_pdf`.
+
+    Returns:
+    -------
+    tuple
+        (pdf_path, text, error) where error is None on success.
+    """
+    try:
+        return pdf_path, extract_text_from_single_pdf(pdf_path, early_stop, backend), None
+    except Exception as e:
+        return pdf_path, None, f"{type(e).__name__}: {e}"
+
+
+def iter_pdf_texts(pdf_files, workers: int = 1, chunksize: int = 8,
+                   cache_dir: str = None, cache_max_bytes: int = 512 * 1024 * 1024,
+                   cache_max_entries: int = None, early_stop: bool = True,
+                   backend: str = DEFAULT_BACKEND):
+    """
+    I use this generator to extract the text of many PDFs and yield it in input order,
+    without writing anything to disk. `extract_text_from_pdfs` and the fused
+    PDF → JSON stage are both built on top of it.
+
+    With workers > 1, the PDFs are parsed by a pool of processes. I submit them in
+    chunks and collect the results in input order, so the output never depends on
+    which worker finished first.
+
+    Parameters:
+    ----------
+    pdf_files : list[Path]
+        PDF files to extract, in the order the results should come out.
+    workers : int, optional
+        Number of worker processes. 1 keeps everything in the current process,
+        0 or None uses one worker per CPU.
+    chunksize : int, optional
+        Number of PDFs sent to a worker at once.
+    cache_dir : str, optional
+        Folder of the persistent extraction cache. PDFs whose content was already
+        extracted with the same extractor version are served from it without parsing.
+    cache_max_bytes : int, optional
+        Size limit of the cache before LRU eviction.
+    cache_max_entries : int, optional
+        Entry limit of the cache before LRU eviction.
+    early_stop : bool, optional
+        Whether to stop reading each PDF after its condition block.
+    backend : str, optional
+        Name of the extraction backend, one of BACKENDS. "pymupdf" and "pypdf" are
+        text-only and much faster than the default pdfplumber layout analysis.
+
+    Yields:
+    ------
+    tuple
+        (pdf_path, text, error) where error is None on success.
+    """
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown PDF backend '{backend}'. Available: {', '.join(BACKENDS)}")
+    pdf_files = [Path(pdf_file) for pdf_file in pdf_files]
+
+    # I look every PDF up in the cache first; only the misses need parsing
+    cache = None
+    cached = {}
+    if cache_dir:
+        cache = ExtractionCache(cache_dir, extractor_version(backend, early_stop), cache_max_bytes, cache_max_entries)
+        keys = {}
+        for pdf_file in pdf_files:
+            keys[pdf_file] = cache.key_for(pdf_file)
+            text = cache.get(keys[pdf_file])
+            if text is not None:
+                cached[pdf_file] = text
+    to_extract = [pdf_file for pdf_file in pdf_files if pdf_file not in cached]
+
+    if not workers:
+        workers = os.cpu_count() or 1
+    workers = max(1, min(workers, len(to_extract) or 1))
+
+    worker = partial(_extract_worker, early_stop=early_stop, backend=backend)
+    if workers == 1:
+        results = map(worker, to_extract)
+        executor = None
+    else:
+        executor = ProcessPoolExecutor(max_workers=workers)
+        # map() yields results in submission order, whatever the completion order
+        results = executor.map(worker, to_extract, chunksize=max(1, chunksize))
+
+    try:
+        # I loop through the PDFs in order, taking either the cached text or the next parsed result
+        for pdf_file in pdf_files:
+            if pdf_file in cached:
+                yield pdf_file, cached[pdf_file], None
+                continue
+            _, text, error = next(results)
+            if cache is not None and error is None:
+                cache.put(keys[pdf_file], text)
+            yield pdf_file, text, error
+    finally:
+        if executor is not None:
+            executor.shutdown()
+
+    if cache is not None:
+        evicted = cache.evict()
+        print(cache.report() + (f", evicted: {evicted}" if evicted else ""))
+
+
+def extract_text_from_pdfs(input_folder: str, output_folder: str, **options):
     """
     I use this main function to extract text from all PDF files in a given folder
     and save them as .txt files in the output folder.
@@ -55,10 +304,14 @@ def extract_text_from_pdfs(input_folder: str, output_folder: str):
         Folder that contains all PDF files.
     output_folder : str
         Folder where I want to save the .txt files.
+    **options
+        Extraction options passed on to `iter_pdf_texts` (workers, chunksize,
+        cache_dir, cache_max_bytes, cache_max_entries, early_stop, backend).
 
     Returns:
     -------
-    None
+    list[tuple]
+        One (pdf name, error) pair per PDF, in sorted file order. error is None on success.
     """
     input_path = Path(input_folder)
     output_path = Path(output_folder)
@@ -66,12 +319,21 @@ def extract_text_from_pdfs(input_folder: str, output_folder: str):
     # I make sure the output folder exists
     output_path.mkdir(parents=True, exist_ok=True)
 
-    # I loop through each PDF and process it
-    for pdf_file in input_path.glob("*.pdf"):
+    # I sort the files so the processing order is the same on every run
+    pdf_files = sorted(input_path.glob("*.pdf"))
+
+    summary = []
+    for pdf_file, text, error in iter_pdf_texts(pdf_files, **options):
+        if error is not None:
+            print(f"[ERROR] Failed to extract '{pdf_file.name}': {error}")
+            summary.append((pdf_file.name, error))
+            continue
         print(f"[INFO] Processing: {pdf_file.name}")
-        text = extract_text_from_single_pdf(pdf_file)
         txt_file = output_path / f"{pdf_file.stem}.txt"
         save_text_to_file(text, txt_file)
+        summary.append((pdf_file.name, None))
+
+    return summary
 
 
 # Main entry point for testing or actual use
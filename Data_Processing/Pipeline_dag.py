@@ -0,0 +1,224 @@
+import fnmatch
+import hashlib
+import json
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from pathlib import Path
+
+from Instrumentation import PipelineInstrumentation
+from Pipeline_manifest import file_sha256
+
+CHECKPOINT_NAME = "pipeline_checkpoints.json"
+CHECKPOINT_VERSION = 1
+
+
+class StopPipeline(Exception):
+    """
+    Raised by a stage when there is nothing left to do downstream (e.g. no data extracted).
+    The stages that depend on it are not run, and it is not checkpointed.
+    """
+
+
+def _iter_files(path: Path, pattern="*"):
+    if path.is_file():
+        yield path
+    elif path.is_dir():
+        patterns = (pattern,) if isinstance(pattern, str) else pattern
+        yield from sorted({p for pattern in patterns for p in path.rglob(pattern) if p.is_file()})
+
+
+def fingerprint_paths(paths, params=None) -> str:
+    """
+    Hashes the content of the given files and folders, together with the stage parameters.
+    Missing paths are part of the fingerprint, so creating them invalidates it.
+    """
+    digest = hashlib.sha256(json.dumps(params, sort_keys=True, default=str).encode("utf-8"))
+    for path in paths:
+        path = Path(path)
+        digest.update(f"\0{path.name}\0{path.exists()}".encode("utf-8"))
+        for file in _iter_files(path):
+            digest.update(f"\0{file.relative_to(path) if file != path else ''}\0".encode("utf-8"))
+            digest.update(file_sha256(file).encode("ascii"))
+    return digest.hexdigest()
+
+
+class Stage:
+    """
+    One step of the pipeline: a function with the files or folders it reads and writes.
+
+    Parameters
+    ----------
+    name : str
+        Unique stage name, also used in the run report.
+    func : callable
+        Called without arguments; stages only communicate through files.
+    inputs : list[str]
+        Files or folders read by the stage. Their content is the stage fingerprint.
+    outputs : list[str]
+        Files or folders written by the stage.
+    after : list[str]
+        Names of the stages that must finish first.
+    params : dict, optional
+        Options that change the stage result (e.g. the PDF backend); part of the fingerprint.
+    output_glob : str or tuple[str]
+        Only files matching this pattern (or one of these patterns) in the output folders
+        belong to the stage, for folders shared with another stage.
+    output_exclude : str or tuple[str]
+        Files matching this pattern (or one of these patterns) never belong to the stage,
+        e.g. the files another stage writes at the same time in a shared folder.
+    """
+
+    def __init__(self, name: str, func, inputs=(), outputs=(), after=(), params: dict = None,
+                 output_glob="*", output_exclude=()):
+        self.name = name
+        self.func = func
+        self.inputs = [Path(p) for p in inputs]
+        self.outputs = [Path(p) for p in outputs]
+        self.after = list(after)
+        self.params = params or {}
+        self.output_glob = output_glob
+        self.output_exclude = (output_exclude,) if isinstance(output_exclude, str) else tuple(output_exclude)
+
+    def output_hashes(self, since: float = None) -> dict:
+        """
+        Content hash of every output file, optionally only of those modified since a timestamp.
+        """
+        hashes = {}
+        for path in self.outputs:
+            for file in _iter_files(path, self.output_glob):
+                if any(fnmatch.fnmatch(file.name, pattern) for pattern in self.output_exclude):
+                    continue
+                if since is None or file.stat().st_mtime >= since:
+                    hashes[str(file)] = file_sha256(file)
+        return hashes
+
+
+class StageGraph:
+    """
+    DAG of pipeline stages with checkpoints, so an interrupted or repeated run resumes
+    from the first stage whose inputs changed.
+
+    After each successful stage I record the fingerprint of its inputs and the hash of every
+    file it wrote. On the next run, a stage is skipped when its inputs have the same
+    fingerprint and its recorded outputs are still on disk unchanged. Because fingerprints
+    are computed on content, a stage rerun that produces identical files does not
+    invalidate the stages after it. Stages whose dependencies are done run concurrently
+    on a thread pool.
+    """
+
+    def __init__(self, checkpoint_path, instrumentation: PipelineInstrumentation = None, workers: int = 2):
+        self.checkpoint_path = Path(checkpoint_path)
+        self.instrumentation = instrumentation or PipelineInstrumentation()
+        self.workers = max(1, workers)
+        self.stages = {}
+        if self.checkpoint_path.exists():
+            with open(self.checkpoint_path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            self.checkpoints = data["stages"] if data.get("version") == CHECKPOINT_VERSION else {}
+        else:
+            self.checkpoints = {}
+
+    def add(self, stage: Stage) -> Stage:
+        if stage.name in self.stages:
+            raise ValueError(f"Stage '{stage.name}' is already defined.")
+        for dependency in stage.after:
+            if dependency not in self.stages:
+                raise ValueError(f"Stage '{stage.name}' depends on unknown stage '{dependency}'.")
+        self.stages[stage.name] = stage
+        return stage
+
+    def _is_fresh(self, stage: Stage, input_fingerprint: str) -> bool:
+        checkpoint = self.checkpoints.get(stage.name)
+        if checkpoint is None or checkpoint["inputs"] != input_fingerprint:
+            return False
+        for file, sha in checkpoint["outputs"].items():
+            if not Path(file).is_file() or file_sha256(file) != sha:
+                return False
+        return True
+
+    def _run_stage(self, stage: Stage, force: bool):
+        """
+        Runs one stage unless its checkpoint is still valid.
+
+        Returns
+        -------
+        tuple[str, dict or None]
+            "ran" or "skipped", and the new checkpoint entry when the stage ran.
+        """
+        input_fingerprint = fingerprint_paths(stage.inputs, stage.params)
+        if not force and self._is_fresh(stage, input_fingerprint):
+            print(f"[SKIP] {stage.name}: inputs unchanged since the last run.")
+            self.instrumentation.skip(stage.name)
+            return "skipped", None
+
+        started = time.time() - 1
+        with self.instrumentation.stage(stage.name, inputs=stage.inputs, outputs=stage.outputs):
+            stage.func()
+        return "ran", {"inputs": input_fingerprint, "outputs": stage.output_hashes(since=started)}
+
+    def save(self):
+        """
+        Writes the checkpoints atomically, after every finished stage.
+        """
+        self.checkpoint_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.checkpoint_path.with_suffix(".tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"version": CHECKPOINT_VERSION, "stages": self.checkpoints}, f, indent=2)
+        os.replace(tmp, self.checkpoint_path)
+
+    def run(self, force: bool = False) -> dict:
+        """
+        Runs the graph in dependency order.
+
+        Parameters
+        ----------
+        force : bool, optional
+            Run every stage even when its checkpoint is valid.
+
+        Returns
+        -------
+        dict
+            Stage name -> "ran", "skipped" or "stopped" (not run because an upstream stage
+            raised StopPipeline). If a stage fails, its error is raised once the stages
+            already running have finished; the finished ones keep their checkpoints.
+        """
+        status = {}
+        pending = dict(self.stages)
+        running = {}
+        error = None
+
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            while pending or running:
+                if error is None:
+                    for name, stage in list(pending.items()):
+                        if any(status.get(d) == "stopped" for d in stage.after):
+                            status[name] = "stopped"
+                            del pending[name]
+                        elif all(status.get(d) in ("ran", "skipped") for d in stage.after):
+                            running[executor.submit(self._run_stage, stage, force)] = name
+                            del pending[name]
+                if not running:
+                    break
+
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    name = running.pop(future)
+                    try:
+                        status[name], checkpoint = future.result()
+                    except StopPipeline as e:
+                        print(f"⚠️ {e}")
+                        status[name], checkpoint = "stopped", None
+                        self.checkpoints.pop(name, None)
+                    except Exception as e:
+                        self.checkpoints.pop(name, None)
+                        error = error or e
+                        continue
+                    if checkpoint is not None:
+                        self.checkpoints[name] = checkpoint
+                    self.save()
+
+        if error is not None:
+            self.save()
+            raise error
+        return status
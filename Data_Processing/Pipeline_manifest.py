@@ -0,0 +1,114 @@
+import hashlib
+import json
+import os
+from pathlib import Path
+
+MANIFEST_NAME = "pipeline_manifest.json"
+# Quote JSON of every row of processed_quotes.csv, in row order, written by step 4
+ROW_SOURCES_NAME = "processed_quotes_sources.json"
+MANIFEST_VERSION = 1
+
+
+def file_sha256(path) -> str:
+    """
+    Hashes a file by blocks, so large PDFs are never loaded in memory at once.
+    """
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class PipelineManifest:
+    """
+    Record of the PDFs already processed by the data pipeline and of the files each one produced.
+
+    For every input PDF I keep its content hash, the quote JSON written for it in 'json files'
+    and the rows it contributed to 'json_ready'. I also keep the content hash of every extra
+    JSON file and JSONL export already imported (under "extra_files"), so unchanged ones are
+    not imported again. Other files of 'json_ready' (e.g. added by hand) belong to no entry.
+    """
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self.exists = self.path.exists()
+        if self.exists:
+            with open(self.path, "r", encoding="utf-8") as f:
+                self.data = json.load(f)
+        else:
+            self.data = {"version": MANIFEST_VERSION, "inputs": {}, "extra_files": {}}
+
+    @property
+    def inputs(self) -> dict:
+        return self.data["inputs"]
+
+    def diff(self, pdf_files):
+        """
+        Compares the PDFs currently in the input folder with the manifest.
+
+        Parameters
+        ----------
+        pdf_files : list[Path]
+            PDFs currently in the input folder.
+
+        Returns
+        -------
+        tuple[list[tuple[Path, str]], list[str]]
+            (pdf, hash) pairs that are new or whose content changed,
+            and names of recorded PDFs that are no longer in the folder.
+        """
+        changed = []
+        for pdf_file in pdf_files:
+            sha = file_sha256(pdf_file)
+            entry = self.inputs.get(pdf_file.name)
+            if entry is None or entry["sha256"] != sha:
+                changed.append((pdf_file, sha))
+        present = {pdf_file.name for pdf_file in pdf_files}
+        removed = [name for name in self.inputs if name not in present]
+        return changed, removed
+
+    def record(self, pdf_name: str, sha: str, json_file: str, rows):
+        self.inputs[pdf_name] = {"sha256": sha, "json": json_file, "rows": sorted(rows)}
+
+    def forget(self, pdf_name: str) -> dict:
+        """
+        Removes a PDF from the manifest and returns its entry.
+        """
+        return self.inputs.pop(pdf_name, None)
+
+    def extra_changes(self, kind: str, files) -> list:
+        """
+        (file, hash) pairs of the extra files of a kind ("json" or "jsonl") that are new or
+        changed since their last import.
+        """
+        seen = self.data.get("extra_files", {}).get(kind, {})
+        changed = []
+        for file in files:
+            sha = file_sha256(file)
+            if seen.get(Path(file).name) != sha:
+                changed.append((Path(file), sha))
+        return changed
+
+    def is_known_extra(self, kind: str, name: str) -> bool:
+        return name in self.data.get("extra_files", {}).get(kind, {})
+
+    def record_extra(self, kind: str, name: str, sha: str):
+        self.data.setdefault("extra_files", {}).setdefault(kind, {})[name] = sha
+
+    def all_rows(self) -> list:
+        """
+        Every row written by the pipeline for the recorded PDFs.
+        """
+        return [row for entry in self.inputs.values() for row in entry["rows"]]
+
+    def save(self):
+        """
+        Writes the manifest atomically, so an interrupted run never leaves it half-written.
+        """
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_suffix(".tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self.data, f, ensure_ascii=False, indent=2)
+        os.replace(tmp, self.path)
+        self.exists = True
@@ -0,0 +1,50 @@
+import hashlib
+
+import numpy as np
+
+# One independent family of streams per stochastic stage
+STREAMS = {"variants": 0, "lme": 1, "derived": 2}
+
+
+def _name_key(name: str) -> int:
+    """
+    Stable 64-bit key of a record name (Python's hash() changes between runs).
+    """
+    return int.from_bytes(hashlib.blake2b(name.encode("utf-8"), digest_size=8).digest(), "big")
+
+
+def substream(seed, stream: str, name: str) -> np.random.Generator:
+    """
+    Random generator of one record (one file or one table row) in one stochastic stage.
+
+    The stream only depends on the seed, the stage and the record name, never on the
+    order in which records are processed, so a stage split across worker processes
+    produces bit-identical values. Without a seed, every call gets fresh entropy.
+
+    Parameters
+    ----------
+    seed : int or None
+        Seed of the run.
+    stream : str
+        Stage name, one of STREAMS.
+    name : str
+        Record name, e.g. the file stem 'quote_1_3' (the same as its row id in a table).
+
+    Returns
+    -------
+    numpy.random.Generator
+    """
+    if seed is None:
+        return np.random.default_rng()
+    return np.random.default_rng(np.random.SeedSequence(seed, spawn_key=(STREAMS[stream], _name_key(name))))
+
+
+def derive_seed(seed, name: str):
+    """
+    Seed of a sub-run (e.g. the rows of one PDF in incremental mode), so that sub-runs
+    whose records share names still draw different values.
+    """
+    if seed is None:
+        return None
+    sequence = np.random.SeedSequence(seed, spawn_key=(STREAMS["derived"], _name_key(name)))
+    return int(sequence.generate_state(1, np.uint64)[0])
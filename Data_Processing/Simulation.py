@@ -1,9 +1,15 @@
-import json
 import os
 import random
-import copy
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
 from pathlib import Path
 
+import numpy as np
+from Columnar import ROW_ID, read_table, write_table
+from Features import ALLOY_CATEGORIES
+from Json_codec import read_json, write_json
+from Seeding import substream
+
 # --- CONFIGURATION ---
 
 ALLOWED_SERIES = [1, 2, 3, 4, 5, 6, 7]
@@ -26,12 +32,6 @@ TOLERANCE_STANDARDS = [
     "ASME B4.1", "DEFAULT", "BS 4500", "ISO 1829"
 ]
 
-ALLOY_CATEGORIES = [
-    "Aluminium 1050 Rå", "Aluminium 2017 T4", "Aluminium 3003 H14",
-    "Aluminium 4043 O", "Aluminium 5083 H111", "Aluminium 6061 T6",
-    "Aluminium 7075 T651", "Aluminium 2024 T351", "Rå"
-]
-
 # --- HELPERS ---
 
 def same_decimal_round(original_value, new_value):
@@ -75,64 +75,291 @@ def modify_alloy_fields():
         "european_std": random.choice(EUROPEAN_STDS)
     }
 
+# --- VECTORISED VARIANTS ---
+
+# Champs numériques à modifier (SANS toucher à la target)
+NUMERIC_FIELDS = ["Vikt kg/m", "Längd/m m", "Kap + truml Pris/st", "Lev. tid", "Råvara"]
+# Champs entiers à modifier (volume, outil, NOT)
+LARGE_NUMBER_FIELDS = ["ca antal Årsvolym st", "Verktygskostnad", "NOT"]
+
+
+def _is_number(value):
+    return isinstance(value, (int, float)) and value == value
+
+
+def _as_array(values, kinds, original):
+    """
+    Tableau numérique si possible (toutes les lignes du même type), sinon tableau d'objets
+    où les lignes non modifiées gardent leur valeur d'origine.
+    """
+    n, k = values.shape
+    if (kinds == "float").all():
+        return values
+    if (kinds == "int").all():
+        return values.astype(np.int64)
+    out = np.empty((n, k), dtype=object)
+    for kind in ("float", "int"):
+        rows = kinds == kind
+        if rows.any():
+            out[rows] = values[rows].astype(np.int64 if kind == "int" else float).tolist()
+    keep = kinds == "keep"
+    out[keep] = np.repeat(original[keep][:, None], k, axis=1)
+    return out
+
+
+def vary_numeric(original, variation):
+    """
+    Version vectorisée de `apply_consistent_variation` + `same_decimal_round`.
+
+    Parameters
+    ----------
+    original : numpy.ndarray
+        Valeurs d'origine (n,), de n'importe quel type.
+    variation : numpy.ndarray
+        Variations tirées (n, k), une par variante.
+
+    Returns
+    -------
+    numpy.ndarray
+        Valeurs des variantes (n, k). Les flottants gardent leur nombre de décimales, les entiers
+        sont tronqués, et les valeurs non numériques ou nulles restent inchangées.
+    """
+    def kind(v):
+        if not _is_number(v) or v == 0:
+            return "keep"
+        if isinstance(v, float):
+            return "float" if "." in str(v) else "keep"
+        return "int"
+
+    kinds = np.array([kind(v) for v in original], dtype="<U5")
+    base = np.array([float(v) if kind != "keep" else 0.0 for v, kind in zip(original, kinds)])
+    values = base[:, None] * (1 + variation)
+
+    # Même nombre de décimales que la valeur d'origine : un arrondi par nombre de décimales
+    decimals = np.array([len(str(v).split(".")[1]) if kind == "float" else -1 for v, kind in zip(original, kinds)])
+    for d in np.unique(decimals[decimals >= 0]):
+        rows = decimals == d
+        values[rows] = np.round(values[rows], d)
+    values[kinds == "int"] = np.trunc(values[kinds == "int"])
+    return _as_array(values, kinds, original)
+
+
+def vary_large_number(original, variation):
+    """
+    Version vectorisée de `modify_large_number_consistent` : variation puis arrondi au millier inférieur.
+    """
+    kinds = np.array(["int" if _is_number(v) and v > 0 else "keep" for v in original], dtype="<U5")
+    base = np.array([float(v) if kind == "int" else 0.0 for v, kind in zip(original, kinds)])
+    values = np.floor(base[:, None] * (1 + variation) / 1000) * 1000
+    return _as_array(values, kinds, original)
+
+
+# Tirages uniformes par variante : variation, alliage, série, résistance, trempe, norme, tolérance
+DRAWS_PER_VARIANT = 7
+
+
+def draw_variant_columns(columns: dict, rngs, num_variants: int):
+    """
+    Tire toutes les variantes de n enregistrements d'un coup, champ par champ.
+
+    Chaque enregistrement a son propre générateur (voir `Seeding.substream`) : je tire ses
+    DRAWS_PER_VARIANT x num_variants uniformes en un seul appel, puis tout le reste est vectorisé.
+
+    Parameters
+    ----------
+    columns : dict
+        Nom du champ -> valeurs d'origine (n,), pour les champs présents.
+    rngs : list[numpy.random.Generator]
+        Un générateur par enregistrement d'origine.
+    num_variants : int
+        Nombre de variantes par enregistrement.
+
+    Returns
+    -------
+    dict
+        Nom du champ -> valeurs des variantes (n, num_variants).
+    """
+    n = len(rngs)
+    u = np.array([rng.random((DRAWS_PER_VARIANT, num_variants)) for rng in rngs]).reshape(n, DRAWS_PER_VARIANT, num_variants)
+
+    def pick(options, draws):
+        return np.array(options, dtype=object if isinstance(options[0], str) else None)[(draws * len(options)).astype(int)]
+
+    # 1️⃣ Une seule valeur de variation par variante, partagée par tous ses champs
+    variation = -0.10 + 0.20 * u[:, 0]
+
+    # 2️⃣ / 3️⃣ Champs numériques et grands entiers
+    drawn = {}
+    for field in NUMERIC_FIELDS:
+        if field in columns:
+            drawn[field] = vary_numeric(np.asarray(columns[field], dtype=object), variation)
+    for field in LARGE_NUMBER_FIELDS:
+        if field in columns:
+            drawn[field] = vary_large_number(np.asarray(columns[field], dtype=object), variation)
+
+    # 4️⃣ Categorical changes (sans effet sur la target)
+    drawn["Legering"] = pick(ALLOY_CATEGORIES, u[:, 1])
+    series = pick(ALLOWED_SERIES, u[:, 2])
+    low = np.array([ALLOY_STRENGTH_RANGES[s][0] for s in ALLOWED_SERIES])[series - ALLOWED_SERIES[0]]
+    high = np.array([ALLOY_STRENGTH_RANGES[s][1] for s in ALLOWED_SERIES])[series - ALLOWED_SERIES[0]]
+    drawn["alloy_series"] = series
+    drawn["alloy_strength"] = low + (u[:, 3] * (high - low + 1)).astype(int)
+    drawn["temper_code"] = pick(TEMPER_CODES, u[:, 4])
+    drawn["european_std"] = pick(EUROPEAN_STDS, u[:, 5])
+    drawn["Toleranser"] = pick(TOLERANCE_STANDARDS, u[:, 6])
+    return drawn
+
+
+def generate_variant_records(originals, names, num_variants: int = 19, seed=None):
+    """
+    Crée les variantes d'une liste d'enregistrements (dicts), tirées en bloc avec NumPy.
+
+    Les enregistrements sont groupés par ensemble de champs, pour qu'un champ absent
+    ne soit jamais ajouté (sauf les champs catégoriels, toujours tirés).
+
+    Parameters
+    ----------
+    originals : list[dict]
+        Enregistrements d'origine.
+    names : list[str]
+        Nom de chaque enregistrement (nom du fichier sans extension), qui choisit son flux aléatoire.
+    num_variants : int
+        Nombre de variantes par enregistrement.
+    seed : int, optional
+        Graine du run ; None = tirages non reproductibles.
+
+    Returns
+    -------
+    list[list[dict]]
+        Pour chaque enregistrement, ses num_variants variantes.
+    """
+    groups = {}
+    for position, record in enumerate(originals):
+        groups.setdefault(tuple(record), []).append(position)
+
+    variants = [None] * len(originals)
+    for keys, positions in groups.items():
+        columns = {key: [originals[p][key] for p in positions] for key in keys}
+        rngs = [substream(seed, "variants", names[p]) for p in positions]
+        drawn = {field: values.tolist() for field, values in draw_variant_columns(columns, rngs, num_variants).items()}
+        for row, position in enumerate(positions):
+            variants[position] = [
+                {**originals[position], **{field: values[row][i] for field, values in drawn.items()}}
+                for i in range(num_variants)
+            ]
+    return variants
+
+
+def generate_variant_frame(df, names, num_variants: int = 19, seed=None):
+    """
+    Version DataFrame : chaque ligne d'origine suivie de ses variantes, dans une seule table.
+    Avec la même graine et les mêmes noms, les valeurs sont celles de `generate_variant_records`.
+
+    Returns
+    -------
+    pandas.DataFrame
+        n * (num_variants + 1) lignes ; la colonne "variant" vaut 0 pour l'original.
+    """
+    n = len(df)
+    rngs = [substream(seed, "variants", name) for name in names]
+    drawn = draw_variant_columns({c: df[c].to_numpy(dtype=object) for c in df.columns}, rngs, num_variants)
+
+    out = df.iloc[np.repeat(np.arange(n), num_variants + 1)].reset_index(drop=True)
+    is_variant = np.tile(np.arange(num_variants + 1) > 0, n)
+    for field, values in drawn.items():
+        if field in out and values.dtype != object and out[field].dtype.kind in "if":
+            column = out[field].to_numpy(dtype=np.result_type(out[field].dtype, values.dtype), copy=True)
+        else:
+            column = out[field].to_numpy(dtype=object, copy=True) if field in out else np.full(len(out), None, dtype=object)
+        column[is_variant] = values.ravel()
+        out[field] = column
+    out.insert(0, "variant", np.tile(np.arange(num_variants + 1), n))
+    return out
+
+
 # --- MAIN FUNCTION ---
 
-def generate_variants(input_folder: str, output_folder: str, num_variants: int = 19):
-    input_path = Path(input_folder)
+def _generate_variant_files(files, output_folder: str, num_variants: int, seed):
+    """
+    Génère et sauvegarde les variantes d'un lot de fichiers (exécuté dans un worker).
+    """
     output_path = Path(output_folder)
-    output_path.mkdir(parents=True, exist_ok=True)
+    originals = []
+    for file in files:
+        originals.append(read_json(file))
 
     total = 0
-    for file in input_path.glob("*.json"):
-        with open(file, 'r', encoding='utf-8') as f:
-            original = json.load(f)
-
-        base_name = file.stem
-
+    names = [file.stem for file in files]
+    for base_name, original, variants in zip(names, originals, generate_variant_records(originals, names, num_variants, seed)):
         # Save the original copy
         original_output = output_path / f"{base_name}_0_original.json"
-        with open(original_output, 'w', encoding='utf-8') as f:
-            json.dump(original, f, indent=2, ensure_ascii=False)
+        write_json(original, original_output)
         total += 1
 
-        for i in range(1, num_variants + 1):
-            new_data = copy.deepcopy(original)
-
-            # 1️⃣ Tirer une seule valeur de variation pour ce fichier
-            variation = random.uniform(-0.10, 0.10)
-
-            # 2️⃣ Champs numériques à modifier (SANS toucher à la target)
-            numeric_fields = [
-                "Vikt kg/m",
-                "Längd/m m",
-                "Kap + truml Pris/st",
-                "Lev. tid",
-                "Råvara"
-            ]
-            for field in numeric_fields:
-                if field in new_data:
-                    old_value = new_data[field]
-                    new_value = apply_consistent_variation(old_value, variation)
-                    new_data[field] = same_decimal_round(old_value, new_value)
-
-            # 3️⃣ Champs entiers à modifier (volume, outil, NOT)
-            for field in ["ca antal Årsvolym st", "Verktygskostnad", "NOT"]:
-                if field in new_data:
-                    new_data[field] = modify_large_number_consistent(new_data[field], variation)
-
-            # 4️⃣ Categorical changes (sans effet sur la target)
-            new_data["Legering"] = random.choice(ALLOY_CATEGORIES)
-            new_data.update(modify_alloy_fields())
-            new_data["Toleranser"] = random.choice(TOLERANCE_STANDARDS)
-
-            # 5️⃣ Sauvegarde du fichier modifié
+        # 5️⃣ Sauvegarde des fichiers modifiés
+        for i, new_data in enumerate(variants, start=1):
             variant_output = output_path / f"{base_name}_{i}.json"
-            with open(variant_output, 'w', encoding='utf-8') as f:
-                json.dump(new_data, f, indent=2, ensure_ascii=False)
+            write_json(new_data, variant_output)
             total += 1
+    return total
+
+
+def generate_variants(input_folder: str, output_folder: str, num_variants: int = 19, seed=None,
+                      workers: int = 1, chunksize: int = 64):
+    """
+    Génère num_variants variantes de chaque fichier JSON du dossier.
+
+    Chaque fichier tire dans son propre flux aléatoire (graine + nom du fichier), donc le
+    résultat est identique au bit près quel que soit le nombre de workers.
+
+    Parameters
+    ----------
+    input_folder : str
+        Dossier des JSON transformés.
+    output_folder : str
+        Dossier des variantes.
+    num_variants : int
+        Nombre de variantes par fichier.
+    seed : int, optional
+        Graine du run ; None = tirages non reproductibles.
+    workers : int, optional
+        Nombre de processus (0 = un par CPU).
+    chunksize : int, optional
+        Nombre de fichiers par lot envoyé à un worker.
+    """
+    Path(output_folder).mkdir(parents=True, exist_ok=True)
+    files = sorted(Path(input_folder).glob("*.json"))
+    chunks = [files[i:i + chunksize] for i in range(0, len(files), chunksize)]
+
+    if not workers:
+        workers = os.cpu_count() or 1
+    workers = max(1, min(workers, len(chunks) or 1))
+    if workers == 1:
+        total = sum(_generate_variant_files(chunk, output_folder, num_variants, seed) for chunk in chunks)
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            total = sum(executor.map(_generate_variant_files, chunks, repeat(output_folder),
+                                     repeat(num_variants), repeat(seed)))
 
     print(f"✅ {total} fichiers générés dans '{output_folder}'")
 
+
+def generate_variants_table(input_table: str, output_table: str, num_variants: int = 19, seed=None):
+    """
+    Version colonnaire de `generate_variants` : l'original et ses variantes vont dans une seule table,
+    avec les mêmes identifiants que les fichiers ('quote_1_0_original', 'quote_1_1', ...).
+    """
+    df = read_table(input_table)
+    row_ids = df.pop(ROW_ID).to_numpy(dtype=object)
+    out = generate_variant_frame(df, row_ids, num_variants, seed)
+    variant = out.pop("variant").to_numpy()
+    base = np.repeat(row_ids, num_variants + 1)
+    out.insert(0, ROW_ID, [f"{b}_0_original" if v == 0 else f"{b}_{v}" for b, v in zip(base, variant)])
+
+    write_table(out, output_table)
+    print(f"✅ {len(out)} lignes générées dans '{output_table}'")
+    return len(out)
+
 # --- SCRIPT EXECUTION ---
 if __name__ == "__main__":
     generate_variants("Odens/Data_Processing/json_transformed", "Odens/Data_Processing/json_variants")
@@ -1,19 +1,29 @@
 import os
+import re
 import shutil
-import json
 
 from pathlib import Path
-from Pdf_txt import extract_text_from_pdfs
-from txt_Correction import format_all_txt_files_in_folder
-from txt_json import batch_convert_txt_folder
-from Handling import process_quote_files
-from CSV_json import convert_csv_to_json_rows
-from Organisation_json import transform_json_files
-from Simulation import generate_variants
-from Last_Traitement import prepare_dataset
+from Pdf_txt import iter_pdf_texts, save_text_to_file
+from txt_Correction import parse_offers, render_offer
+from txt_json import offer_to_json
+from Handling import PREPROCESSOR_NAME, REJECTS_NAME, process_quote_files
+from Jsonl_rows import EXTRA_REJECTS_NAME, EXTRA_ROWS_DIR, import_jsonl_folder, jsonl_exports
+from CSV_json import convert_csv_to_json_rows, convert_csv_to_table
+from Organisation_json import transform_json_files, transform_table
+from Simulation import generate_variants, generate_variants_table
+from Last_Traitement import prepare_dataset, prepare_dataset_table
+from Columnar import FORMATS, table_path, write_records
+from Pipeline_manifest import MANIFEST_NAME, ROW_SOURCES_NAME, PipelineManifest, file_sha256
+from Instrumentation import PipelineInstrumentation
+from Pipeline_dag import CHECKPOINT_NAME, Stage, StageGraph, StopPipeline
+from Seeding import derive_seed
+from Json_codec import pretty_output, read_json, write_json
 
+# Name of a row written by step 8 for row i of processed_quotes.csv (see `rows_by_quote`)
+STEP_8_ROW = re.compile(r"processed_quote_(\d+)_(?:0_original|\d+)\.json")
 
-def copy_extra_json_folder_into_ready_folder(extra_folder_path: str, destination_folder: str):
+
+def copy_extra_json_folder_into_ready_folder(extra_folder_path: str, destination_folder: str, names=None):
     """
     I use this function to copy all valid JSON files from a given folder into the final 'json_ready' folder.
 
@@ -23,10 +33,13 @@ def copy_extra_json_folder_into_ready_folder(extra_folder_path: str, destination
         Path to the folder that contains additional JSON files.
     destination_folder : str
         Final destination folder where the JSON files should be copied.
+    names : list[str], optional
+        Only copy the files with these names (e.g. the new or changed ones).
 
     Returns:
     -------
-    None
+    list[str]
+        Names of the files copied into the destination folder.
     """
     extra_path = Path(extra_folder_path)
     dest_path = Path(destination_folder)
@@ -34,28 +47,279 @@ def copy_extra_json_folder_into_ready_folder(extra_folder_path: str, destination
 
     if not extra_path.exists() or not extra_path.is_dir():
         print(f"⚠️ Extra folder '{extra_folder_path}' not found or not a directory.")
-        return
+        return []
 
+    copied = []
     for json_file in extra_path.glob("*.json"):
+        if names is not None and json_file.name not in names:
+            continue
         try:
-            with open(json_file, 'r', encoding='utf-8') as f:
-                content = json.load(f)  # I validate it's proper JSON
+            content = read_json(json_file)  # I validate it's proper JSON
 
             # If valid, I copy the file
             target_file = dest_path / json_file.name
-            with open(target_file, 'w', encoding='utf-8') as f_out:
-                json.dump(content, f_out, ensure_ascii=False, indent=4)
+            write_json(content, target_file)
 
+            copied.append(target_file.name)
             print(f"[INFO]  Added '{json_file.name}' to {destination_folder}")
 
         except Exception as e:
             print(f" Skipped '{json_file.name}' — invalid JSON: {e}")
 
+    return copied
+
 
-def main(input_dir: str, output_dir: str, extra_json_folder: str = None):
+def extra_json_folder_to_table(extra_folder_path: str, output_table: str):
     """
-    I use this pipeline to process raw PDF data all the way to enriched JSONs.
-    If an additional folder of JSON files is provided, I include its content in the final dataset.
+    Columnar version of `copy_extra_json_folder_into_ready_folder`: the valid JSON files of
+    the folder become the rows of a single table, with their file name (without '.json') as row id.
+
+    Parameters:
+    ----------
+    extra_folder_path : str
+        Path to the folder that contains additional JSON files.
+    output_table : str
+        Path of the output table (.parquet or .arrow).
+
+    Returns:
+    -------
+    list[str]
+        Row ids written to the table.
+    """
+    extra_path = Path(extra_folder_path)
+    rows = []
+    if not extra_path.is_dir():
+        print(f"⚠️ Extra folder '{extra_folder_path}' not found or not a directory.")
+    else:
+        for json_file in sorted(extra_path.glob("*.json")):
+            try:
+                rows.append((json_file.stem, read_json(json_file)))
+                print(f"[INFO]  Added '{json_file.name}' to {output_table}")
+            except Exception as e:
+                print(f" Skipped '{json_file.name}' — invalid JSON: {e}")
+
+    write_records(rows, output_table)
+    return [row_id for row_id, _ in rows]
+
+
+def convert_pdfs_to_json(input_dir: str, output_dir: str, debug: bool = False, batch_size: int = 256,
+                         pdf_files=None, **extract_options):
+    """
+    I use this fused stage to go from PDF files to quote JSON files in memory.
+    The extracted text is parsed and turned into the {"metadonnees", "produits", "conditions"}
+    dictionary directly, without writing and re-reading the .txt and txt_Corrected files.
+    Texts are parsed in batches so that the product numbers of a whole batch are
+    classified in one vectorized pass (`parse_offers`).
+
+    Parameters
+    ----------
+    input_dir : str
+        Folder containing original PDF files.
+    output_dir : str
+        Pipeline output folder. JSONs go to 'json files'; with debug, the raw and
+        formatted texts are also written to 'txt files' and 'txt_Corrected'.
+    debug : bool, optional
+        Whether to write the intermediate text files.
+    batch_size : int, optional
+        Number of extracted texts parsed together.
+    pdf_files : list[Path], optional
+        Only convert these PDFs instead of every PDF in input_dir.
+    **extract_options
+        Extraction options passed on to `iter_pdf_texts`.
+
+    Returns
+    -------
+    int
+        Number of JSON files written.
+    """
+    json_dir = Path(output_dir) / "json files"
+    json_dir.mkdir(parents=True, exist_ok=True)
+    if debug:
+        raw_dir = Path(output_dir) / "txt files"
+        formatted_dir = Path(output_dir) / "txt_Corrected"
+        raw_dir.mkdir(parents=True, exist_ok=True)
+        formatted_dir.mkdir(parents=True, exist_ok=True)
+
+    def flush(batch):
+        offers = parse_offers([text for _, text in batch])
+        for (pdf_file, text), (metadata, products, conditions) in zip(batch, offers):
+            if debug:
+                save_text_to_file(text, raw_dir / f"{pdf_file.stem}.txt")
+                save_text_to_file(render_offer(metadata, products, conditions), formatted_dir / f"{pdf_file.stem}.txt")
+
+            json_data = offer_to_json(metadata, products, conditions)
+            output_file = json_dir / f"{pdf_file.stem}.json"
+            write_json(json_data, output_file)
+            print(f"Processed {pdf_file.name} ➔ {output_file.name}")
+        return len(batch)
+
+    written = 0
+    batch = []
+    if pdf_files is None:
+        pdf_files = sorted(Path(input_dir).glob("*.pdf"))
+    for pdf_file, text, error in iter_pdf_texts(pdf_files, **extract_options):
+        if error is not None:
+            print(f"[ERROR] Failed to extract '{pdf_file.name}': {error}")
+            continue
+        batch.append((pdf_file, text))
+        if len(batch) >= batch_size:
+            written += flush(batch)
+            batch = []
+    if batch:
+        written += flush(batch)
+
+    return written
+
+
+def process_rows_to_ready(rows_df, staging_dir: str, ready_dir: str, prefix: str, seed: int = None,
+                          augment_workers: int = 1):
+    """
+    I use this function to run steps 5 to 8 on a subset of processed quote rows in a
+    staging folder, then move the resulting rows into the final 'json_ready' folder.
+
+    Parameters
+    ----------
+    rows_df : pd.DataFrame
+        Rows of processed_quotes.csv to push through the remaining stages.
+    staging_dir : str
+        Scratch folder for the intermediate stages; removed at the end.
+    ready_dir : str
+        Final 'json_ready' folder.
+    prefix : str
+        Prefix of the final file names, so rows of different PDFs never collide.
+    seed : int, optional
+        Seed of the run. The rows of each prefix get their own derived seed, since their
+        staging file names are the same for every PDF.
+    augment_workers : int, optional
+        Number of processes for steps 7 and 8.
+
+    Returns
+    -------
+    list[str]
+        Names of the files added to ready_dir.
+    """
+    staging = Path(staging_dir)
+    if staging.exists():
+        shutil.rmtree(staging)
+    staging.mkdir(parents=True)
+
+    csv_path = staging / "processed_quotes.csv"
+    rows_df.to_csv(csv_path, index=False)
+    convert_csv_to_json_rows(str(csv_path), str(staging / "json_output_from_csv"))
+    transform_json_files(str(staging / "json_output_from_csv"), str(staging / "json_transformed"))
+    seed = derive_seed(seed, prefix)
+    generate_variants(str(staging / "json_transformed"), str(staging / "json_variants"),
+                      seed=seed, workers=augment_workers)
+    prepare_dataset(str(staging / "json_variants"), str(staging / "json_ready"), seed=seed, workers=augment_workers)
+
+    ready_path = Path(ready_dir)
+    ready_path.mkdir(parents=True, exist_ok=True)
+    added = []
+    for row_file in sorted((staging / "json_ready").glob("*.json")):
+        target = ready_path / f"processed_{prefix}_{row_file.name[len('processed_'):]}"
+        os.replace(row_file, target)
+        added.append(target.name)
+
+    shutil.rmtree(staging)
+    return added
+
+
+def write_row_sources(processed_df, output_dir, source_column: str = "source_file"):
+    """
+    Saves the quote JSON of every row of processed_quotes.csv, in row order (see `rows_by_quote`).
+    """
+    write_json(processed_df[source_column].tolist(), Path(output_dir) / ROW_SOURCES_NAME)
+
+
+def rows_by_quote(output_dir) -> dict:
+    """
+    I use this function to find the 'json_ready' rows each quote JSON produced in a full run.
+
+    Row i of processed_quotes.csv becomes 'quote_{i+1}.json' in step 5, and its variants keep
+    that name up to step 8 ('processed_quote_{i+1}_0_original.json', 'processed_quote_{i+1}_{k}.json').
+    Other files of 'json_ready' (extra JSON files, files added by hand) belong to no quote.
+
+    Returns
+    -------
+    dict[str, list[str]] or None
+        Quote JSON name -> row files, or None when step 4 did not record the sources of its rows.
+    """
+    sources_path = Path(output_dir) / ROW_SOURCES_NAME
+    if not sources_path.exists():
+        return None
+    sources = read_json(sources_path)
+    rows = {source: [] for source in sources}
+    for row_file in Path(output_dir, "json_ready").glob("processed_quote_*_*.json"):
+        match = STEP_8_ROW.fullmatch(row_file.name)
+        index = int(match.group(1)) - 1 if match else -1
+        if 0 <= index < len(sources):
+            rows[sources[index]].append(row_file.name)
+    return rows
+
+
+def clear_manifest_rows(output_dir):
+    """
+    Deletes the 'json_ready' rows the pipeline wrote for the PDFs of the manifest of output_dir,
+    and the manifest. A full run rebuilds every row, so rows named after an incremental run
+    would become duplicates. Extra JSON files and files added by hand are left alone.
+    """
+    manifest = PipelineManifest(Path(output_dir) / MANIFEST_NAME)
+    if not manifest.exists:
+        return
+    rows = manifest.all_rows()
+    for row in rows:
+        Path(output_dir, "json_ready", row).unlink(missing_ok=True)
+    manifest.path.unlink()
+    print(f"🧹 Removed the {len(rows)} row(s) of the pipeline manifest before the full run.")
+
+
+def import_extra_files(extra_json_folder: str, output_dir: str, manifest: PipelineManifest) -> tuple:
+    """
+    I use this function for step 9 of an incremental run: only the extra JSON files and JSONL
+    exports that are new or changed since their last import (content hash in the manifest)
+    are copied into 'json_ready' or imported into 'extra_rows'.
+
+    Returns
+    -------
+    tuple[list[str], list[str], list[str]]
+        Files added to 'json_ready', files replaced (changed extra JSON files and re-imported
+        exports, so the training table is rebuilt), and CSV files written in 'extra_rows'.
+    """
+    extra_path = Path(extra_json_folder)
+    changed_json = manifest.extra_changes("json", sorted(extra_path.glob("*.json")) if extra_path.is_dir() else [])
+    copied = copy_extra_json_folder_into_ready_folder(extra_json_folder, str(Path(output_dir, "json_ready")),
+                                                      names={file.name for file, _ in changed_json})
+    replaced = [name for name in copied if manifest.is_known_extra("json", name)]
+    for file, sha in changed_json:
+        manifest.record_extra("json", file.name, sha)
+
+    changed_exports = manifest.extra_changes("jsonl", jsonl_exports(extra_json_folder))
+    previous_tables = {p.name for p in Path(output_dir, EXTRA_ROWS_DIR).glob("*.csv")}
+    new_extra_tables = import_jsonl_folder(extra_json_folder, output_dir,
+                                           exports=[file for file, _ in changed_exports])
+    replaced += [name for name in new_extra_tables if name in previous_tables]
+    for file, sha in changed_exports:
+        manifest.record_extra("jsonl", file.name, sha)
+
+    skipped = len(jsonl_exports(extra_json_folder)) - len(changed_exports)
+    if skipped:
+        print(f"♻️ {skipped} JSONL export(s) unchanged since their last import: skipped.")
+    return copied, replaced, new_extra_tables
+
+
+def run_incremental(input_dir: str, output_dir: str, extra_json_folder: str = None,
+                    instrumentation: PipelineInstrumentation = None, **options):
+    """
+    I use this incremental mode to push only new or changed PDFs through the pipeline.
+
+    A manifest in output_dir records every processed PDF (content hash, quote JSON and the rows
+    it produced in 'json_ready'). New or changed PDFs go through extraction and JSON conversion;
+    step 4 still reads all quotes, and only the rows of those PDFs go through steps 5 to 8,
+    in a staging folder, before being added to 'json_ready'. Rows of removed or changed PDFs
+    are deleted. Step 4 transforms the quotes with the preprocessing saved by the previous run
+    ('preprocessing.pkl'), and only refits it on `refit_preprocessing` or when the data drifted.
+    Without a manifest, I run the full pipeline once and start the manifest from it, with the
+    rows each PDF produced (see `rows_by_quote`).
 
     Parameters
     ----------
@@ -65,50 +329,354 @@ def main(input_dir: str, output_dir: str, extra_json_folder: str = None):
         Folder to save all output files.
     extra_json_folder : str, optional
         Path to a folder containing extra JSON files to add to final output.
+    instrumentation : PipelineInstrumentation, optional
+        Collects per-stage measurements, as in `main`.
+    **options
+        pdf_workers, pdf_cache_dir, pdf_backend, debug, seed, augment_workers,
+        refit_preprocessing and outlier_workers, as in `main`.
 
     Returns
     -------
-    None
+    dict
+        "full_rebuild": whether the full pipeline ran, "new_rows" and "removed_rows":
+        files added to / deleted from 'json_ready', and "new_extra_tables": CSV files written in
+        'extra_rows' from JSONL exports. A re-imported export counts as removed and added again.
     """
-    print("Step 1: Extracting text from PDFs...")
-    extract_text_from_pdfs(input_dir, f"{output_dir}/txt files")
+    output_path = Path(output_dir)
+    ready_dir = output_path / "json_ready"
+    json_dir = output_path / "json files"
+    manifest = PipelineManifest(output_path / MANIFEST_NAME)
+    pdf_files = sorted(Path(input_dir).glob("*.pdf"))
+    stage = (instrumentation or PipelineInstrumentation()).stage
 
-    print("Step 2: Formatting .txt files...")
-    format_all_txt_files_in_folder(f"{output_dir}/txt files", f"{output_dir}/txt_Corrected")
+    if not manifest.exists:
+        print("No pipeline manifest yet: running the full pipeline once.")
+        main(input_dir, output_dir, extra_json_folder, instrumentation=instrumentation, **options)
+        quote_rows = rows_by_quote(output_dir) or {}
+        for pdf_file in pdf_files:
+            rows = quote_rows.get(f"{pdf_file.stem}.json", [])
+            manifest.record(pdf_file.name, file_sha256(pdf_file), f"{pdf_file.stem}.json", rows)
+        if extra_json_folder:
+            # The full run imported them all
+            extra_path = Path(extra_json_folder)
+            json_files = sorted(extra_path.glob("*.json")) if extra_path.is_dir() else []
+            for kind, files in (("json", json_files), ("jsonl", jsonl_exports(extra_json_folder))):
+                for file, sha in manifest.extra_changes(kind, files):
+                    manifest.record_extra(kind, file.name, sha)
+        manifest.save()
+        return {"full_rebuild": True, "new_rows": [], "removed_rows": [], "new_extra_tables": []}
+
+    changed, removed = manifest.diff(pdf_files)
+    print(f"Incremental run: {len(changed)} new or changed PDF(s), {len(removed)} removed.")
+
+    # I drop everything produced by PDFs that were removed or replaced
+    removed_rows = []
+    for name in removed + [pdf_file.name for pdf_file, _ in changed]:
+        entry = manifest.forget(name)
+        if entry is None:
+            continue
+        if not entry["rows"]:
+            print(f"⚠️ Rows of '{name}' predate the manifest and are kept.")
+        for row in entry["rows"]:
+            (ready_dir / row).unlink(missing_ok=True)
+            removed_rows.append(row)
+        if name in removed:
+            (json_dir / entry["json"]).unlink(missing_ok=True)
+
+    new_rows, new_extra_tables = [], []
+    if changed:
+        print("Steps 1-3: Extracting new PDFs and converting them to JSON...")
+        with stage("steps_1_3_pdf_to_json", inputs=[pdf_file for pdf_file, _ in changed], outputs=[json_dir]):
+            convert_pdfs_to_json(input_dir, output_dir, debug=options.get("debug", False),
+                                 pdf_files=[pdf_file for pdf_file, _ in changed],
+                                 workers=options.get("pdf_workers", 1),
+                                 cache_dir=options.get("pdf_cache_dir") or f"{output_dir}/pdf_cache",
+                                 backend=options.get("pdf_backend", "pdfplumber"))
+
+        print("Step 4: Flattening JSON and saving to CSV...")
+        with stage("step_4_flatten", inputs=[json_dir],
+                   outputs=[output_path / "processed_quotes.csv", output_path / REJECTS_NAME]):
+            processed_df = process_quote_files(str(json_dir), source_column="source_file",
+                                               random_state=_random_state(options.get("seed")),
+                                               preprocessor_path=str(output_path / PREPROCESSOR_NAME),
+                                               refit=options.get("refit_preprocessing", False),
+                                               rejects_path=str(output_path / REJECTS_NAME),
+                                               outlier_workers=options.get("outlier_workers", 1),
+                                               new_files=[f"{pdf_file.stem}.json" for pdf_file, _ in changed])
+            if processed_df.empty:
+                print("⚠️ No data processed.")
+            else:
+                processed_df.drop(columns="source_file").to_csv(output_path / "processed_quotes.csv", index=False)
+                write_row_sources(processed_df, output_dir)
+
+        print("Steps 5-8: Preparing the rows of the new PDFs...")
+        with stage("steps_5_8_new_rows", outputs=[ready_dir]):
+            for pdf_file, sha in changed:
+                json_name = f"{pdf_file.stem}.json"
+                rows = []
+                if not processed_df.empty:
+                    rows_df = processed_df[processed_df["source_file"] == json_name].drop(columns="source_file")
+                    if not rows_df.empty:
+                        rows = process_rows_to_ready(rows_df, str(output_path / "incremental_staging"),
+                                                     str(ready_dir), prefix=sha[:8], seed=options.get("seed"),
+                                                     augment_workers=options.get("augment_workers", 1))
+                manifest.record(pdf_file.name, sha, json_name, rows)
+                new_rows.extend(rows)
+
+    # OPTIONAL STEP
+    if extra_json_folder:
+        print("Step 9: Adding extra JSON files from folder to final dataset...")
+        extra_rows_dir = output_path / EXTRA_ROWS_DIR
+        with stage("step_9_extra_json", inputs=[extra_json_folder], outputs=[ready_dir, extra_rows_dir]):
+            copied, replaced, new_extra_tables = import_extra_files(extra_json_folder, output_dir, manifest)
+            new_rows.extend(copied)
+            removed_rows.extend(replaced)
 
-    print("Step 3: Converting .txt to JSON...")
-    batch_convert_txt_folder(f"{output_dir}/txt_Corrected", f"{output_dir}/json files")
+    manifest.save()
+    print(f" Incremental pipeline completed: {len(new_rows)} row(s) added, {len(removed_rows)} removed.")
+    return {"full_rebuild": False, "new_rows": new_rows, "removed_rows": removed_rows,
+            "new_extra_tables": new_extra_tables}
 
-    print("Step 4: Flattening JSON and saving to CSV...")
-    os.makedirs(output_dir, exist_ok=True)
-    processed_df = process_quote_files(f"{output_dir}/json files")
+
+def _random_state(seed):
+    """
+    random_state of the step 4 estimators, which always used 42 before seeds existed.
+    """
+    return 42 if seed is None else seed
+
+
+def build_pipeline_graph(input_dir: str, output_dir: str, extra_json_folder: str = None,
+                         instrumentation: PipelineInstrumentation = None, workers: int = 2,
+                         pdf_workers: int = 1, pdf_cache_dir: str = None, pdf_backend: str = "pdfplumber",
+                         debug: bool = False, intermediate: str = "json", seed: int = None,
+                         augment_workers: int = 1, refit_preprocessing: bool = False,
+                         outlier_workers: int = 1) -> StageGraph:
+    """
+    I use this function to describe the full pipeline as a graph of stages.
+
+    Each stage declares the files it reads and writes, and the checkpoints in
+    'pipeline_checkpoints.json' let a rerun skip every stage whose inputs are unchanged,
+    so a failure in step 6 or 8 resumes there instead of at PDF extraction.
+    Step 9 (extra JSON files) only needs the data to exist, so it runs alongside steps 5 to 8.
+
+    With a columnar `intermediate` format, steps 5 to 8 read and write one table each in
+    'columnar' instead of a folder of JSON files per step, and step 9 writes its own table.
+
+    Parameters
+    ----------
+    input_dir : str
+        Folder containing original PDF files.
+    output_dir : str
+        Folder to save all output files.
+    extra_json_folder : str, optional
+        Path to a folder containing extra JSON files to add to final output.
+    instrumentation : PipelineInstrumentation, optional
+        Collects per-stage measurements.
+    workers : int, optional
+        Number of stages allowed to run at the same time.
+    pdf_workers, pdf_cache_dir, pdf_backend, debug, intermediate, seed, augment_workers, outlier_workers
+        As in `main`; refit_preprocessing is ignored, a full run always refits step 4.
+
+    Returns
+    -------
+    StageGraph
+        The graph, ready to run.
+    """
+    if intermediate != "json" and intermediate not in FORMATS:
+        raise ValueError(f"Unknown intermediate format '{intermediate}'. Available: json, {', '.join(FORMATS)}")
+
+    json_dir = f"{output_dir}/json files"
     csv_path = f"{output_dir}/processed_quotes.csv"
+    preprocessor_path = f"{output_dir}/{PREPROCESSOR_NAME}"
+    rejects_path = f"{output_dir}/{REJECTS_NAME}"
+    rows_dir = f"{output_dir}/json_output_from_csv"
+    transformed_dir = f"{output_dir}/json_transformed"
+    variants_dir = f"{output_dir}/json_variants"
+    ready_dir = f"{output_dir}/json_ready"
 
-    if not processed_df.empty:
-        processed_df.to_csv(csv_path, index=False)
+    def pdf_to_json():
+        print("Steps 1-3: Extracting PDFs and converting them to JSON...")
+        convert_pdfs_to_json(input_dir, output_dir, debug=debug, workers=pdf_workers,
+                             cache_dir=pdf_cache_dir or f"{output_dir}/pdf_cache", backend=pdf_backend)
+
+    def flatten():
+        print("Step 4: Flattening JSON and saving to CSV...")
+        processed_df = process_quote_files(json_dir, source_column="source_file", random_state=_random_state(seed),
+                                           preprocessor_path=preprocessor_path, rejects_path=rejects_path,
+                                           outlier_workers=outlier_workers)
+        if processed_df.empty:
+            Path(csv_path).unlink(missing_ok=True)
+            raise StopPipeline("No data processed.")
+        processed_df.drop(columns="source_file").to_csv(csv_path, index=False)
+        write_row_sources(processed_df, output_dir)
         print(f" Processing complete. Data saved to {csv_path}")
+
+    if intermediate == "json":
+        def split_csv():
+            print("Step 5: Splitting CSV into individual JSON rows...")
+            convert_csv_to_json_rows(csv_path, rows_dir)
+
+        def transform():
+            print("Step 6: Transforming JSON fields...")
+            transform_json_files(rows_dir, transformed_dir)
+
+        def variants():
+            print("Step 7: Generating data variants...")
+            generate_variants(transformed_dir, variants_dir, seed=seed, workers=augment_workers)
+
+        def features():
+            print("Step 8: Preparing dataset with features...")
+            prepare_dataset(variants_dir, ready_dir, seed=seed, workers=augment_workers)
+
+        def extra_json():
+            print("Step 9: Adding extra JSON files from folder to final dataset...")
+            copy_extra_json_folder_into_ready_folder(extra_json_folder, ready_dir)
+            import_jsonl_folder(extra_json_folder, output_dir)
+
+        # Step 9 may run while step 8 writes its 'processed_*' rows in the same folder
+        ready_glob, extra_glob, extra_exclude = "processed_*", ("*.json", "*.csv"), "processed_*"
     else:
-        print("⚠️ No data processed.")
-        return
+        columnar_dir = f"{output_dir}/columnar"
+        rows_dir, transformed_dir, variants_dir, ready_dir, extra_table = (
+            table_path(columnar_dir, name, intermediate)
+            for name in ("rows", "transformed", "variants", "ready", "extra"))
 
-    print("Step 5: Splitting CSV into individual JSON rows...")
-    convert_csv_to_json_rows(csv_path, f"{output_dir}/json_output_from_csv")
+        def split_csv():
+            print("Step 5: Loading CSV rows into a table...")
+            convert_csv_to_table(csv_path, rows_dir)
 
-    print("Step 6: Transforming JSON fields...")
-    transform_json_files(f"{output_dir}/json_output_from_csv", f"{output_dir}/json_transformed")
+        def transform():
+            print("Step 6: Transforming fields...")
+            transform_table(rows_dir, transformed_dir)
 
-    print("Step 7: Generating data variants...")
-    generate_variants(f"{output_dir}/json_transformed", f"{output_dir}/json_variants")
+        def variants():
+            print("Step 7: Generating data variants...")
+            generate_variants_table(transformed_dir, variants_dir, seed=seed)
 
-    print("Step 8: Preparing dataset with features...")
-    prepare_dataset(f"{output_dir}/json_variants", f"{output_dir}/json_ready")
+        def features():
+            print("Step 8: Preparing dataset with features...")
+            prepare_dataset_table(variants_dir, ready_dir, seed=seed)
 
+        def extra_json():
+            print("Step 9: Adding extra JSON files from folder to final dataset...")
+            extra_json_folder_to_table(extra_json_folder, extra_table)
+            import_jsonl_folder(extra_json_folder, output_dir)
+
+        ready_glob = extra_glob = "*"
+        extra_exclude = ()
+
+    graph = StageGraph(Path(output_dir) / CHECKPOINT_NAME, instrumentation, workers=workers)
+    graph.add(Stage("steps_1_3_pdf_to_json", pdf_to_json, inputs=sorted(Path(input_dir).glob("*.pdf")),
+                    outputs=[json_dir], params={"backend": pdf_backend, "debug": debug}))
+    graph.add(Stage("step_4_flatten", flatten, inputs=[json_dir],
+                    outputs=[csv_path, preprocessor_path, rejects_path, f"{output_dir}/{ROW_SOURCES_NAME}"],
+                    after=["steps_1_3_pdf_to_json"], params={"seed": seed}))
+    graph.add(Stage("step_5_split_csv", split_csv, inputs=[csv_path], outputs=[rows_dir],
+                    after=["step_4_flatten"]))
+    graph.add(Stage("step_6_transform", transform, inputs=[rows_dir], outputs=[transformed_dir],
+                    after=["step_5_split_csv"]))
+    graph.add(Stage("step_7_variants", variants, inputs=[transformed_dir], outputs=[variants_dir],
+                    after=["step_6_transform"], params={"seed": seed}))
+    graph.add(Stage("step_8_features", features, inputs=[variants_dir], outputs=[ready_dir],
+                    after=["step_7_variants"], output_glob=ready_glob, params={"seed": seed}))
     # OPTIONAL STEP
     if extra_json_folder:
-        print("Step 9: Adding extra JSON files from folder to final dataset...")
-        copy_extra_json_folder_into_ready_folder(extra_json_folder, f"{output_dir}/json_ready")
+        graph.add(Stage("step_9_extra_json", extra_json, inputs=[extra_json_folder],
+                        outputs=[ready_dir if intermediate == "json" else extra_table,
+                                 f"{output_dir}/{EXTRA_ROWS_DIR}", f"{output_dir}/{EXTRA_REJECTS_NAME}"],
+                        after=["step_4_flatten"], output_glob=extra_glob, output_exclude=extra_exclude))
+    return graph
+
+
+def main(input_dir: str, output_dir: str, extra_json_folder: str = None, pdf_workers: int = 1,
+         pdf_cache_dir: str = None, pdf_backend: str = "pdfplumber", debug: bool = False,
+         incremental: bool = False, instrumentation: PipelineInstrumentation = None,
+         profile_stage: str = None, resume: bool = True, stage_workers: int = 2, intermediate: str = "json",
+         seed: int = None, augment_workers: int = 1, refit_preprocessing: bool = False,
+         outlier_workers: int = 1):
+    """
+    I use this pipeline to process raw PDF data all the way to enriched JSONs.
+    If an additional folder of JSON files is provided, I include its content in the final dataset.
+
+    Parameters
+    ----------
+    input_dir : str
+        Folder containing original PDF files.
+    output_dir : str
+        Folder to save all output files.
+    extra_json_folder : str, optional
+        Path to a folder containing extra JSON files to add to final output.
+    pdf_workers : int, optional
+        Number of processes used for PDF extraction (0 = one per CPU).
+    pdf_cache_dir : str, optional
+        Folder of the persistent PDF text cache. Defaults to 'pdf_cache' inside output_dir.
+    pdf_backend : str, optional
+        PDF text backend: "pdfplumber", "pymupdf" or "pypdf".
+    debug : bool, optional
+        Whether to keep the intermediate 'txt files' and 'txt_Corrected' outputs. The JSON
+        files are also indented in debug mode; otherwise they are written compact (see `Json_codec`).
+    incremental : bool, optional
+        Only process PDFs that are new or changed since the last run (see `run_incremental`).
+    instrumentation : PipelineInstrumentation, optional
+        Collects wall time, CPU time, peak RSS, files and bytes of every stage. When I am not
+        given one, I create my own and write its report as 'run_report.json' in output_dir.
+    profile_stage : str, optional
+        Name of a stage to run under cProfile (e.g. "step_4_flatten"); the .prof file is written
+        in output_dir. Only used when I create the instrumentation myself.
+    resume : bool, optional
+        Skip the stages whose inputs did not change since their last successful run
+        (see `build_pipeline_graph`). False reruns every stage.
+    stage_workers : int, optional
+        Number of independent stages allowed to run at the same time.
+    intermediate : str, optional
+        Format of steps 5 to 8: "json" (one file per row, default), or "parquet" / "arrow"
+        for one table per step in 'columnar' (needs pyarrow). The training table is then
+        'columnar/ready' (+ 'columnar/extra'); `Columnar.export_json_rows` gives back the
+        per-file JSON layout. Full runs only.
+    seed : int, optional
+        Seed of every stochastic stage: step 4 estimators (42 when not given, as before),
+        variants (step 7) and simulated LME prices (step 8). Each file or row draws from
+        its own stream, so the same seed gives the same dataset. None = non-reproducible.
+    augment_workers : int, optional
+        Number of processes for steps 7 and 8 (JSON layout); the output does not depend on it.
+    refit_preprocessing : bool, optional
+        Incremental mode only: refit the step 4 imputer, isolation forest and target encoders
+        instead of reusing the ones saved in 'preprocessing.pkl'. Full runs always refit.
+    outlier_workers : int, optional
+        Number of cores of the step 4 isolation forest (0 = all). On large datasets it is
+        fitted on a sample and scores the rows by chunks (see `Handling.QuotePreprocessor`).
+
+    Returns
+    -------
+    dict or None
+        The summary of `run_incremental` in incremental mode, None otherwise.
+    """
+    options = dict(pdf_workers=pdf_workers, pdf_cache_dir=pdf_cache_dir, pdf_backend=pdf_backend, debug=debug,
+                   seed=seed, augment_workers=augment_workers, refit_preprocessing=refit_preprocessing,
+                   outlier_workers=outlier_workers)
+    # Indented JSON only during this run (debug mode), also in the worker processes it starts
+    with pretty_output(debug):
+        if instrumentation is None:
+            instrumentation = PipelineInstrumentation(profile_stage=profile_stage, profile_dir=output_dir)
+            try:
+                return main(input_dir, output_dir, extra_json_folder, incremental=incremental,
+                            instrumentation=instrumentation, resume=resume, stage_workers=stage_workers,
+                            intermediate=intermediate, **options)
+            finally:
+                instrumentation.write(output_dir)
+        if incremental:
+            if intermediate != "json":
+                raise ValueError("Incremental mode works on the per-file JSON layout; use intermediate='json'.")
+            return run_incremental(input_dir, output_dir, extra_json_folder, instrumentation=instrumentation, **options)
 
-    print(" Full data pipeline completed successfully!")
+        # A full run rewrites the outputs, so an older manifest no longer describes them
+        clear_manifest_rows(output_dir)
+        os.makedirs(output_dir, exist_ok=True)
+        graph = build_pipeline_graph(input_dir, output_dir, extra_json_folder, instrumentation,
+                                     workers=stage_workers, intermediate=intermediate, **options)
+        status = graph.run(force=not resume)
+        if "stopped" not in status.values():
+            print(" Full data pipeline completed successfully!")
 
 
 if __name__ == "__main__":
@@ -1,6 +1,38 @@
 import re
+import numpy as np
 from pathlib import Path
 
+# Condition headers I use to split sections
+CONDITION_STARTERS = (
+    "Verktygskostnad:", "Legering:", "Toleranser:", "Ytbehandling:",
+    "Lev. längd:", "Lev. villkor:", "Lev. tid:", "NOT:",
+    "Betalningsvillkor:", "Giltighet:", "Allmänna villkor:", "Råvara:"
+)
+
+# I compile the patterns once at import time instead of going through the re cache per token
+NUMBER_PATTERN = re.compile(r'^\d+[,.]?\d*$')
+CONDITION_PATTERN = re.compile("|".join(re.escape(starter) for starter in CONDITION_STARTERS))
+PRODUCTS_HEADER = "Profil nr / Vikt"
+PRODUCT_COLUMNS = (
+    "Profil nr/Kund ref", "Vikt kg/m", "Längd/m m", "Kap + truml Pris/st",
+    "ca antal Årsvolym st", "Prix kr/st SEK", "Legering"
+)
+PRODUCT_NOISE_LINES = ("SEK", "Pris/st SEK")
+
+# Parser states
+_METADATA, _PRODUCTS, _CONDITIONS = range(3)
+
+# Product number fields, in the order the business rules try them. A number goes to the
+# first field whose rule matches and which is still empty; anything else is the price.
+_ANTAL, _LÄNGD, _VIKT, _KAP, _PRIS = range(5)
+_NUMBER_RULES = (
+    (_ANTAL, lambda v: v > 1000),
+    (_LÄNGD, lambda v: v > 10),
+    (_VIKT, lambda v: (v > 1) & (v < 2)),
+    (_KAP, lambda v: v < 1),
+)
+
+
 def extract_leg_from_conditions(conditions):
     """
     I use this function to extract the alloy (Legering) from a list of condition strings.
@@ -24,14 +56,42 @@ def extract_leg_from_conditions(conditions):
     return ""
 
 
-def parse_product_line(tokens, fallback_name, default_legering):
+def split_tokens(tokens):
     """
-    I use this function to convert a line of raw product data into structured product information.
+    I use this function to split the tokens of a product line into numbers
+    (with ',' normalised to '.') and strings, in a single pass.
 
     Parameters:
     ----------
     tokens : list[str]
         Tokens from the product line.
+
+    Returns:
+    -------
+    tuple[list[str], list[str]]
+        The numeric tokens and the non-numeric tokens, in their original order.
+    """
+    numbers, strings = [], []
+    is_number = NUMBER_PATTERN.match
+    for token in tokens:
+        if is_number(token):
+            numbers.append(token.replace(",", "."))
+        else:
+            strings.append(token)
+    return numbers, strings
+
+
+def assign_product_fields(numbers, strings, fallback_name, default_legering):
+    """
+    I use this function to map the already classified tokens of a product line
+    to the product columns, following the business rules.
+
+    Parameters:
+    ----------
+    numbers : list[str]
+        Numeric tokens, '.' as decimal separator.
+    strings : list[str]
+        Non-numeric tokens.
     fallback_name : str
         A default name if none is found in the tokens.
     default_legering : str
@@ -42,19 +102,9 @@ def parse_product_line(tokens, fallback_name, default_legering):
     list
         A list of cleaned values: name, vikt, längd, kap, antal, pris, legering.
     """
-    name = fallback_name
+    name = strings[0] if strings else fallback_name
     vikt = längd = kap = antal = pris = ""
-    legering = default_legering
-
-    # I split numeric and non-numeric tokens
-    numbers = [token.replace(",", ".") for token in tokens if re.match(r'^\d+[,.]?\d*$', token)]
-    strings = [token for token in tokens if not re.match(r'^\d+[,.]?\d*$', token)]
 
-    # I update the name if a string is available
-    if strings:
-        name = strings[0]
-
-    # I assign values based on business rules
     for num in numbers:
         num_float = float(num)
         if num_float > 1000 and not antal:
@@ -68,87 +118,251 @@ def parse_product_line(tokens, fallback_name, default_legering):
         else:
             pris = num
 
-    return [name, vikt, längd, kap, antal, pris, legering]
+    return [name, vikt, längd, kap, antal, pris, default_legering]
 
 
-def format_offer(input_file: Path, output_file: Path):
+def parse_product_line(tokens, fallback_name, default_legering):
     """
-    I use this function to transform raw text extracted from PDF into a clean offer summary
-    including metadata, products, and conditions. Everything is written to a new .txt file.
+    I use this function to convert a line of raw product data into structured product information.
 
     Parameters:
     ----------
-    input_file : Path
-        Path to the original raw .txt file.
-    output_file : Path
-        Path to write the formatted offer to.
+    tokens : list[str]
+        Tokens from the product line.
+    fallback_name : str
+        A default name if none is found in the tokens.
+    default_legering : str
+        Default alloy value if none is found in the line.
 
     Returns:
     -------
-    None
+    list
+        A list of cleaned values: name, vikt, längd, kap, antal, pris, legering.
     """
-    # I read and clean up lines
-    with input_file.open('r', encoding='utf-8') as f:
-        lines = [line.strip() for line in f if line.strip()]
+    numbers, strings = split_tokens(tokens)
+    return assign_product_fields(numbers, strings, fallback_name, default_legering)
 
-    metadata, raw_products, products, conditions = [], [], [], []
-    in_products_section = False
 
-    # Condition headers I use to split sections
-    condition_starters = [
-        "Verktygskostnad:", "Legering:", "Toleranser:", "Ytbehandling:",
-        "Lev. längd:", "Lev. villkor:", "Lev. tid:", "NOT:",
-        "Betalningsvillkor:", "Giltighet:", "Allmänna villkor:", "Råvara:"
-    ]
+def classify_number_matrix(values, lengths):
+    """
+    I use this function to apply the product number rules to a whole matrix of lines at once.
+    I walk the token positions (a handful at most), and at each position every line is
+    classified together with boolean masks, in the same order as `assign_product_fields`.
+
+    Parameters:
+    ----------
+    values : np.ndarray
+        (lines × tokens) float matrix, padded with NaN.
+    lengths : np.ndarray
+        Number of real tokens of each line.
+
+    Returns:
+    -------
+    np.ndarray
+        (lines × 5) matrix of token positions for antal, längd, vikt, kap, pris (-1 when not found).
+    """
+    n_lines, width = values.shape
+    chosen = np.full((n_lines, 5), -1, dtype=np.intp)
+    for k in range(width):
+        column = values[:, k]
+        remaining = lengths > k
+        for field, rule in _NUMBER_RULES:
+            hit = remaining & rule(column) & (chosen[:, field] < 0)
+            chosen[hit, field] = k
+            remaining &= ~hit
+        # The price keeps the last number that matched no other rule
+        chosen[remaining, _PRIS] = k
+    return chosen
+
+
+def classify_product_numbers(numbers_per_line):
+    """
+    I use this function to classify the numeric tokens of many product lines at once,
+    with the same business rules as `assign_product_fields`. All tokens are converted
+    to floats in one NumPy call and classified by `classify_number_matrix`.
+
+    Parameters:
+    ----------
+    numbers_per_line : list[list[str]]
+        Numeric tokens of each product line, '.' as decimal separator.
+
+    Returns:
+    -------
+    list[list[str]]
+        For each line: vikt, längd, kap, antal, pris ("" when not found).
+    """
+    n_lines = len(numbers_per_line)
+    lengths = np.fromiter(map(len, numbers_per_line), dtype=np.intp, count=n_lines)
+    flat = [num for numbers in numbers_per_line for num in numbers]
+    if not flat:
+        return [["", "", "", "", ""] for _ in range(n_lines)]
+
+    # Token matrix, padded with NaN
+    starts = np.cumsum(lengths) - lengths
+    rows = np.repeat(np.arange(n_lines), lengths)
+    cols = np.arange(len(flat)) - np.repeat(starts, lengths)
+    values = np.full((n_lines, int(lengths.max())), np.nan)
+    # Casting from an object array uses the C float parser, much faster than from np.str_
+    tokens = np.array(flat + [""], dtype=object)
+    values[rows, cols] = tokens[:-1].astype(np.float64)
+
+    chosen = classify_number_matrix(values, lengths)[:, [_VIKT, _LÄNGD, _KAP, _ANTAL, _PRIS]]
+    # Positions become flat indices; -1 points at the trailing "" so empty fields need no special case
+    flat_index = np.where(chosen >= 0, starts[:, None] + chosen, -1)
+    return tokens[flat_index].tolist()
+
+
+def _split_offer_lines(lines):
+    """
+    Runs the line state machine of an offer and returns its metadata lines,
+    the (numbers, strings) tokens of each product line, its condition lines
+    and the fallback product name.
+    """
+    metadata, classified, conditions = [], [], []
+    fallback_name = None
+    state = _METADATA
+    is_condition = CONDITION_PATTERN.match
+    is_number = NUMBER_PATTERN.match
 
-    # I separate metadata, product data, and conditions
     for line in lines:
-        if line.startswith("Profil nr / Vikt"):
-            in_products_section = True
+        line = line.strip()
+        if not line:
             continue
 
-        if any(line.startswith(starter) for starter in condition_starters):
-            in_products_section = False
+        if line.startswith(PRODUCTS_HEADER):
+            state = _PRODUCTS
+        elif is_condition(line):
+            state = _CONDITIONS
             conditions.append(line)
-            continue
-
-        if not in_products_section and not conditions:
+        elif state == _METADATA:
             metadata.append(line)
-            continue
-
-        if in_products_section:
-            if line.startswith("Kund ref.") or line in ("SEK", "Pris/st SEK"):
+        elif state == _PRODUCTS:
+            if line.startswith("Kund ref.") or line in PRODUCT_NOISE_LINES:
                 continue
-            raw_products.append(line.split())
+            tokens = line.split()
+            numbers, strings = split_tokens(tokens)
+            # I use the first line starting with a string as fallback name
+            if fallback_name is None and not is_number(tokens[0]):
+                fallback_name = tokens[0]
+            classified.append((numbers, strings))
+
+    return metadata, classified, conditions, fallback_name or ""
+
+
+def parse_offer_lines(lines):
+    """
+    I use this function to split the raw lines of an offer into metadata, products
+    and conditions in one pass. Each line is classified once by a small state machine
+    (metadata → products → conditions), and product lines are tokenized and their
+    tokens classified as they are read.
+
+    Parameters:
+    ----------
+    lines : Iterable[str]
+        Raw lines of the extracted text.
 
-    # I use the first valid string as fallback name
-    fallback_name = next((tokens[0] for tokens in raw_products if not re.match(r'^\d+[,.]?\d*$', tokens[0])), "")
+    Returns:
+    -------
+    tuple[list[str], list[list], list[str]]
+        metadata lines, parsed products, condition lines.
+    """
+    metadata, classified, conditions, fallback_name = _split_offer_lines(lines)
     default_legering = extract_leg_from_conditions(conditions)
+    products = [
+        assign_product_fields(numbers, strings, fallback_name, default_legering)
+        for numbers, strings in classified
+    ]
+    return metadata, products, conditions
+
+
+def parse_offers(texts):
+    """
+    I use this function to parse many offers at once. The line state machine runs per
+    offer, then the numeric tokens of every product line of every offer are classified
+    in a single `classify_product_numbers` call.
+
+    Parameters:
+    ----------
+    texts : list[str]
+        Raw extracted texts.
 
-    # I process all product lines
-    for tokens in raw_products:
-        parsed = parse_product_line(tokens, fallback_name, default_legering)
-        products.append(parsed)
+    Returns:
+    -------
+    list[tuple]
+        One (metadata, products, conditions) tuple per text, as `parse_offer_lines` returns.
+    """
+    split = [_split_offer_lines(text.splitlines()) for text in texts]
+    numbers_per_line = [numbers for _, classified, _, _ in split for numbers, _ in classified]
+    fields = iter(classify_product_numbers(numbers_per_line))
+
+    offers = []
+    for metadata, classified, conditions, fallback_name in split:
+        default_legering = extract_leg_from_conditions(conditions)
+        products = []
+        for _, strings in classified:
+            name = strings[0] if strings else fallback_name
+            products.append([name, *next(fields), default_legering])
+        offers.append((metadata, products, conditions))
+    return offers
+
+
+def render_offer(metadata, products, conditions) -> str:
+    """
+    I use this function to render the parsed offer as the formatted text table.
+
+    Parameters:
+    ----------
+    metadata : list[str]
+        Metadata lines.
+    products : list[list]
+        Parsed product lines.
+    conditions : list[str]
+        Condition lines.
+
+    Returns:
+    -------
+    str
+        The formatted offer.
+    """
+    parts = ["=== MÉTADONNÉES ===\n", "\n".join(metadata[:5]) + "\n\n"]
+
+    if len(products) > 2:
+        parts.append("=== PRODUITS ===\n")
+        parts.append(" | ".join(PRODUCT_COLUMNS) + "\n")
+        parts.append("-------------------|-----------|-----------|---------------------|----------------------|----------------|---------\n")
+        for prod in products:
+            parts.append(
+                f"{prod[0]:<18} | {prod[1]:>9} | {prod[2]:>9} | "
+                f"{prod[3]:>19} | {prod[4]:>20} | {prod[5]:>14} | {prod[6]}\n"
+            )
+        parts.append("\n")
+
+    parts.append("=== CONDITIONS ===\n")
+    parts.append("\n".join(conditions))
+    return "".join(parts)
+
+
+def format_offer(input_file: Path, output_file: Path):
+    """
+    I use this function to transform raw text extracted from PDF into a clean offer summary
+    including metadata, products, and conditions. Everything is written to a new .txt file.
+
+    Parameters:
+    ----------
+    input_file : Path
+        Path to the original raw .txt file.
+    output_file : Path
+        Path to write the formatted offer to.
+
+    Returns:
+    -------
+    None
+    """
+    with input_file.open('r', encoding='utf-8') as f:
+        metadata, products, conditions = parse_offer_lines(f)
 
-    # I now write the formatted data to a file
     with output_file.open('w', encoding='utf-8') as f:
-        f.write("=== MÉTADONNÉES ===\n")
-        f.write("\n".join(metadata[:5]) + "\n\n")
-
-        if len(products) > 2:
-            f.write("=== PRODUITS ===\n")
-            f.write("Profil nr/Kund ref | Vikt kg/m | Längd/m m | Kap + truml Pris/st | ca antal Årsvolym st | Prix kr/st SEK | Legering\n")
-            f.write("-------------------|-----------|-----------|---------------------|----------------------|----------------|---------\n")
-            for prod in products:
-                formatted_line = (
-                    f"{prod[0]:<18} | {prod[1]:>9} | {prod[2]:>9} | "
-                    f"{prod[3]:>19} | {prod[4]:>20} | {prod[5]:>14} | {prod[6]}"
-                )
-                f.write(formatted_line + "\n")
-            f.write("\n")
-
-        f.write("=== CONDITIONS ===\n")
-        f.write("\n".join(conditions))
+        f.write(render_offer(metadata, products, conditions))
 
 
 def format_all_txt_files_in_folder(input_dir, output_dir):
@@ -1,6 +1,7 @@
-import json
 import re
 from pathlib import Path
+from Json_codec import write_json
+from txt_Correction import PRODUCT_COLUMNS, parse_offer_lines, render_offer
 
 
 def convert_num(value):
@@ -88,6 +89,50 @@ def txt_to_json(text):
     }
 
 
+def offer_to_json(metadata, products, conditions):
+    """
+    Builds the same dictionary as `txt_to_json(render_offer(...))` straight from the
+    parsed offer, without rendering and re-splitting the text table.
+    Offers whose values contain the table separators ('|' or '===') are rare and are
+    still routed through the text round-trip, so the result is always identical.
+    """
+    fields = metadata[:5] + conditions + [str(value) for prod in products for value in prod]
+    if any("|" in field or "===" in field for field in fields):
+        return txt_to_json(render_offer(metadata, products, conditions))
+
+    metadonnees = {}
+    for line in metadata[:5]:
+        if ':' in line:
+            k, v = line.split(':', 1)
+            metadonnees[k.strip()] = v.strip()
+        else:
+            metadonnees['offert'] = line
+
+    produits = []
+    if len(products) > 2:
+        for prod in products:
+            produits.append({h: convert_num(str(c).strip()) for h, c in zip(PRODUCT_COLUMNS, prod)})
+
+    conditions_dict = {}
+    for line in conditions:
+        key, val = line.split(':', 1)
+        conditions_dict[key.strip()] = convert_num(val.strip())
+
+    return {
+        "metadonnees": metadonnees,
+        "produits": produits,
+        "conditions": conditions_dict
+    }
+
+
+def raw_text_to_json(text):
+    """
+    Turns the raw text extracted from a PDF directly into the quote dictionary,
+    in memory: this fuses the `format_offer` and `txt_to_json` steps.
+    """
+    return offer_to_json(*parse_offer_lines(text.splitlines()))
+
+
 def batch_convert_txt_folder(input_folder, output_folder):
     """
     Here, all .txt files in a given folder are read and converted into structured JSON format.
@@ -107,8 +152,7 @@ def batch_convert_txt_folder(input_folder, output_folder):
         json_data = txt_to_json(text)
 
         output_file = output_path / (txt_file.stem + ".json")
-        with open(output_file, 'w', encoding='utf-8') as fjson:
-            json.dump(json_data, fjson, ensure_ascii=False, indent=4)
+        write_json(json_data, output_file)
 
         print(f"Processed {txt_file.name} ➔ {output_file.name}")
 
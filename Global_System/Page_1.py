@@ -1,35 +1,23 @@
 import os
 import csv
-import json
 import joblib
 import numpy as np
 import uuid
-import math
 import re
+import sys
 import yfinance as yf
 from datetime import datetime
 import customtkinter as ctk
 
 
-DENSITY_ALU = 2700
-TOLERANCE_MAPPING = {
-    "EN 755-9": {"linear_tol": 0.15, "angular_tol": 0.5, "flatness": 0.2, "gd_t_index": 2.1},
-    "ISO 2768-m": {"linear_tol": 0.1, "angular_tol": 0.3, "flatness": 0.15, "gd_t_index": 2.8},
-    "ASME Y14.5": {"linear_tol": 0.05, "angular_tol": 0.2, "flatness": 0.1, "gd_t_index": 3.5},
-    "DIN 7168": {"linear_tol": 0.08, "angular_tol": 0.25, "flatness": 0.12, "gd_t_index": 3.0},
-    "ISO 286": {"linear_tol": 0.06, "angular_tol": 0.22, "flatness": 0.08, "gd_t_index": 3.2},
-    "JIS B 0401": {"linear_tol": 0.07, "angular_tol": 0.28, "flatness": 0.11, "gd_t_index": 2.9},
-    "ISO 8015": {"linear_tol": 0.04, "angular_tol": 0.18, "flatness": 0.07, "gd_t_index": 3.6},
-    "ASME B4.1": {"linear_tol": 0.12, "angular_tol": 0.35, "flatness": 0.18, "gd_t_index": 2.5},
-    "BS 4500": {"linear_tol": 0.11, "angular_tol": 0.33, "flatness": 0.16, "gd_t_index": 2.6},
-    "ISO 1829": {"linear_tol": 0.13, "angular_tol": 0.4, "flatness": 0.19, "gd_t_index": 2.4},
-    "DEFAULT": {"linear_tol": 0.3, "angular_tol": 1.0, "flatness": 0.5, "gd_t_index": 1.0}
-}
-ALLOY_CATEGORIES = [
-    "Aluminium 1050 Rå", "Aluminium 2017 T4", "Aluminium 3003 H14",
-    "Aluminium 4043 O", "Aluminium 5083 H111", "Aluminium 6061 T6",
-    "Aluminium 7075 T651", "Aluminium 2024 T351", "Rå"
-]
+# Set up paths: the feature engineering is shared with the training pipeline
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.abspath(os.path.join(current_dir, ".."))
+if parent_dir not in sys.path:
+    sys.path.append(parent_dir)
+
+from Data_Processing.Features import ALLOY_CATEGORIES, TOLERANCE_MAPPING, derived_features, invalid_geometry
+from Data_Processing.Json_codec import write_json
 
 def parse_ytbehandling(text):
     result = {"alloy_series": None, "alloy_strength": None, "temper_code": None, "european_std": 0}
@@ -43,19 +31,6 @@ def parse_ytbehandling(text):
         result["temper_code"] = int(match.group(1))
     return result
 
-def calculate_geometric_features(weight_kg_per_m, length_m):
-    area_mm2 = (weight_kg_per_m / DENSITY_ALU) * 1e6
-    height = math.sqrt(area_mm2 * 2)
-    width = area_mm2 / height
-    perimeter = 2 * (height + width)
-    return {
-        "thinness_ratio": round((4 * math.pi * area_mm2) / (perimeter ** 2), 4),
-        "area_to_length": round(area_mm2 / (length_m * 1000), 5),
-        "wall_factor": round(area_mm2 / perimeter, 4),
-        "dfm_index": round(min(1.0, 0.7 / (weight_kg_per_m ** 0.25)), 4),
-        "symmetry_score": 0.8
-    }
-
 def get_today_aluminium_price():
     try:
         data = yf.download("ALI=F", period="5d")['Close'].dropna()
@@ -208,17 +183,18 @@ class PredictionPage(ctk.CTkFrame):
             data["Råvara"] = today_price if isinstance(today_price, (float, int)) else 1.0
         except:
             data["Råvara"] = 1.0
-        tol = self.tol_dropdown.get()
-        data.update(TOLERANCE_MAPPING.get(tol, TOLERANCE_MAPPING["DEFAULT"]))
 
         # Ytbehandling
         ytb = self.entries["ytb"].get()
         data.update(parse_ytbehandling(ytb))
-        data.update(calculate_geometric_features(data["Vikt_kg_m"], data["Längd_m_m"]))
 
-        # Alloy
-        alloy_idx = self.alloy_dropdown.cget("values").index(self.alloy_dropdown.get())
-        data["alloy_category"] = alloy_idx
+        # Geometry, tolerance and alloy: same vectorized pass as the training data
+        features = derived_features([data["Vikt_kg_m"]], [data["Längd_m_m"]],
+                                    [self.tol_dropdown.get()], [self.alloy_dropdown.get()])
+        if invalid_geometry(features).any():
+            self.result_label.configure(text="Weight and length must be positive.")
+            return
+        data.update(features.to_dict("records")[0])
 
         # 2. Get model/scaler
         model_dir = self.get_model_path()
@@ -248,8 +224,7 @@ class PredictionPage(ctk.CTkFrame):
         os.makedirs(self.output_folder, exist_ok=True)
         output_filename = f"prediction_{uuid.uuid4().hex[:8]}.json"
         output_path = os.path.join(self.output_folder, output_filename)
-        with open(output_path, "w", encoding="utf-8") as f:
-            json.dump(data, f, indent=2, ensure_ascii=False)
+        write_json(data, output_path)
 
 # --- EXEMPLE POUR TESTER SEUL ---
 if __name__ == "__main__":
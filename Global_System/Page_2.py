@@ -31,7 +31,7 @@ for path in [parent_dir, ia_training_dir]:
         sys.path.append(path)
 
 # Import your Model_Training class or function
-from IA_training.IA_Model import Model_Training  # If IA_Model.py is in IA_training
+from IA_training.IA_Model import NOT_PROMOTED, Model_Training  # If IA_Model.py is in IA_training
 
 # Usage example (if needed)
 # model = Model_Training()
@@ -73,20 +73,21 @@ class CircularProgress(ctk.CTkCanvas):
         self.set(0)
 
 # --- CSV/REPORT UTILS ---
+REPORT_METRICS = ["R² Score", "MAPE", "MAE", "RMSE", "Max Error"]
+EVALUATIONS_HEADER = (["Version", "path"] + REPORT_METRICS + ["Total Training Time"]
+                      + [f"{key} 95% CI" for key in REPORT_METRICS] + ["Evaluation"])
+
 def parse_training_report(report_path):
-    metrics = {
-        "R² Score": "",
-        "MAPE": "",
-        "MAE": "",
-        "RMSE": "",
-        "Max Error": "",
-        "Total Training Time": ""
-    }
+    metrics = {key: "" for key in EVALUATIONS_HEADER[2:]}
     with open(report_path, "r", encoding="utf-8") as f:
         for line in f:
-            for key in metrics:
-                if key in line:
-                    metrics[key] = line.split(":")[1].strip().replace("%", "")
+            if ":" not in line:
+                continue
+            # "✅ MAE        : 0.0111" -> label "MAE" (the emoji and the padding are dropped)
+            label, value = line.split(":", 1)
+            label = re.sub(r"^\W+", "", label).strip()
+            if label in metrics:
+                metrics[label] = value.strip().replace("%", "")
     return metrics
 
 def get_next_version(csv_path):
@@ -100,7 +101,17 @@ def get_next_version(csv_path):
             return 0
         return max(versions) + 1
 
-def insert_new_version_row(csv_path, new_row):
+def get_promoted_model_path(csv_path):
+    # The promoted version is the first row of evaluations.csv (see VersionsPage)
+    if not os.path.exists(csv_path):
+        return None
+    with open(csv_path, "r", encoding="utf-8") as f:
+        reader = csv.reader(f)
+        next(reader, None)
+        first_row = next(reader, None)
+    return first_row[1] if first_row else None
+
+def insert_new_version_row(csv_path, new_row, promote=True):
     rows = []
     if os.path.exists(csv_path):
         with open(csv_path, "r", encoding="utf-8") as f:
@@ -108,12 +119,17 @@ def insert_new_version_row(csv_path, new_row):
         rows = reader[1:]  # skip header
         header = reader[0]
     else:
-        header = ["Version", "path", "R² Score", "MAPE", "MAE", "RMSE", "Max Error", "Total Training Time"]
+        header = EVALUATIONS_HEADER
+    if len(header) < len(EVALUATIONS_HEADER):
+        # Older files have no confidence intervals: their versions get empty cells
+        header = EVALUATIONS_HEADER
+        rows = [row + [""] * (len(header) - len(row)) for row in rows]
     with open(csv_path, "w", encoding="utf-8", newline='') as f:
         writer = csv.writer(f)
         writer.writerow(header)
-        writer.writerow(new_row)
-        writer.writerows(rows)
+        # A version that is not promoted goes right below the promoted one (the first row)
+        position = 0 if promote else min(1, len(rows))
+        writer.writerows(rows[:position] + [new_row] + rows[position:])
 
 # --- TRAIN PAGE ---
 class TrainPage(ctk.CTkFrame ):
@@ -144,6 +160,14 @@ class TrainPage(ctk.CTkFrame ):
         self.selected_files_label = ctk.CTkLabel(self.file_box, text="", font=("Arial", 14), text_color="#F0D48A", wraplength=900, anchor="w", justify="left")
         self.selected_files_label.pack(pady=4)
         self.pdf_files = []
+        # Unchecked: the new version continues the promoted one (seconds); checked: trained from scratch
+        self.full_retrain = ctk.CTkCheckBox(self.file_box, text="Full retrain (ignore the promoted version)",
+                                            font=("Arial", 14), text_color="#A8F0E2")
+        self.full_retrain.pack(pady=(0, 4))
+        # Opt-in: a full retrain evaluated on 5 folds takes about 6 trainings instead of 1
+        self.cross_validation = ctk.CTkCheckBox(self.file_box, text="5-fold evaluation (full retrain, slower)",
+                                                font=("Arial", 14), text_color="#A8F0E2")
+        self.cross_validation.pack(pady=(0, 10))
 
         # Progress Circle (hidden initially)
         self.progress_circle = CircularProgress(self, size=100, fg="#B7FF8F")
@@ -205,6 +229,8 @@ class TrainPage(ctk.CTkFrame ):
         self.save_pdfs()
         self.progress_label.configure(text="Training in progress... Please wait ⏳")
         csv_path = os.path.join(self.path3, "evaluations.csv")
+        full_retrain = bool(self.full_retrain.get())
+        warm_start_from = None if full_retrain else get_promoted_model_path(csv_path)
         N = get_next_version(csv_path)
         version_str = f"version_{N}"
         assets_path = os.path.join(self.path3, version_str)
@@ -214,7 +240,11 @@ class TrainPage(ctk.CTkFrame ):
             input_dir=self.path1,
             output_dir=self.path2,
             assets_path=assets_path,
-            extra_json_folder=self.path4
+            extra_json_folder=self.path4,
+            incremental=True,
+            warm_start_from=warm_start_from,
+            # Only on request: the version is then compared with the others on 5 folds, not on one split
+            cv_folds=5 if full_retrain and self.cross_validation.get() else None
         )
 
         report_path = os.path.join(assets_path, "IA_", "training_report.txt")
@@ -225,16 +255,25 @@ class TrainPage(ctk.CTkFrame ):
             r2_disp = f"{r2_float * 100:.2f}%"  # Display as percent
         except Exception:
             r2_disp = metrics["R² Score"]
+        try:
+            r2_ci = "–".join(f"{float(v) * 100:.2f}%" for v in metrics["R² Score 95% CI"].split("–"))
+        except Exception:
+            r2_ci = metrics["R² Score 95% CI"]
 
         new_row = [
             f"Version_{N}",
             os.path.join(self.path3, version_str, "IA_"),
-            r2_disp, metrics["MAPE"], metrics["MAE"], metrics["RMSE"], metrics["Max Error"], metrics["Total Training Time"]
+            r2_disp, metrics["MAPE"], metrics["MAE"], metrics["RMSE"], metrics["Max Error"], metrics["Total Training Time"],
+            r2_ci, metrics["MAPE 95% CI"], metrics["MAE 95% CI"], metrics["RMSE 95% CI"], metrics["Max Error 95% CI"],
+            metrics["Evaluation"]
         ]
-        insert_new_version_row(csv_path, new_row)
+        # A warm start validated on rows its base version saw is kept, but not promoted
+        promote = NOT_PROMOTED not in metrics["Evaluation"]
+        insert_new_version_row(csv_path, new_row, promote)
         self.progress_label.configure(
             text="✅ Training completed!\n"
-                 f"R²: {r2_disp}, MAPE: {metrics['MAPE']}%, MAE: {metrics['MAE']}",
+                 f"R²: {r2_disp}, MAPE: {metrics['MAPE']}%, MAE: {metrics['MAE']}"
+                 + ("" if promote else "\n⚠️ Too few new rows to validate it: not promoted."),
             text_color="#A8F0E2"
         )
         self.train_btn.configure(state="normal")
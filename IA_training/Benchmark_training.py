@@ -0,0 +1,231 @@
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+from sklearn.metrics import (
+    max_error, mean_absolute_error, mean_absolute_percentage_error, mean_squared_error, r2_score
+)
+from sklearn.model_selection import train_test_split
+from sklearn.preprocessing import StandardScaler
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.abspath(os.path.join(current_dir, "..")))
+
+from IA_training.Evaluation import bootstrap_intervals
+from IA_training.IA_Model import SELECTED_FEATURES, TARGET, new_row_mask, replay_rows
+from IA_training.Tuning import apply_params, tune_hyperparameters
+from IA_training.Training_profiles import (
+    PROFILES, describe_profile, fit_ensemble, make_ensemble, resolve_profile, warm_start_ensemble
+)
+
+
+def synthetic_training_table(n_rows: int, seed: int = 0) -> pd.DataFrame:
+    """
+    Training rows with the SELECTED_FEATURES in the ranges of the real quotes and a
+    nonlinear price (material, tooling amortized over the volume, manufacturability, noise).
+    """
+    rng = np.random.default_rng(seed)
+    weight = rng.uniform(0.1, 3.0, n_rows)
+    length = rng.uniform(3.0, 30.0, n_rows)
+    volume = rng.integers(1, 100, n_rows) * 1000.0
+    tooling = rng.integers(5, 30, n_rows) * 500.0
+    raw_material = rng.uniform(2.5, 4.5, n_rows)
+    dfm_index = np.minimum(1.0, 0.7 / weight ** 0.25)
+    price = (weight * raw_material * 0.9 * (1 + 0.02 * length) + tooling / volume
+             + 0.4 * (1 - dfm_index) ** 2 + 0.1 * np.sin(length / 3))
+    return pd.DataFrame({
+        "Längd_m_m": length,
+        "NOT": rng.integers(1, 30, n_rows) * 1000,
+        "Årsvolym_st": volume,
+        "Verktygskostnad": tooling,
+        "Vikt_kg_m": weight,
+        "dfm_index": np.round(dfm_index, 4),
+        "area_to_length": np.round((weight / 2700) * 1e6 / (length * 1000), 5),
+        "Råvara": raw_material,
+        "Lev_tid": rng.uniform(3, 14, n_rows),
+        "Pris_kr_st_SEK": price * rng.normal(1.0, 0.01, n_rows),
+    })
+
+
+def _split(n_rows: int, seed: int):
+    df = synthetic_training_table(n_rows, seed)
+    X_train, X_val, y_train, y_val = train_test_split(df[SELECTED_FEATURES], df["Pris_kr_st_SEK"],
+                                                      test_size=0.2, random_state=seed)
+    scaler = StandardScaler()
+    return scaler.fit_transform(X_train), scaler.transform(X_val), y_train, y_val
+
+
+def benchmark_profiles(n_rows: int = 20_000, profiles=None, device: str = None, seed: int = 42):
+    """
+    Accuracy and time of every training profile on the same synthetic dataset.
+    """
+    X_train_scaled, X_val_scaled, y_train, y_val = _split(n_rows, seed)
+
+    results = {}
+    for name in profiles or PROFILES:
+        config = resolve_profile(name, n_rows=len(X_train_scaled), n_features=X_train_scaled.shape[1], device=device)
+        model = make_ensemble(config, seed)
+        start = time.perf_counter()
+        fit_ensemble(model, X_train_scaled, y_train, config)
+        fit_s = time.perf_counter() - start
+        start = time.perf_counter()
+        y_pred = model.predict(X_val_scaled)
+        predict_s = time.perf_counter() - start
+        results[name] = {"profile": describe_profile(config), "r2": round(r2_score(y_val, y_pred), 5),
+                         "mape_pct": round(mean_absolute_percentage_error(y_val, y_pred) * 100, 2),
+                         "mae": round(mean_absolute_error(y_val, y_pred), 4),
+                         "fit_s": round(fit_s, 2), "predict_s": round(predict_s, 3)}
+
+    print(f"\n Training profiles ({n_rows} rows)")
+    print(f"  {'':<14}{'R²':>9}{'MAPE':>8}{'MAE':>9}{'fit':>10}{'predict':>10}")
+    for name, r in results.items():
+        print(f"  {name:<14}{r['r2']:>9.5f}{r['mape_pct']:>7.2f}%{r['mae']:>9.4f}{r['fit_s']:>9.2f}s{r['predict_s']:>9.3f}s")
+        print(f"  {'':<14}{r['profile']}")
+    return results
+
+
+def benchmark_concurrent_members(n_rows: int = 20_000, profile: str = "balanced", n_jobs: int = None,
+                                 device: str = None, seed: int = 42):
+    """
+    Each member on its own, then the ensemble fitted sequentially and concurrently
+    (see `Training_profiles.fit_ensemble`), on the same cores.
+    """
+    X_train_scaled, X_val_scaled, y_train, y_val = _split(n_rows, seed)
+    kwargs = dict(n_rows=len(X_train_scaled), n_features=X_train_scaled.shape[1], device=device, n_jobs=n_jobs)
+    concurrent = resolve_profile(profile, concurrent=True, **kwargs)
+    sequential = resolve_profile(profile, concurrent=False, **kwargs)
+
+    times, predictions = {}, {}
+    for name, member in make_ensemble(concurrent, seed).estimators:
+        start = time.perf_counter()
+        member.fit(X_train_scaled, y_train)
+        times[f"{name} alone"] = time.perf_counter() - start
+    for name, config in (("sequential", sequential), ("concurrent", concurrent)):
+        model = make_ensemble(config, seed)
+        start = time.perf_counter()
+        fit_ensemble(model, X_train_scaled, y_train, config)
+        times[name] = time.perf_counter() - start
+        predictions[name] = model.predict(X_val_scaled)
+
+    same = np.allclose(predictions["sequential"], predictions["concurrent"], rtol=1e-6, atol=1e-9)
+    print(f"\n Ensemble members ({n_rows} rows, {concurrent['n_jobs']} cores, profile '{profile}')")
+    for name, seconds in times.items():
+        print(f"  {name:<12}{seconds:>8.2f}s")
+    print(f"  {describe_profile(concurrent)}")
+    print(f"  same predictions: {same}")
+    return {**{name: round(seconds, 2) for name, seconds in times.items()}, "same_predictions": bool(same)}
+
+
+def benchmark_warm_start(n_rows: int = 20_000, n_new: int = 500, profile: str = "balanced", seed: int = 42):
+    """
+    A version trained on n_rows, then n_new rows arrive: warm start of that version against
+    a full retrain on all the rows, both scored on the same held-out rows.
+    """
+    base = synthetic_training_table(n_rows, seed)
+    new = synthetic_training_table(n_new, seed + 1)
+    test = synthetic_training_table(4000, seed + 2)
+    X_test, y_test = test[SELECTED_FEATURES], test[TARGET]
+    config = resolve_profile(profile, n_rows=n_rows, n_features=len(SELECTED_FEATURES))
+
+    scaler = StandardScaler()
+    model = make_ensemble(config, seed)
+    start = time.perf_counter()
+    fit_ensemble(model, scaler.fit_transform(base[SELECTED_FEATURES]), base[TARGET], config)
+    base_s = time.perf_counter() - start
+    results = {"base": (r2_score(y_test, model.predict(scaler.transform(X_test))), base_s)}
+
+    everything = pd.concat([base, new], ignore_index=True)
+    start = time.perf_counter()
+    is_new = new_row_mask(everything[SELECTED_FEATURES], everything[TARGET], new)
+    X_fit, y_fit = replay_rows(everything[SELECTED_FEATURES], everything[TARGET], is_new, seed)
+    warm_start_ensemble(model, scaler.transform(X_fit), y_fit, config)
+    results["warm start"] = (r2_score(y_test, model.predict(scaler.transform(X_test))), time.perf_counter() - start)
+
+    scaler = StandardScaler()
+    model = make_ensemble(config, seed)
+    start = time.perf_counter()
+    fit_ensemble(model, scaler.fit_transform(everything[SELECTED_FEATURES]), everything[TARGET], config)
+    results["full retrain"] = (r2_score(y_test, model.predict(scaler.transform(X_test))), time.perf_counter() - start)
+
+    print(f"\n Warm start ({n_rows} rows + {n_new} new rows, profile '{profile}')")
+    for name, (r2, seconds) in results.items():
+        print(f"  {name:<14}R² {r2:.5f}{seconds:>9.2f}s")
+    return {name: {"r2": round(r2, 5), "seconds": round(seconds, 2)} for name, (r2, seconds) in results.items()}
+
+
+def benchmark_bootstrap(n_rows: int = 4000, n_bootstrap: int = 1000, seed: int = 42):
+    """
+    Bootstrap confidence intervals of the five report metrics: one scikit-learn call per
+    metric and replicate, against `Evaluation.bootstrap_intervals` (replicates scored at once).
+    """
+    rng = np.random.default_rng(seed)
+    y_true = rng.uniform(1, 50, n_rows)
+    y_pred = y_true * rng.normal(1.0, 0.02, n_rows)
+
+    start = time.perf_counter()
+    replicates = []
+    for _ in range(n_bootstrap):
+        rows = rng.integers(0, n_rows, n_rows)
+        t, p = y_true[rows], y_pred[rows]
+        replicates.append([r2_score(t, p), mean_absolute_percentage_error(t, p), mean_absolute_error(t, p),
+                           np.sqrt(mean_squared_error(t, p)), max_error(t, p)])
+    loop_s = time.perf_counter() - start
+    loop_ci = np.quantile(np.array(replicates), [0.025, 0.975], axis=0)
+
+    start = time.perf_counter()
+    intervals = bootstrap_intervals(y_true, y_pred, n_bootstrap, seed=seed)
+    vectorized_s = time.perf_counter() - start
+
+    print(f"\n Bootstrap intervals ({n_rows} rows, {n_bootstrap} resamples)")
+    print(f"  scikit-learn loop {loop_s:>8.3f}s   R² CI {loop_ci[0, 0]:.5f}–{loop_ci[1, 0]:.5f}")
+    print(f"  vectorized        {vectorized_s:>8.3f}s   R² CI {intervals['R² Score'][0]:.5f}–{intervals['R² Score'][1]:.5f}")
+    return {"loop_s": round(loop_s, 3), "vectorized_s": round(vectorized_s, 3)}
+
+
+def benchmark_tuning(n_rows: int = 5000, n_trials: int = 30, profile: str = "balanced", workers: int = None,
+                     seed: int = 42):
+    """
+    The profile as it is against the best configuration of a hyperparameter search
+    (`Tuning.tune_hyperparameters`, in a temporary study folder), on the same held-out rows.
+    """
+    df = synthetic_training_table(n_rows, seed)
+    X_train, X_val, y_train, y_val = train_test_split(df[SELECTED_FEATURES], df[TARGET], test_size=0.2,
+                                                      random_state=seed)
+    scaler = StandardScaler()
+    X_train_scaled, X_val_scaled = scaler.fit_transform(X_train), scaler.transform(X_val)
+    config = resolve_profile(profile, n_rows=len(X_train), n_features=X_train.shape[1])
+
+    results = {}
+    with tempfile.TemporaryDirectory() as study_dir:
+        start = time.perf_counter()
+        best, summary = tune_hyperparameters(X_train, y_train, profile, study_dir, n_trials, workers, seed)
+        search_s = time.perf_counter() - start
+    for name, run_config in ((profile, config), ("tuned", apply_params(config, best, len(X_train), X_train.shape[1]))):
+        model = make_ensemble(run_config, seed)
+        start = time.perf_counter()
+        fit_ensemble(model, X_train_scaled, y_train, run_config)
+        fit_s = time.perf_counter() - start
+        y_pred = model.predict(X_val_scaled)
+        results[name] = {"r2": round(r2_score(y_val, y_pred), 5),
+                         "mape_pct": round(mean_absolute_percentage_error(y_val, y_pred) * 100, 2),
+                         "fit_s": round(fit_s, 2)}
+
+    print(f"\n Hyperparameter search ({n_rows} rows, {n_trials} trials, {summary['pruned']} pruned, {search_s:.1f}s)")
+    for name, r in results.items():
+        print(f"  {name:<14}R² {r['r2']:.5f}{r['mape_pct']:>7.2f}%{r['fit_s']:>9.2f}s")
+    return {**results, "search_s": round(search_s, 1), "pruned": summary["pruned"]}
+
+
+def main():
+    benchmark_profiles()
+    benchmark_concurrent_members()
+    benchmark_warm_start()
+    benchmark_bootstrap()
+    benchmark_tuning()
+
+
+if __name__ == "__main__":
+    main()
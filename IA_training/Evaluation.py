@@ -0,0 +1,188 @@
+import numpy as np
+import pandas as pd
+from joblib import Parallel, delayed
+from sklearn.model_selection import KFold
+from sklearn.preprocessing import StandardScaler
+
+from IA_training.Training_profiles import available_cores, fit_ensemble, make_ensemble, resolve_profile
+from IA_training.Tuning import apply_params
+
+# Metrics of the training report, in its order
+METRICS = ["R² Score", "MAPE", "MAE", "RMSE", "Max Error"]
+CONFIDENCE = 0.95
+N_BOOTSTRAP = 1000
+# Bootstrap replicates evaluated at once (bounds the memory to about this many copies of the rows)
+BOOTSTRAP_CHUNK = 100
+_EPS = np.finfo(np.float64).eps
+
+
+def grouped_metrics(y_true, y_pred, groups, n_groups: int) -> dict:
+    """
+    I use this function to compute every metric of many groups of rows (folds, bootstrap
+    replicates) in one vectorized pass, with the same definitions as scikit-learn.
+
+    Parameters
+    ----------
+    y_true, y_pred : array-like
+        Targets and predictions of all the rows, groups concatenated.
+    groups : numpy.ndarray
+        Group index (0 to n_groups - 1) of every row.
+    n_groups : int
+        Number of groups.
+
+    Returns
+    -------
+    dict[str, numpy.ndarray]
+        One array of n_groups values per name of METRICS (MAPE as a fraction).
+    """
+    y_true = np.asarray(y_true, dtype=float)
+    y_pred = np.asarray(y_pred, dtype=float)
+    counts = np.bincount(groups, minlength=n_groups)
+    error = y_true - y_pred
+    abs_error = np.abs(error)
+
+    sse = np.bincount(groups, error ** 2, n_groups)
+    mean_true = np.bincount(groups, y_true, n_groups) / counts
+    sst = np.bincount(groups, (y_true - mean_true[groups]) ** 2, n_groups)
+    max_error = np.zeros(n_groups)
+    np.maximum.at(max_error, groups, abs_error)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return {
+            "R² Score": 1 - sse / sst,
+            "MAPE": np.bincount(groups, abs_error / np.maximum(np.abs(y_true), _EPS), n_groups) / counts,
+            "MAE": np.bincount(groups, abs_error, n_groups) / counts,
+            "RMSE": np.sqrt(sse / counts),
+            "Max Error": max_error,
+        }
+
+
+def regression_metrics(y_true, y_pred) -> dict:
+    """
+    The metrics of a single set of predictions (see `grouped_metrics`).
+    """
+    groups = np.zeros(len(y_true), dtype=np.intp)
+    return {name: values[0].item() for name, values in grouped_metrics(y_true, y_pred, groups, 1).items()}
+
+
+def bootstrap_intervals(y_true, y_pred, n_bootstrap: int = N_BOOTSTRAP, confidence: float = CONFIDENCE,
+                        seed=42) -> dict:
+    """
+    Percentile bootstrap confidence interval of every metric: the rows are resampled with
+    replacement n_bootstrap times, by chunks of BOOTSTRAP_CHUNK replicates scored at once.
+
+    Returns
+    -------
+    dict[str, tuple[float, float]]
+        (low, high) per name of METRICS.
+    """
+    y_true = np.asarray(y_true, dtype=float)
+    y_pred = np.asarray(y_pred, dtype=float)
+    n = len(y_true)
+    rng = np.random.default_rng(seed)
+    replicates = {name: [] for name in METRICS}
+    for start in range(0, n_bootstrap, BOOTSTRAP_CHUNK):
+        size = min(BOOTSTRAP_CHUNK, n_bootstrap - start)
+        rows = rng.integers(0, n, size=(size, n)).ravel()
+        groups = np.repeat(np.arange(size), n)
+        for name, values in grouped_metrics(y_true[rows], y_pred[rows], groups, size).items():
+            replicates[name].append(values)
+
+    alpha = (1 - confidence) / 2
+    intervals = {}
+    for name, values in replicates.items():
+        low, high = np.nanquantile(np.concatenate(values), [alpha, 1 - alpha])
+        intervals[name] = (low.item(), high.item())
+    return intervals
+
+
+def _fit_fold(X, y, train_index, test_index, config, seed):
+    """
+    Fits the ensemble (and its scaler) on one fold and predicts its held-out rows (run in a worker).
+    """
+    scaler = StandardScaler()
+    model = make_ensemble(config, seed)
+    fit_ensemble(model, scaler.fit_transform(X[train_index]), y[train_index], config)
+    return model.predict(scaler.transform(X[test_index]))
+
+
+def cross_validate(X, y, profile: str, n_folds: int = 5, seed=42, device: str = None, workers: int = None,
+                   params: dict = None):
+    """
+    I use this function for the k-fold evaluation of a training: the folds are fitted in
+    parallel worker processes, each on its share of the cores, and every row gets an
+    out-of-fold prediction from the model that did not see it.
+
+    Parameters
+    ----------
+    X : pandas.DataFrame or numpy.ndarray
+        Features (unscaled: each fold fits its own scaler).
+    y : array-like
+        Targets.
+    profile : str
+        Training profile of the folds (see `Training_profiles.resolve_profile`).
+    n_folds : int, optional
+        Number of folds.
+    seed : int, optional
+        Seed of the fold split and of the models.
+    device : str, optional
+        "cpu" or "cuda"; detected when not given.
+    workers : int, optional
+        Folds fitted at the same time (default: one per core, at most n_folds). On GPU,
+        the folds run one after the other so they do not share the device.
+    params : dict, optional
+        Tuned hyperparameters applied to the profile (see `Tuning.apply_params`).
+
+    Returns
+    -------
+    tuple[numpy.ndarray, numpy.ndarray, dict]
+        Out-of-fold predictions, fold index of every row, and the metrics of every fold
+        (one array of n_folds values per name of METRICS).
+    """
+    X = np.asarray(X, dtype=float)
+    y = np.asarray(y, dtype=float)
+    cores = available_cores()
+    config = resolve_profile(profile, n_rows=len(X) * (n_folds - 1) // n_folds, n_features=X.shape[1],
+                             device=device)
+    if workers is None:
+        workers = 1 if config["device"] == "cuda" else min(n_folds, cores)
+    if workers > 1:
+        config = resolve_profile(profile, n_rows=len(X) * (n_folds - 1) // n_folds, n_features=X.shape[1],
+                                 device=config["device"], n_jobs=max(1, cores // workers))
+
+    if params:
+        config = apply_params(config, params, len(X) * (n_folds - 1) // n_folds, X.shape[1])
+
+    splits = list(KFold(n_splits=n_folds, shuffle=True, random_state=seed).split(X))
+    print(f"🔁 {n_folds}-fold evaluation, {workers} fold(s) at a time")
+    predictions = Parallel(n_jobs=workers)(
+        delayed(_fit_fold)(X, y, train_index, test_index, config, seed) for train_index, test_index in splits)
+
+    oof = np.empty(len(y))
+    folds = np.empty(len(y), dtype=np.intp)
+    for fold, ((_, test_index), fold_predictions) in enumerate(zip(splits, predictions)):
+        oof[test_index] = fold_predictions
+        folds[test_index] = fold
+    return oof, folds, grouped_metrics(y, oof, folds, n_folds)
+
+
+def fold_table(fold_metrics: dict) -> pd.DataFrame:
+    """
+    The metrics of every fold as a table (MAPE in %), with their mean and standard deviation.
+    """
+    table = pd.DataFrame(fold_metrics)
+    table["MAPE"] *= 100
+    table.index = [f"fold_{i + 1}" for i in range(len(table))]
+    return pd.concat([table, table.agg(["mean", "std"])])
+
+
+def format_interval(name: str, interval) -> str:
+    """
+    An interval as written in the training report and evaluations.csv, e.g. '0.31–0.47' for MAPE (in %).
+    """
+    low, high = interval
+    if name == "R² Score":
+        return f"{low:.5f}–{high:.5f}"
+    if name == "MAPE":
+        return f"{low * 100:.2f}–{high * 100:.2f}"
+    return f"{low:.4f}–{high:.4f}"
@@ -1,25 +1,15 @@
 import os
 import sys
-import json
-import pandas as pd
 import numpy as np
+import pandas as pd
 import matplotlib.pyplot as plt
 import seaborn as sns
-import xgboost as xgb
 import joblib
 import time
+import shutil
 
 from sklearn.model_selection import train_test_split
 from sklearn.preprocessing import StandardScaler
-from sklearn.neural_network import MLPRegressor
-from sklearn.ensemble import VotingRegressor
-from sklearn.metrics import (
-    r2_score,
-    mean_absolute_error,
-    mean_squared_error,
-    mean_absolute_percentage_error,
-    max_error
-)
 
 # ==== CORRECTION ABSOLUE DES CHEMINS ====
 def absolute_path(*args):
@@ -34,22 +24,220 @@ sys.path.extend([parent_dir, data_processing_dir])
 
 from Data_Processing.main_Data_Processing import main as run_data_processing
 from Data_Processing.main_Data_Processing import copy_extra_json_folder_into_ready_folder
+from Data_Processing.Instrumentation import PipelineInstrumentation
+from Data_Processing.Handling import PREPROCESSOR_NAME
+from Data_Processing.Jsonl_rows import EXTRA_ROWS_DIR
+from Data_Processing.Json_codec import read_json, write_json
+from Data_Processing.Columnar import FORMATS, ROW_ID, read_table, table_path, write_table
+from IA_training.Evaluation import (
+    METRICS, N_BOOTSTRAP, bootstrap_intervals, cross_validate, fold_table, format_interval, regression_metrics
+)
+from IA_training.Tuning import apply_params, tune_hyperparameters
+from IA_training.Training_profiles import (
+    DEFAULT_PROFILE, describe_profile, fit_ensemble, fitted_architecture, make_ensemble, resolve_profile,
+    warm_start_ensemble
+)
 
-def json_to_csv(folder_path, output_csv):
+# Top nine features selected by XGBoost importance (see README)
+SELECTED_FEATURES = [
+    "Längd_m_m",
+    "NOT",
+    "Årsvolym_st",
+    "Verktygskostnad",
+    "Vikt_kg_m",
+    "dfm_index",
+    "area_to_length",
+    "Råvara",
+    "Lev_tid"
+]
+TARGET = "Pris_kr_st_SEK"
+# A warm start trains on the new rows plus REPLAY_FACTOR times as many (at least MIN_REPLAY_ROWS)
+# older rows, so the updated model does not drift towards the last PDFs only
+REPLAY_FACTOR = 4
+MIN_REPLAY_ROWS = 2000
+# A warm start is validated on this share of the new rows, which the base version never saw.
+# With fewer held-out rows than MIN_WARM_VALID_ROWS, the version is not promoted automatically.
+WARM_VALID_SIZE = 0.2
+MIN_WARM_VALID_ROWS = 10
+NOT_PROMOTED = "not promoted"
+# Decimals kept when new rows are matched with the training table (see `new_row_mask`)
+MATCH_DECIMALS = 8
+
+def json_to_csv(folder_path, output_csv, extra_rows_dir=None):
+    """
+    Builds the training CSV from the JSON rows of folder_path, followed by every
+    row imported from JSONL exports in extra_rows_dir (see `append_extra_rows_to_csv`).
+    """
     records = []
-    for filename in os.listdir(folder_path):
+    for filename in sorted(os.listdir(folder_path)):
         if filename.endswith(".json"):
             path = os.path.join(folder_path, filename)
-            with open(path, 'r', encoding='utf-8') as f:
-                try:
-                    records.append(json.load(f))
-                except Exception:
-                    pass
+            try:
+                records.append(read_json(path))
+            except Exception:
+                pass
     df = pd.DataFrame(records)
     df.to_csv(output_csv, index=False)
     print(f"✅ Converted {len(df)} JSONs to CSV at: {output_csv}")
+    if extra_rows_dir:
+        append_extra_rows_to_csv(extra_rows_dir, None, output_csv)
+    return df
+
+def append_jsons_to_csv(folder_path, filenames, output_csv, extra_rows_dir=None, extra_filenames=()):
+    """
+    Appends the given JSON files of folder_path, then the given files imported from JSONL
+    exports in extra_rows_dir, as new rows of an existing CSV, instead of rebuilding it.
+    Falls back to `json_to_csv` when the CSV is missing or the new rows bring new columns.
+    """
+    if not os.path.exists(output_csv):
+        return json_to_csv(folder_path, output_csv, extra_rows_dir)
+
+    records = []
+    for filename in filenames:
+        path = os.path.join(folder_path, filename)
+        try:
+            records.append(read_json(path))
+        except Exception:
+            pass
+
+    header = pd.read_csv(output_csv, nrows=0).columns
+    new_rows = pd.DataFrame(records)
+    if not set(new_rows.columns) <= set(header):
+        return json_to_csv(folder_path, output_csv, extra_rows_dir)
+
+    new_rows.reindex(columns=header).to_csv(output_csv, mode="a", header=False, index=False)
+    print(f"✅ Appended {len(new_rows)} JSONs to CSV at: {output_csv}")
+    if extra_rows_dir and extra_filenames:
+        append_extra_rows_to_csv(extra_rows_dir, extra_filenames, output_csv)
+    return new_rows
+
+def append_extra_rows_to_csv(rows_dir, filenames, output_csv, chunksize=50_000):
+    """
+    Streams the CSV files imported from JSONL exports (rows_dir = 'extra_rows') into the
+    training CSV, chunk by chunk, with the training CSV's columns.
+    filenames=None appends every file of rows_dir.
+    """
+    if filenames is None:
+        filenames = sorted(f for f in os.listdir(rows_dir) if f.endswith(".csv")) if os.path.isdir(rows_dir) else []
+    header = None
+    if os.path.exists(output_csv) and os.path.getsize(output_csv):
+        header = pd.read_csv(output_csv, nrows=0).columns
+
+    appended = 0
+    for filename in filenames:
+        path = os.path.join(rows_dir, filename)
+        if not os.path.getsize(path):
+            # Every line of that export was rejected: nothing to append
+            continue
+        for chunk in pd.read_csv(path, chunksize=chunksize):
+            if header is None:
+                # Nothing in the training CSV yet: the first chunk gives the columns
+                header = chunk.columns
+                chunk.to_csv(output_csv, index=False)
+            else:
+                chunk.reindex(columns=header).to_csv(output_csv, mode="a", header=False, index=False)
+            appended += len(chunk)
+    if appended:
+        print(f"✅ Appended {appended} imported rows to CSV at: {output_csv}")
+    return appended
+
+def tables_to_training_table(table_paths, output_table):
+    """
+    Columnar counterpart of json_to_csv: concatenates the 'ready' and 'extra' tables of
+    the data pipeline, and the CSV files imported from JSONL exports, into the single
+    table used for training.
+    """
+    frames = [read_table(path) if os.path.splitext(path)[1] in FORMATS.values() else pd.read_csv(path)
+              for path in table_paths if os.path.exists(path)]
+    df = pd.concat([f for f in frames if not f.empty], ignore_index=True) if frames else pd.DataFrame()
+    write_table(df, output_table)
+    print(f"✅ Collected {len(df)} rows in: {output_table}")
     return df
 
+def read_new_rows(folder_path, filenames, extra_rows_dir=None, extra_filenames=()):
+    """
+    The rows added by an incremental run: the given JSON files of folder_path and the
+    given CSV files imported from JSONL exports in extra_rows_dir.
+    """
+    records = []
+    for filename in filenames:
+        try:
+            records.append(read_json(os.path.join(folder_path, filename)))
+        except Exception:
+            pass
+    frames = [pd.DataFrame(records)]
+    if extra_rows_dir:
+        frames += [pd.read_csv(os.path.join(extra_rows_dir, f)) for f in extra_filenames]
+    return pd.concat(frames, ignore_index=True)
+
+def load_model_version(model_dir):
+    """Loads the ensemble and the scaler of a model version ('.../IA_')."""
+    return (joblib.load(os.path.join(model_dir, "ensemble_model.pkl")),
+            joblib.load(os.path.join(model_dir, "scaler.pkl")))
+
+def new_row_mask(X, y, new_rows):
+    """
+    Which rows of the training table are new: same features and price as a row of new_rows.
+    Values are compared rounded, since the training CSV does not always read floats back to the bit.
+    """
+    if new_rows is None or new_rows.empty:
+        return np.zeros(len(X), dtype=bool)
+    columns = SELECTED_FEATURES + [TARGET]
+    table = X.assign(**{TARGET: y}).apply(pd.to_numeric, errors="coerce").round(MATCH_DECIMALS)
+    keys = (new_rows.reindex(columns=columns).apply(pd.to_numeric, errors="coerce")
+            .round(MATCH_DECIMALS).drop_duplicates())
+    return table.merge(keys, on=columns, how="left", indicator=True)["_merge"].eq("both").to_numpy()
+
+def replay_rows(X, y, is_new, seed=42):
+    """
+    Training rows of a warm start: the new rows (is_new), plus a random sample of the older
+    ones (see REPLAY_FACTOR).
+    """
+    new_X, new_y = X[is_new], y[is_new]
+    old_X, old_y = X[~is_new], y[~is_new]
+    n_replay = min(len(old_X), max(REPLAY_FACTOR * len(new_X), MIN_REPLAY_ROWS))
+    replayed = old_X.sample(n=n_replay, random_state=seed).index
+    print(f"♻️ Warm start on {len(new_X)} new rows + {n_replay} replayed rows")
+    return pd.concat([new_X, old_X.loc[replayed]]), pd.concat([new_y, old_y.loc[replayed]])
+
+def warm_start_split(X, y, new_rows, seed=42):
+    """
+    I use this function to split the training table of a warm start so that its metrics
+    only come from rows the base version never saw.
+
+    WARM_VALID_SIZE of the new rows are held out for validation; the version is updated on
+    the other new rows and replayed older rows (see `replay_rows`). With fewer than
+    MIN_WARM_VALID_ROWS held-out rows, there is nothing honest to validate on: the version is
+    updated on every new row and validated on the usual 20% split, which the base version
+    (and the update) partly saw, so it is not promoted.
+
+    Returns
+    -------
+    tuple
+        X_fit, y_fit, X_val, y_val, and whether the validation rows are unseen.
+    """
+    is_new = new_row_mask(X, y, new_rows)
+    if round(is_new.sum() * WARM_VALID_SIZE) >= MIN_WARM_VALID_ROWS:
+        new_fit, new_val = train_test_split(np.flatnonzero(is_new), test_size=WARM_VALID_SIZE, random_state=seed)
+        fit = np.ones(len(X), dtype=bool)
+        fit[new_val] = False
+        is_fit_new = np.zeros(len(X), dtype=bool)
+        is_fit_new[new_fit] = True
+        X_fit, y_fit = replay_rows(X[fit], y[fit], is_fit_new[fit], seed)
+        return X_fit, y_fit, X.iloc[new_val], y.iloc[new_val], True
+
+    print(f"⚠️ Only {int(is_new.sum())} new rows: too few to validate the warm start on unseen rows, "
+          f"the version will not be promoted.")
+    _, X_val, _, y_val = train_test_split(X, y, test_size=0.2, random_state=seed)
+    X_fit, y_fit = replay_rows(X, y, is_new, seed)
+    return X_fit, y_fit, X_val, y_val, False
+
+def load_training_table(path):
+    """Reads the training data from a CSV or from a columnar table (.parquet / .arrow)."""
+    if os.path.splitext(path)[1] in FORMATS.values():
+        return read_table(path).drop(columns=[ROW_ID], errors="ignore")
+    return pd.read_csv(path)
+
 def style_plot(ax):
     ax.set_facecolor("#192233")
     for spine in ax.spines.values():
@@ -61,73 +249,107 @@ def style_plot(ax):
     ax.title.set_color('white')
     ax.grid(True, color='white', alpha=0.11)
 
-def train_model(csv_path, assets_path):
+def train_model(csv_path, assets_path, seed=42, profile=DEFAULT_PROFILE, device=None,
+                warm_start_from=None, new_rows=None, cv_folds=None, n_bootstrap=N_BOOTSTRAP,
+                tune_trials=None, tune_workers=None, study_dir=None):
+    """
+    Trains the MLP + XGBoost ensemble with a training profile ("fast", "balanced" or
+    "max-accuracy", see `Training_profiles.resolve_profile`). The device is detected
+    when not given, so CPU-only servers never request a GPU.
+
+    With warm_start_from (the 'IA_' folder of a model version), I update that version
+    instead of training from scratch: same scaler, more XGBoost trees and MLP epochs on
+    new_rows and replayed older rows (see `replay_rows` and `Training_profiles.warm_start_ensemble`).
+    It is validated on held-out new rows, never seen by the base version; with too few of them,
+    the report marks the version as not promoted (see `warm_start_split`). Without new_rows
+    there is nothing to continue on, so I retrain from scratch.
+
+    With cv_folds (full trainings only), the metrics come from a k-fold evaluation whose
+    folds are fitted in parallel (see `Evaluation.cross_validate`), and the version is then
+    fitted on every row. Each metric gets a bootstrap confidence interval in the report.
+
+    With tune_trials (full trainings only), I first search the hyperparameters of the profile
+    on the training split (see `Tuning.tune_hyperparameters`; the studies are kept in study_dir,
+    by default 'tuning' next to the training table) and train the version with the best ones,
+    saved as 'best_params.json'. With cv_folds, the folds reuse them as they are.
+    """
     start_time = time.time()
     # === Correction: always absolute
     assets_path = absolute_path(assets_path)
 
-    df = pd.read_csv(csv_path)
+    df = load_training_table(csv_path)
     df = df.drop(columns=["symmetry_score"], errors="ignore")
 
-    y = df["Pris_kr_st_SEK"]
-
-    selected_features = [
-        "Längd_m_m",
-        "NOT",
-        "Årsvolym_st",
-        "Verktygskostnad",
-        "Vikt_kg_m",
-        "dfm_index",
-        "area_to_length",
-        "Råvara",
-        "Lev_tid"
-    ]
-
-    X = df[selected_features]
-
-    X_train, X_val, y_train, y_val = train_test_split(X, y, test_size=0.2, random_state=42)
-
-    scaler = StandardScaler()
-    X_train_scaled = scaler.fit_transform(X_train)
-    X_val_scaled = scaler.transform(X_val)
-
-    mlp = MLPRegressor(
-        hidden_layer_sizes=(1024, 512, 256, 128, 64),
-        learning_rate_init=0.00005,
-        max_iter=5000,
-        early_stopping=True,
-        random_state=42
-    )
-
-    xgb_model = xgb.XGBRegressor(
-        n_estimators=500,
-        max_depth=6,
-        learning_rate=0.03,
-        subsample=0.8,
-        colsample_bytree=0.8,
-        tree_method='hist',
-        device='cuda',
-        random_state=42
-    )
-
-    model = VotingRegressor([('mlp', mlp), ('xgb', xgb_model)])
-    model.fit(X_train_scaled, y_train)
-
-    y_pred = model.predict(X_val_scaled)
-    y_true = y_val
-
-    r2 = r2_score(y_true, y_pred)
-    mape = mean_absolute_percentage_error(y_true, y_pred)
-    mae = mean_absolute_error(y_true, y_pred)
-    rmse = np.sqrt(mean_squared_error(y_true, y_pred))
-    maxerr = max_error(y_true, y_pred)
-
-    print(f"\n📊 EVALUATION")
+    y = df[TARGET]
+
+    X = df[SELECTED_FEATURES]
+
+    X_train, X_val, y_train, y_val = train_test_split(X, y, test_size=0.2, random_state=seed)
+
+    if warm_start_from and (new_rows is None or new_rows.empty):
+        print("⚠️ No new rows to continue the base version on: full retrain.")
+        warm_start_from = None
+    if cv_folds and warm_start_from:
+        print("⚠️ The k-fold evaluation needs a full retrain: using the validation split.")
+        cv_folds = None
+    if tune_trials and warm_start_from:
+        print("⚠️ The hyperparameter search needs a full retrain: keeping the promoted version's.")
+        tune_trials = None
+    n_fit = len(X) if cv_folds else len(X_train)
+    config = resolve_profile(profile, n_rows=n_fit, n_features=X.shape[1], device=device)
+
+    best_params, tuning = None, None
+    if tune_trials:
+        study_dir = study_dir or os.path.join(os.path.dirname(absolute_path(csv_path)), "tuning")
+        best_params, tuning = tune_hyperparameters(X_train, y_train, profile, study_dir, tune_trials,
+                                                   tune_workers, seed, device)
+    if best_params:
+        config = apply_params(config, best_params, n_fit, X.shape[1])
+    if not warm_start_from:
+        print(f"⚙️ Training profile: {describe_profile(config)}")
+
+    if cv_folds:
+        y_pred, folds, fold_metrics = cross_validate(X, y, profile, cv_folds, seed, device, params=best_params)
+        y_true = y
+        evaluation = f"{cv_folds}-fold cross-validation"
+        scaler = StandardScaler()
+        model = make_ensemble(config, seed)
+        fit_ensemble(model, scaler.fit_transform(X), y, config)
+    elif warm_start_from:
+        # The MLP weights only make sense with the scaling they were trained with
+        model, scaler = load_model_version(warm_start_from)
+        X_fit, y_fit, X_val, y_val, unseen = warm_start_split(X, y, new_rows, seed)
+        warm_start_ensemble(model, scaler.transform(X_fit), y_fit, config)
+        X_val_scaled = scaler.transform(X_val)
+        config = fitted_architecture(config, model)
+        print(f"⚙️ Warm-started model: {describe_profile(config)}")
+        evaluation = (f"held-out new rows ({len(X_val)}, unseen by the base version)" if unseen
+                      else f"validation split (20%, partly seen by the base version: {NOT_PROMOTED})")
+    else:
+        evaluation = "validation split (20%)"
+        scaler = StandardScaler()
+        X_train_scaled = scaler.fit_transform(X_train)
+        X_val_scaled = scaler.transform(X_val)
+
+        model = make_ensemble(config, seed)
+        fit_ensemble(model, X_train_scaled, y_train, config)
+    if not cv_folds:
+        y_pred = model.predict(X_val_scaled)
+        y_true = y_val
+
+    metrics = regression_metrics(y_true, y_pred)
+    intervals = bootstrap_intervals(y_true, y_pred, n_bootstrap, seed=seed)
+    r2, mape, mae, rmse, maxerr = (metrics[name] for name in METRICS)
+    ci_lines = [f"📐 {name} 95% CI : {format_interval(name, intervals[name])}{'%' if name == 'MAPE' else ''}"
+                for name in METRICS]
+
+    print(f"\n📊 EVALUATION ({evaluation})")
     print(f"✅ R² Score   : {r2:.5f}")
     print(f"✅ MAPE       : {mape*100:.2f}%")
     print(f"✅ MAE        : {mae:.4f}")
     print(f"✅ RMSE       : {rmse:.4f}")
     print(f"✅ Max Error  : {maxerr:.4f}")
+    print("\n".join(ci_lines))
 
     # === SAVE MODEL + SCALER always absolute ===
     model_path = absolute_path(assets_path, "IA_")
@@ -213,10 +435,39 @@ def train_model(csv_path, assets_path):
         f.write(f"✅ RMSE       : {rmse:.4f}\n")
         f.write(f"✅ Max Error  : {maxerr:.4f}\n")
         f.write(f"⏱️ Total Training Time: {formatted_time}\n")
-
+        f.write(f"📏 Evaluation : {evaluation}, {n_bootstrap} bootstrap resamples\n")
+        for line in ci_lines:
+            f.write(f"{line}\n")
+        f.write(f"⚙️ Profile    : {describe_profile(config)}\n")
+        if tuning:
+            best = f"best validation MAPE {tuning['best_mape'] * 100:.2f}%" if best_params else "no completed trial"
+            f.write(f"🎛️ Tuning     : {tuning['trials']} completed trials ({tuning['pruned']} pruned, "
+                    f"{tuning['failed']} failed), {best}, study {tuning['study']}\n")
+        if warm_start_from:
+            f.write(f"♻️ Warm start : {warm_start_from} (+{config['warm_trees']} trees, "
+                    f"+{config['warm_epochs']} MLP epochs)\n")
+
+    if best_params:
+        write_json(best_params, os.path.join(model_path, "best_params.json"), pretty=True)
+    if cv_folds:
+        fold_table(fold_metrics).to_csv(os.path.join(model_path, "cv_folds.csv"), float_format="%.6g")
     print(f"\n📅 Metrics saved to: {report_path}")
 
-def Model_Training(input_dir, output_dir, assets_path, extra_json_folder=None):
+def Model_Training(input_dir, output_dir, assets_path, extra_json_folder=None, incremental=False,
+                   profile_stage=None, intermediate="json", seed=42, refit_preprocessing=False,
+                   profile=DEFAULT_PROFILE, device=None, warm_start_from=None, cv_folds=None,
+                   tune_trials=None, tune_workers=None):
+    """
+    Runs the data pipeline, builds the training table and trains a model version in
+    '{assets_path}/IA_'.
+
+    warm_start_from is the 'IA_' folder of the promoted version: the new version then
+    continues it on the rows added by this (incremental) run instead of training from
+    scratch (see `train_model`). None, or a folder without a model, is a full retrain, and
+    so is a run that rebuilt the data from scratch or added no rows.
+    cv_folds switches the metrics of a full retrain to a k-fold evaluation, and tune_trials
+    runs a hyperparameter search before it (studies kept in '{output_dir}/tuning').
+    """
     # Always make sure paths are absolute (robust in any context)
     input_dir = absolute_path(input_dir)
     output_dir = absolute_path(output_dir)
@@ -224,17 +475,59 @@ def Model_Training(input_dir, output_dir, assets_path, extra_json_folder=None):
     if extra_json_folder:
         extra_json_folder = absolute_path(extra_json_folder)
 
-    run_data_processing(input_dir, output_dir, extra_json_folder)
-
-    json_input = os.path.join(output_dir, "json_ready")
-    csv_output = os.path.join(output_dir, "all_quotes.csv")
-
-    json_to_csv(json_input, csv_output)
-    train_model(csv_output, assets_path)
+    # Per-stage measurements, saved as run_report.json next to training_report.txt
+    model_path = absolute_path(assets_path, "IA_")
+    instrumentation = PipelineInstrumentation(profile_stage=profile_stage, profile_dir=model_path)
+
+    summary = run_data_processing(input_dir, output_dir, extra_json_folder, incremental=incremental,
+                                  instrumentation=instrumentation, intermediate=intermediate, seed=seed,
+                                  refit_preprocessing=refit_preprocessing)
+
+    extra_rows_dir = os.path.join(output_dir, EXTRA_ROWS_DIR)
+    if intermediate != "json":
+        # Columnar runs: the training data is already in a handful of tables
+        columnar_dir = os.path.join(output_dir, "columnar")
+        tables = [str(table_path(columnar_dir, name, intermediate)) for name in ("ready", "extra")]
+        if os.path.isdir(extra_rows_dir):
+            tables += [os.path.join(extra_rows_dir, f) for f in sorted(os.listdir(extra_rows_dir)) if f.endswith(".csv")]
+        csv_output = str(table_path(output_dir, "all_quotes", intermediate))
+        with instrumentation.stage("training_csv", inputs=tables, outputs=[csv_output]):
+            tables_to_training_table(tables, csv_output)
+    else:
+        json_input = os.path.join(output_dir, "json_ready")
+        csv_output = os.path.join(output_dir, "all_quotes.csv")
+
+        # Incremental runs only add rows, so the training CSV is extended instead of rebuilt
+        with instrumentation.stage("training_csv", inputs=[json_input, extra_rows_dir], outputs=[csv_output]):
+            if summary and not summary["full_rebuild"] and not summary["removed_rows"]:
+                append_jsons_to_csv(json_input, summary["new_rows"], csv_output,
+                                    extra_rows_dir, summary["new_extra_tables"])
+            else:
+                json_to_csv(json_input, csv_output, extra_rows_dir)
+    new_rows = None
+    if warm_start_from and not os.path.exists(os.path.join(warm_start_from, "ensemble_model.pkl")):
+        print(f"⚠️ No model in '{warm_start_from}': full retrain.")
+        warm_start_from = None
+    if warm_start_from and (not summary or summary["full_rebuild"]):
+        # Every row is new to the pipeline: nothing to tell apart from what the base version saw
+        print("⚠️ The data was rebuilt from scratch: full retrain.")
+        warm_start_from = None
+    if warm_start_from:
+        new_rows = read_new_rows(os.path.join(output_dir, "json_ready"), summary["new_rows"],
+                                 extra_rows_dir, summary["new_extra_tables"])
+    with instrumentation.stage("training", inputs=[csv_output], outputs=[model_path]):
+        train_model(csv_output, assets_path, seed=seed, profile=profile, device=device,
+                    warm_start_from=warm_start_from, new_rows=new_rows, cv_folds=cv_folds,
+                    tune_trials=tune_trials, tune_workers=tune_workers)
+
+    # The step 4 preprocessing is saved with the model version it produced the data for
+    preprocessor_path = os.path.join(output_dir, PREPROCESSOR_NAME)
+    if os.path.exists(preprocessor_path):
+        shutil.copy2(preprocessor_path, os.path.join(model_path, PREPROCESSOR_NAME))
+    instrumentation.write(model_path)
 
     # === SUPPRESSION CONTENU PATH4 ===
     if extra_json_folder and os.path.exists(extra_json_folder):
-        import shutil
         try:
             shutil.rmtree(extra_json_folder)
             os.makedirs(extra_json_folder, exist_ok=True)
@@ -0,0 +1,248 @@
+import copy
+import math
+import os
+import shutil
+import subprocess
+
+import xgboost as xgb
+from joblib import Parallel, delayed, parallel_config
+from sklearn.ensemble import VotingRegressor
+from sklearn.neural_network import MLPRegressor
+from threadpoolctl import threadpool_limits
+
+# Training profiles, from the quickest to the most accurate one.
+# mlp_width / mlp_layers are upper bounds: the network is narrowed on small datasets (see `mlp_layers`).
+# warm_trees / warm_epochs: XGBoost trees and MLP epochs added by a warm start (see `warm_start_ensemble`).
+PROFILES = {
+    "fast": {
+        "n_estimators": 300, "learning_rate": 0.1, "max_depth": 6, "max_bin": 64,
+        "mlp_width": 128, "mlp_layers": 2, "mlp_max_iter": 300, "mlp_learning_rate": 1e-3,
+        "warm_trees": 50, "warm_epochs": 10,
+    },
+    "balanced": {
+        "n_estimators": 600, "learning_rate": 0.05, "max_depth": 6, "max_bin": 256,
+        "mlp_width": 256, "mlp_layers": 3, "mlp_max_iter": 1000, "mlp_learning_rate": 5e-4,
+        "warm_trees": 100, "warm_epochs": 20,
+    },
+    "max-accuracy": {
+        "n_estimators": 2000, "learning_rate": 0.02, "max_depth": 7, "max_bin": 256,
+        "mlp_width": 512, "mlp_layers": 3, "mlp_max_iter": 5000, "mlp_learning_rate": 5e-4,
+        "warm_trees": 300, "warm_epochs": 40,
+    },
+}
+DEFAULT_PROFILE = "balanced"
+# Upper bound on the MLP weights per training row, so a small dataset never gets a huge dense net
+MLP_PARAMS_PER_ROW = 4
+MIN_MLP_WIDTH = 16
+
+
+def available_cores() -> int:
+    """
+    Number of cores this process may use (the affinity mask, when the OS has one).
+    """
+    if hasattr(os, "sched_getaffinity"):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
+
+
+def detect_device() -> str:
+    """
+    'cuda' when XGBoost was built with CUDA and a GPU is visible, 'cpu' otherwise.
+    """
+    if os.environ.get("CUDA_VISIBLE_DEVICES") in ("", "-1"):
+        return "cpu"
+    if not xgb.build_info().get("USE_CUDA") or shutil.which("nvidia-smi") is None:
+        return "cpu"
+    try:
+        result = subprocess.run(["nvidia-smi", "-L"], capture_output=True, text=True, timeout=10)
+    except (OSError, subprocess.SubprocessError):
+        return "cpu"
+    return "cuda" if result.returncode == 0 and "GPU" in result.stdout else "cpu"
+
+
+def _mlp_parameters(n_features: int, layers) -> int:
+    sizes = [n_features, *layers, 1]
+    return sum((a + 1) * b for a, b in zip(sizes, sizes[1:]))
+
+
+def mlp_layers(width: int, depth: int, n_rows: int, n_features: int) -> tuple:
+    """
+    Hidden layers of the MLP: `depth` layers halving from `width`, narrowed (by halving the
+    width) until the network has at most MLP_PARAMS_PER_ROW weights per training row.
+    """
+    def layers_of(w):
+        return tuple(max(MIN_MLP_WIDTH, w >> i) for i in range(depth))
+
+    while width > MIN_MLP_WIDTH and _mlp_parameters(n_features, layers_of(width)) > MLP_PARAMS_PER_ROW * n_rows:
+        width //= 2
+    return layers_of(width)
+
+
+def member_threads(n_jobs: int, device: str, concurrent: bool = True) -> tuple:
+    """
+    Threads of the MLP (BLAS) and of XGBoost, and number of members fitted at the same time.
+
+    Fitted concurrently, the members share the cores instead of each taking all of them:
+    the small MLP matrices gain little from BLAS threads, so XGBoost gets most cores on CPU;
+    on GPU, XGBoost needs a single feeding thread and the MLP gets the rest.
+    """
+    if not concurrent or n_jobs < 2:
+        return n_jobs, n_jobs, 1
+    if device == "cuda":
+        return n_jobs - 1, 1, 2
+    mlp = max(1, n_jobs // 4)
+    return mlp, n_jobs - mlp, 2
+
+
+def resolve_profile(profile: str = DEFAULT_PROFILE, n_rows: int = 0, n_features: int = 9,
+                    device: str = None, n_jobs: int = None, concurrent: bool = True) -> dict:
+    """
+    I use this function to turn a profile name into the settings of one training run,
+    from the hardware this process runs on and the size of the dataset.
+
+    Parameters
+    ----------
+    profile : str, optional
+        "fast", "balanced" (default) or "max-accuracy".
+    n_rows : int, optional
+        Number of training rows; the MLP width is capped from it.
+    n_features : int, optional
+        Number of input features.
+    device : str, optional
+        "cpu" or "cuda". Detected when not given (see `detect_device`).
+    n_jobs : int, optional
+        Number of cores of the training. All the available cores when not given.
+    concurrent : bool, optional
+        Fit the MLP and XGBoost at the same time, each on its share of the cores
+        (see `member_threads` and `fit_ensemble`). Only with 2 cores or more.
+
+    Returns
+    -------
+    dict
+        'name', 'device', 'n_jobs', 'member_jobs', 'mlp_threads', 'warm_trees', 'warm_epochs',
+        and the keyword arguments of the 'xgb' and 'mlp' estimators.
+    """
+    if profile not in PROFILES:
+        raise ValueError(f"Unknown training profile '{profile}'. Available: {', '.join(PROFILES)}")
+    settings = PROFILES[profile]
+    device = device or detect_device()
+    n_jobs = n_jobs or available_cores()
+    mlp_threads, xgb_threads, member_jobs = member_threads(n_jobs, device, concurrent)
+
+    xgb_params = {
+        "n_estimators": settings["n_estimators"],
+        "max_depth": settings["max_depth"],
+        "learning_rate": settings["learning_rate"],
+        "subsample": 0.8,
+        "colsample_bytree": 0.8,
+        "tree_method": "hist",
+        # The histogram size only matters for speed on CPU; the GPU builds full histograms cheaply
+        "max_bin": settings["max_bin"] if device == "cpu" else 256,
+        "device": device,
+        "n_jobs": xgb_threads,
+    }
+    mlp_params = {
+        "hidden_layer_sizes": mlp_layers(settings["mlp_width"], settings["mlp_layers"], n_rows, n_features),
+        "learning_rate_init": settings["mlp_learning_rate"],
+        "max_iter": settings["mlp_max_iter"],
+        "early_stopping": True,
+    }
+    return {"name": profile, "device": device, "n_jobs": n_jobs, "member_jobs": member_jobs,
+            "mlp_threads": mlp_threads, "warm_trees": settings["warm_trees"], "warm_epochs": settings["warm_epochs"],
+            "xgb": xgb_params, "mlp": mlp_params}
+
+
+def describe_profile(config: dict) -> str:
+    """
+    One-line summary of a resolved profile, e.g. for the training report.
+    """
+    members = "concurrent" if config.get("member_jobs", 1) > 1 else "sequential"
+    return (f"{config['name']} ({config['device']}, {config['n_jobs']} jobs, "
+            f"MLP {config['mlp']['hidden_layer_sizes']}, {config['xgb']['n_estimators']} trees, "
+            f"{members} members: MLP {config.get('mlp_threads', config['n_jobs'])} / "
+            f"XGBoost {config['xgb']['n_jobs']} threads)")
+
+
+def fitted_architecture(config: dict, model: VotingRegressor) -> dict:
+    """
+    The resolved profile with the MLP layers and the number of XGBoost trees of a fitted
+    ensemble, e.g. a warm-started version, whose architecture comes from the version it continues.
+    """
+    config = copy.deepcopy(config)
+    members = model.named_estimators_
+    layers = members["mlp"].hidden_layer_sizes
+    config["mlp"]["hidden_layer_sizes"] = tuple(layers) if hasattr(layers, "__iter__") else (layers,)
+    config["xgb"]["n_estimators"] = members["xgb"].get_booster().num_boosted_rounds()
+    return config
+
+
+def make_ensemble(config: dict, seed=42) -> VotingRegressor:
+    """
+    The MLP + XGBoost VotingRegressor of a resolved profile.
+    """
+    mlp = MLPRegressor(random_state=seed, **config["mlp"])
+    xgb_model = xgb.XGBRegressor(random_state=seed, **config["xgb"])
+    return VotingRegressor([('mlp', mlp), ('xgb', xgb_model)], n_jobs=config.get("member_jobs", 1))
+
+
+def fit_ensemble(model: VotingRegressor, X, y, config: dict) -> VotingRegressor:
+    """
+    I use this function to fit the members of the ensemble at the same time, so the
+    training takes about as long as its slowest member instead of the sum of both.
+
+    The members run in two threads of this process (XGBoost and the BLAS calls of the MLP
+    release the GIL), each on its own share of the cores: XGBoost through its n_jobs, the
+    MLP through a BLAS thread limit. The data is not copied, and each member is fitted
+    exactly as on its own, only with its share of the cores.
+    """
+    if config.get("member_jobs", 1) < 2:
+        return model.fit(X, y)
+    with threadpool_limits(limits=config["mlp_threads"], user_api="blas"), parallel_config(backend="threading"):
+        return model.fit(X, y)
+
+
+def _continue_xgb(xgb_model, X, y, config):
+    """
+    Adds config['warm_trees'] trees to a fitted XGBRegressor, boosting from its current predictions.
+    """
+    booster = xgb_model.get_booster()
+    # The version may come from a GPU server, or from before the profiles: run on this hardware
+    xgb_model.set_params(n_estimators=config["warm_trees"], device=config["device"], n_jobs=config["xgb"]["n_jobs"])
+    return xgb_model.fit(X, y, xgb_model=booster)
+
+
+def _continue_mlp(mlp, X, y, config):
+    """
+    Trains a fitted MLPRegressor for config['warm_epochs'] more epochs, from its current weights.
+    """
+    # partial_fit runs plain epochs (it refuses early stopping); the setting is kept for full retrains
+    early_stopping, best_loss = mlp.early_stopping, mlp.best_loss_
+    # An MLP fitted with early stopping tracks a validation score instead of its best loss
+    mlp.set_params(early_stopping=False)
+    mlp.best_loss_ = math.inf if best_loss is None else best_loss
+    try:
+        with threadpool_limits(limits=config["mlp_threads"], user_api="blas"):
+            for _ in range(config["warm_epochs"]):
+                mlp.partial_fit(X, y)
+    finally:
+        mlp.set_params(early_stopping=early_stopping)
+        if early_stopping:
+            mlp.best_loss_ = None
+    return mlp
+
+
+def warm_start_ensemble(model: VotingRegressor, X, y, config: dict) -> VotingRegressor:
+    """
+    I use this function to update a fitted ensemble on new (and replayed) rows in seconds,
+    instead of training a new one from scratch.
+
+    XGBoost keeps its trees and grows config['warm_trees'] more on the residuals of these
+    rows; the MLP keeps its weights and optimizer state and runs config['warm_epochs'] more
+    epochs on them. Both members are updated at the same time, as in `fit_ensemble`.
+    The rows must be scaled with the scaler the ensemble was trained with.
+    """
+    members = model.named_estimators_
+    tasks = [delayed(_continue_mlp)(members["mlp"], X, y, config),
+             delayed(_continue_xgb)(members["xgb"], X, y, config)]
+    Parallel(n_jobs=config.get("member_jobs", 1), backend="threading")(tasks)
+    return model
@@ -0,0 +1,251 @@
+import copy
+import hashlib
+import math
+import warnings
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import xgboost as xgb
+from joblib import Parallel, delayed
+from sklearn.exceptions import ConvergenceWarning
+from sklearn.metrics import mean_absolute_percentage_error
+from sklearn.model_selection import train_test_split
+from sklearn.neural_network import MLPRegressor
+from sklearn.preprocessing import StandardScaler
+from threadpoolctl import threadpool_limits
+
+try:
+    import optuna
+    from optuna.trial import TrialState
+except ImportError:
+    optuna = None
+
+try:
+    from optuna.storages.journal import JournalFileBackend
+except ImportError:  # optuna < 4
+    try:
+        from optuna.storages import JournalFileStorage as JournalFileBackend
+    except ImportError:
+        JournalFileBackend = None
+
+from IA_training.Training_profiles import available_cores, mlp_layers, resolve_profile
+
+# Every study of a folder is kept in one journal file, safe to share between processes
+STUDY_FILE = "studies.log"
+# Validation scores reported per trial, i.e. the points where a bad trial can be pruned
+N_STEPS = 5
+# Share of the training split held out to score the trials (the validation split of the
+# training report is never seen by the search)
+TUNING_VALID_SIZE = 0.2
+MLP_WIDTHS = [32, 64, 128, 256, 512]
+
+
+def _require_optuna():
+    if optuna is None:
+        raise ImportError("The hyperparameter search needs optuna: pip install optuna")
+
+
+def study_storage(study_dir):
+    """
+    The journal storage of the studies saved in study_dir ('{study_dir}/studies.log').
+    """
+    _require_optuna()
+    Path(study_dir).mkdir(parents=True, exist_ok=True)
+    return optuna.storages.JournalStorage(JournalFileBackend(str(Path(study_dir) / STUDY_FILE)))
+
+
+def dataset_key(X, y) -> str:
+    """
+    Short fingerprint of a training set: a study only resumes on the data it was started on.
+    """
+    digest = hashlib.sha256(pd.util.hash_pandas_object(pd.DataFrame(X).assign(_y=np.asarray(y)), index=False).values)
+    return digest.hexdigest()[:12]
+
+
+def suggest_params(trial) -> dict:
+    """
+    Search space of the ensemble: XGBoost boosting and regularization, MLP shape and training.
+    """
+    return {
+        "n_estimators": trial.suggest_int("n_estimators", 200, 2000, step=100),
+        "learning_rate": trial.suggest_float("learning_rate", 0.01, 0.3, log=True),
+        "max_depth": trial.suggest_int("max_depth", 3, 10),
+        "subsample": trial.suggest_float("subsample", 0.5, 1.0),
+        "colsample_bytree": trial.suggest_float("colsample_bytree", 0.5, 1.0),
+        "min_child_weight": trial.suggest_float("min_child_weight", 1.0, 20.0, log=True),
+        "reg_lambda": trial.suggest_float("reg_lambda", 1e-3, 10.0, log=True),
+        "mlp_width": trial.suggest_categorical("mlp_width", MLP_WIDTHS),
+        "mlp_layers": trial.suggest_int("mlp_layers", 1, 4),
+        "mlp_learning_rate": trial.suggest_float("mlp_learning_rate", 1e-4, 1e-2, log=True),
+        "mlp_alpha": trial.suggest_float("mlp_alpha", 1e-6, 1e-2, log=True),
+        "mlp_epochs": trial.suggest_int("mlp_epochs", 20, 300, log=True),
+    }
+
+
+def apply_params(config: dict, params: dict, n_rows: int, n_features: int) -> dict:
+    """
+    A resolved profile (see `Training_profiles.resolve_profile`) with the hyperparameters
+    of a trial. The MLP keeps the width cap of the dataset size, and trains for exactly
+    'mlp_epochs' epochs, as in the trials: neither early stopping nor the loss tolerance
+    (n_iter_no_change) can end its fit sooner.
+    """
+    config = copy.deepcopy(config)
+    config["name"] = f"{config['name']} (tuned)"
+    config["xgb"].update({key: params[key] for key in ("n_estimators", "learning_rate", "max_depth", "subsample",
+                                                        "colsample_bytree", "min_child_weight", "reg_lambda")})
+    config["mlp"].update({
+        "hidden_layer_sizes": mlp_layers(params["mlp_width"], params["mlp_layers"], n_rows, n_features),
+        "learning_rate_init": params["mlp_learning_rate"],
+        "alpha": params["mlp_alpha"],
+        "max_iter": params["mlp_epochs"],
+        "early_stopping": False,
+        "n_iter_no_change": params["mlp_epochs"],
+    })
+    return config
+
+
+def _steps(total: int) -> list:
+    """
+    total split into N_STEPS near-equal positive parts.
+    """
+    return [part for part in np.diff(np.linspace(0, total, N_STEPS + 1).round().astype(int)).tolist() if part > 0]
+
+
+def _optimize(storage_dir, study_name, data, config, n_trials, seed, worker):
+    """
+    Runs trials of a study until it holds n_trials finished, pruned or failed trials (run in a worker).
+    A trial that raises is recorded as failed and the search goes on.
+    """
+    warnings.filterwarnings("ignore", category=ConvergenceWarning)
+    optuna.logging.set_verbosity(optuna.logging.WARNING)
+    X_fit, y_fit, X_valid, y_valid = data
+    study = optuna.load_study(study_name=study_name, storage=study_storage(storage_dir),
+                              sampler=optuna.samplers.TPESampler(seed=seed + worker),
+                              pruner=optuna.pruners.MedianPruner(n_startup_trials=5, n_warmup_steps=1))
+
+    def objective(trial):
+        trial_config = apply_params(config, suggest_params(trial), len(X_fit), X_fit.shape[1])
+        xgb_params = dict(trial_config["xgb"])
+        tree_steps = _steps(xgb_params.pop("n_estimators"))
+        mlp_params = {k: v for k, v in trial_config["mlp"].items() if k not in ("max_iter", "early_stopping")}
+        epoch_steps = _steps(trial_config["mlp"]["max_iter"])
+
+        xgb_model = xgb.XGBRegressor(random_state=seed, **xgb_params)
+        mlp = MLPRegressor(random_state=seed, **mlp_params)
+        booster = None
+        # Both members grow step by step, and the ensemble is scored after each step
+        for step, (trees, epochs) in enumerate(zip(tree_steps, epoch_steps)):
+            xgb_model.set_params(n_estimators=trees)
+            xgb_model.fit(X_fit, y_fit, xgb_model=booster)
+            booster = xgb_model.get_booster()
+            with threadpool_limits(limits=config["mlp_threads"], user_api="blas"):
+                for _ in range(epochs):
+                    mlp.partial_fit(X_fit, y_fit)
+            prediction = (xgb_model.predict(X_valid) + mlp.predict(X_valid)) / 2
+            score = mean_absolute_percentage_error(y_valid, prediction)
+            if not math.isfinite(score):
+                raise optuna.TrialPruned()  # diverging MLP
+            trial.report(score, step)
+            if trial.should_prune():
+                raise optuna.TrialPruned()
+        return score
+
+    # Failed trials count too, or a configuration that always fails would never end the search
+    finished = (TrialState.COMPLETE, TrialState.PRUNED, TrialState.FAIL)
+    study.optimize(objective, catch=(Exception,),
+                   callbacks=[optuna.study.MaxTrialsCallback(n_trials, states=finished)])
+
+
+def _seed_from_previous_study(study, storage):
+    """
+    A new study first tries the best configuration of the latest study of the folder
+    (usually the previous version of the dataset).
+    """
+    previous = [s for s in optuna.get_all_study_summaries(storage)
+                if s.study_name != study.study_name and s.best_trial is not None]
+    if previous:
+        latest = max(previous, key=lambda s: s.datetime_start or pd.Timestamp.min.to_pydatetime())
+        study.enqueue_trial(latest.best_trial.params, skip_if_exists=True)
+
+
+def tune_hyperparameters(X_train, y_train, profile: str, study_dir: str, n_trials: int = 40,
+                         workers: int = None, seed=42, device: str = None, study_name: str = None):
+    """
+    I use this function to search the hyperparameters of the ensemble with Optuna, in
+    parallel worker processes that share one study saved on disk.
+
+    Each trial grows XGBoost and the MLP together in N_STEPS steps and reports the MAPE of
+    their average on held-out rows after each step; the median pruner stops a trial as soon
+    as it falls behind the others. A trial that raises is recorded as failed without stopping
+    the search. An interrupted search resumes where it stopped: the study of a dataset is
+    named after its content, and runs until it holds n_trials finished, pruned or failed
+    trials. A new study starts from the best configuration of the previous one.
+
+    Parameters
+    ----------
+    X_train : pandas.DataFrame
+        Features of the training split (unscaled).
+    y_train : array-like
+        Targets of the training split.
+    profile : str
+        Training profile the search starts from (device, threads, MLP width cap).
+    study_dir : str
+        Folder of the persistent studies.
+    n_trials : int, optional
+        Trials of the study, resumed ones included.
+    workers : int, optional
+        Worker processes (default: one per core). On GPU, a single worker.
+    seed : int, optional
+        Seed of the held-out split, of the models and of the samplers (one per worker).
+    device : str, optional
+        "cpu" or "cuda"; detected when not given.
+    study_name : str, optional
+        Defaults to '{profile}-{dataset_key}'.
+
+    Returns
+    -------
+    tuple[dict or None, dict]
+        The best hyperparameters (see `apply_params`; None when no trial completed),
+        and a summary of the study.
+    """
+    _require_optuna()
+    optuna.logging.set_verbosity(optuna.logging.WARNING)
+    X_fit, X_valid, y_fit, y_valid = train_test_split(X_train, y_train, test_size=TUNING_VALID_SIZE,
+                                                      random_state=seed)
+    scaler = StandardScaler()
+    data = (scaler.fit_transform(X_fit), np.asarray(y_fit, dtype=float),
+            scaler.transform(X_valid), np.asarray(y_valid, dtype=float))
+
+    cores = available_cores()
+    config = resolve_profile(profile, n_rows=len(X_fit), n_features=X_fit.shape[1], device=device, concurrent=False)
+    if workers is None:
+        workers = 1 if config["device"] == "cuda" else cores
+    config = resolve_profile(profile, n_rows=len(X_fit), n_features=X_fit.shape[1], device=config["device"],
+                             n_jobs=max(1, cores // workers), concurrent=False)
+
+    storage = study_storage(study_dir)
+    study_name = study_name or f"{profile}-{dataset_key(X_train, y_train)}"
+    study = optuna.create_study(study_name=study_name, storage=storage, direction="minimize", load_if_exists=True)
+    if not study.trials:
+        _seed_from_previous_study(study, storage)
+    done = sum(trial.state in (TrialState.COMPLETE, TrialState.PRUNED, TrialState.FAIL) for trial in study.trials)
+    print(f"🎛️ Hyperparameter search '{study_name}': {done}/{n_trials} trials done, {workers} worker(s)")
+
+    Parallel(n_jobs=workers)(delayed(_optimize)(study_dir, study_name, data, config, n_trials, seed, worker)
+                             for worker in range(workers))
+
+    study = optuna.load_study(study_name=study_name, storage=storage)
+    states = [trial.state for trial in study.trials]
+    summary = {"study": study_name, "storage": str(Path(study_dir) / STUDY_FILE),
+               "trials": states.count(TrialState.COMPLETE), "pruned": states.count(TrialState.PRUNED),
+               "failed": states.count(TrialState.FAIL), "best_mape": None}
+    if summary["failed"]:
+        print(f"⚠️ {summary['failed']} trial(s) of the hyperparameter search failed (see the study for their errors).")
+    if not summary["trials"]:
+        print("⚠️ No trial of the hyperparameter search completed.")
+        return None, summary
+    summary["best_mape"] = study.best_value
+    print(f"🎛️ Best validation MAPE {study.best_value * 100:.2f}% over {summary['trials']} completed trials "
+          f"({summary['pruned']} pruned)")
+    return study.best_params, summary